@@ -3,27 +3,33 @@ from emulator.memory import MemoryPositions
 
 
 class AddressMode:
+    # number of operand bytes following the opcode
+    operand_size = 0
+    # whether the effective address points to a byte in memory (as opposed to a value or a branch target)
+    accesses_memory = False
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        """
+        Effective address of the instruction at `pc`, before it is executed.
+        Only used for tracing, it reads through `memory.peek` so it has no side effects
+        """
+        return None
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        """
+        Disassembled operand in the Nintendulator log format
+        """
+        return ""
+
     @classmethod
     def write_to(cls, cpu, memory, addr, value):
-        result = cpu.exec_in_cycle(memory.store, addr, value)
-        if addr == 0x2007:
-            if memory.ppu.ppuctrl & 0b0000100:
-                memory.ppu.ppuaddr += 32
-            else:
-                memory.ppu.ppuaddr += 1
-        elif addr == 0x2004:
-            memory.ppu.oamaddr += 1
-        return result
+        return cpu.exec_in_cycle(memory.store, addr, value)
 
     @classmethod
     def read_from(cls, cpu, memory, addr,ld=0):
-        result = cpu.exec_in_cycle(memory.fetch, addr,ld)
-        if addr == 0x2007:
-            if memory.ppu.ppuctrl & 0b0000100:
-                memory.ppu.ppuaddr += 32
-            else:
-                memory.ppu.ppuaddr += 1
-        return result
+        return cpu.exec_in_cycle(memory.fetch, addr,ld)
 
     @classmethod
     def fetch_address(cls, cpu, memory):
@@ -66,6 +72,20 @@ class Indirect(AddressMode):
                than PCL, i.e. page boundary crossing is not handled.
     """
 
+    operand_size = 2
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        # the high byte is always fetched from the same page as the low byte
+        low = memory.peek(operand)
+        high = memory.peek((operand & HIGH_BITS_MASK) | ((operand + 1) & LOW_BITS_MASK))
+        return (high << 8) | low
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "($%04X) = %04X" % (operand, address)
+
     @classmethod
     def write_to(cls, cpu, memory, addr, value):
         pass
@@ -78,13 +98,11 @@ class Indirect(AddressMode):
     def fetch_address(cls, cpu, memory):
         def _read_ptr_low():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
         def _read_ptr_high():
             high = cls.read_16_bits_high(memory, cpu.pc)
-            cls.high = high
             cpu.inc_pc_by(1)
             return high
 
@@ -100,17 +118,11 @@ class Indirect(AddressMode):
             value = cls.get_16_bits_addr_from_high_low(l, h)
             return value
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         pointer_low = cpu.exec_in_cycle(_read_ptr_low)  # 2
         pointer_high = cpu.exec_in_cycle(_read_ptr_high)  # 3
         pointer = cls.get_16_bits_addr_from_high_low(pointer_low, pointer_high)
         address_low = cpu.exec_in_cycle(_read_addr_low, pointer)  # 4
         address = cpu.exec_in_cycle(_read_addr_high_and_return_address, pointer, address_low)  # 5
-        cls.addr = "($%04X)" % pointer
-        cls.data = "= %04X" % address
         return address
 
 
@@ -125,11 +137,22 @@ class IndirectX(AddressMode):
         5  pointer+X+1  R  fetch effective address high
     """
 
+    operand_size = 1
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        pointer = (operand + x) & LOW_BITS_MASK
+        return (memory.peek((pointer + 1) & LOW_BITS_MASK) << 8) | memory.peek(pointer)
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "($%02X,X) @ %02X = %04X" % (operand, (operand + x) & LOW_BITS_MASK, address)
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_ptr():
             ptr = memory.fetch(cpu.pc)
-            cls.low = ptr
             cpu.inc_pc_by(1)
             return ptr
 
@@ -150,15 +173,10 @@ class IndirectX(AddressMode):
             value = cls.get_16_bits_addr_from_high_low(l, h)
             return value
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         pointer = cpu.exec_in_cycle(_read_ptr)  # 2
         real_pointer = cpu.exec_in_cycle(_calc_real_addr, pointer)  # 3
         addr_low = cpu.exec_in_cycle(_read_addr_low, real_pointer)  # 4
         effective_addr = cpu.exec_in_cycle(_read_addr_high, real_pointer, addr_low)  # 5
-        cls.addr = "(${0:02X},X) @ {1:02X} = {2:04X}".format(pointer, real_pointer, effective_addr)
         return effective_addr
 
 
@@ -182,11 +200,22 @@ class IndirectY(AddressMode):
         The same thing happens on (d),y indirect addressing.
     """
 
+    operand_size = 1
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        base = (memory.peek((operand + 1) & LOW_BITS_MASK) << 8) | memory.peek(operand)
+        return (base + y) & 0xFFFF
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "($%02X),Y = %04X @ %04X" % (operand, (address - y) & 0xFFFF, address)
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_ptr():
             ptr = memory.fetch(cpu.pc)
-            cls.low = ptr
             cpu.inc_pc_by(1)
             return ptr
 
@@ -213,16 +242,11 @@ class IndirectY(AddressMode):
             real_addr = cls.get_16_bits_addr_from_high_low(real_high, real_low)
             return real_addr
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
 
         pointer = cpu.exec_in_cycle(_read_ptr)  # 2
         real_pointer = cpu.exec_in_cycle(_read_addr_low_from_pointer, pointer)  # 3
         addr_high, addr_low = cpu.exec_in_cycle(_read_addr_high_from_pointer, pointer, real_pointer)  # 4
         effective_addr = _read_from_real_addr(addr_high, addr_low)
-        cls.addr = "($%02X),Y = %04X @ %04X" % (pointer, (addr_high & HIGH_BITS_MASK) | (real_pointer & LOW_BITS_MASK), effective_addr)
         return effective_addr
 
 
@@ -234,20 +258,25 @@ class ZeroPage(AddressMode):
         2    PC     R  fetch address, increment PC
     """
 
+    operand_size = 1
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        return operand
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "$%02X" % operand
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_addr():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         addr = cpu.exec_in_cycle(_read_addr)
-        cls.addr = "$%02X" % addr
         return addr
 
 
@@ -260,24 +289,29 @@ class ZeroPageX(AddressMode):
         3   address   R  read from address, add index register to it
     """
 
+    operand_size = 1
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        return (operand + x) & LOW_BITS_MASK
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "$%02X,X @ %02X" % (operand, address)
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_addr():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
         def _calc_real_addr(a):
             return MemoryPositions.ZERO_PAGE.wrap(a + cpu.x)
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         addr = cpu.exec_in_cycle(_read_addr)  # 2
         real_addr = cpu.exec_in_cycle(_calc_real_addr, addr)  # 3
-        cls.addr = "$%02X,X @ %02X" % (addr, real_addr)
         return real_addr
 
 
@@ -290,24 +324,29 @@ class ZeroPageY(AddressMode):
         3   address   R  read from address, add index register to it
     """
 
+    operand_size = 1
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        return (operand + y) & LOW_BITS_MASK
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "$%02X,Y @ %02X" % (operand, address)
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_addr():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
         def _calc_real_addr(a):
             return MemoryPositions.ZERO_PAGE.wrap(a + cpu.y)
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         addr = cpu.exec_in_cycle(_read_addr)  # 2
         real_addr = cpu.exec_in_cycle(_calc_real_addr, addr)  # 3
-        cls.addr = "$%02X,Y @ %02X" % (addr, real_addr)
         return real_addr
 
 
@@ -320,28 +359,32 @@ class Absolute(AddressMode):
         3    PC     R  fetch high byte of address, increment PC
     """
 
+    operand_size = 2
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        return operand
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "$%04X" % operand
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_low():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
         def _read_high():
             high = cls.read_16_bits_high(memory, cpu.pc)
-            cls.high = high
             cpu.inc_pc_by(1)
             return high
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         addr_low = cpu.exec_in_cycle(_read_low)  # 2
         addr_high = cpu.exec_in_cycle(_read_high)  # 3
         addr = cls.get_16_bits_addr_from_high_low(addr_low, addr_high)
-        cls.addr = "$%04X" % addr
         return addr
 
 
@@ -358,17 +401,26 @@ class AbsoluteY(AddressMode):
                          fix the high byte of effective address
     """
 
+    operand_size = 2
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        return (operand + y) & 0xFFFF
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "$%04X,Y @ %04X" % (operand, address)
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_addr_low():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
         def _read_addr_high(low):
             high = cls.read_16_bits_high(memory, cpu.pc)
-            cls.high = high
             real_low = low + cpu.y
             cpu.inc_pc_by(1)
             return high, real_low
@@ -387,15 +439,10 @@ class AbsoluteY(AddressMode):
             real_addr = cls.get_16_bits_addr_from_high_low(real_high, real_low)
             return real_addr
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
 
         low_before_inc = cpu.exec_in_cycle(_read_addr_low)  # 2
         high_no_fix, low = cpu.exec_in_cycle(_read_addr_high, low_before_inc)  # 3
         effective_addr = _read_from_real_addr(high_no_fix, low)
-        cls.addr = "$%04X,Y @ %04X" % ((high_no_fix | low_before_inc), effective_addr)
         return effective_addr
 
 
@@ -412,17 +459,26 @@ class AbsoluteX(AddressMode):
                          fix the high byte of effective address
     """
 
+    operand_size = 2
+    accesses_memory = True
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        return (operand + x) & 0xFFFF
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "$%04X,X @ %04X" % (operand, address)
+
     @classmethod
     def fetch_address(cls, cpu, memory):
         def _read_addr_low():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
         def _read_addr_high(low):
             high = cls.read_16_bits_high(memory, cpu.pc)
-            cls.high = high
             real_low = low + cpu.x
             cpu.inc_pc_by(1)
             return high, real_low
@@ -441,15 +497,10 @@ class AbsoluteX(AddressMode):
             real_addr = cls.get_16_bits_addr_from_high_low(real_high, real_low)
             return real_addr
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
 
         low_before_inc = cpu.exec_in_cycle(_read_addr_low)  # 2
         high_no_fix, low = cpu.exec_in_cycle(_read_addr_high, low_before_inc)  # 3
         effective_addr = _read_from_real_addr(high_no_fix, low)
-        cls.addr = "$%04X,X @ %04X" % ((high_no_fix | low_before_inc), effective_addr)
         return effective_addr
 
 
@@ -461,6 +512,12 @@ class Immediate(AddressMode):
         2    PC     R  fetch value, increment PC
     """
 
+    operand_size = 1
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "#$%02X" % operand
+
     @classmethod
     def write_to(cls, cpu, memory, addr, value):
         pass
@@ -473,16 +530,10 @@ class Immediate(AddressMode):
     def fetch_address(cls, cpu, memory):
         def _read_immediate():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         value = cpu.exec_in_cycle(_read_immediate)
-        cls.addr = "#$%02X" % value
         return value
 
 
@@ -494,6 +545,10 @@ class Accumulator(AddressMode):
         2    PC     R  read next instruction byte (and throw it away)
     """
 
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "A"
+
     @classmethod
     def write_to(cls, cpu, memory, addr, value):
         cpu.a = value
@@ -507,11 +562,6 @@ class Accumulator(AddressMode):
         def _stall():
             pass
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
-        cls.addr = 'A'
 
         cpu.exec_in_cycle(_stall)
 
@@ -544,6 +594,18 @@ class Relative(AddressMode):
                 executed.
     """
 
+    operand_size = 1
+
+    @classmethod
+    def peek_address(cls, memory, operand, x, y, pc):
+        # branch target, the offset is relative to the next instruction
+        offset = operand - 0x100 if operand & 0x80 else operand
+        return (pc + 2 + offset) & 0xFFFF
+
+    @classmethod
+    def format_operand(cls, operand, address, x, y):
+        return "$%04X" % address
+
     @classmethod
     def write_to(cls, cpu, memory, addr, value):
         pass
@@ -552,14 +614,8 @@ class Relative(AddressMode):
     def fetch_address(cls, cpu, memory):
         def _read_addr():
             low = cls.read_16_bits_low(memory, cpu.pc)
-            cls.low = low
             cpu.inc_pc_by(1)
             return low
 
-        cls.low = None
-        cls.high = None
-        cls.addr = None
-        cls.data = None
         addr = _read_addr()
-        cls.addr = "$%02X" % addr
         return addr
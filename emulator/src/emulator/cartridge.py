@@ -1,4 +1,35 @@
-from emulator.constants import KB
+import mmap
+import os
+
+from emulator.constants import KB, Mirroring
+from emulator.mappers.mappers import Mappers
+
+# 0-3: Constant $4E $45 $53 $1A ("NES" followed by MS-DOS end-of-file)
+INES_MAGIC = b"NES\x1A"
+INES_HEADER_SIZE = 16
+TRAINER_SIZE = 512
+# offset of $7000 in PRG RAM
+TRAINER_START = 0x1000
+
+
+def _nes2_rom_size(lsb, msb, unit):
+    if msb == 0x0F:
+        # exponent-multiplier notation: EEEEEEMM -> 2^E * (MM * 2 + 1)
+        return (1 << (lsb >> 2)) * ((lsb & 0b11) * 2 + 1)
+    return ((msb << 8) | lsb) * unit
+
+
+def _nes2_ram_size(shift):
+    return 64 << shift if shift else 0
+
+
+def _map_save_file(save_path, size):
+    # battery-backed RAM is the save file itself, the OS writes it back so there is nothing to flush on exit
+    mode = 'r+b' if os.path.exists(save_path) else 'w+b'
+    with open(save_path, mode=mode) as file:
+        if os.path.getsize(save_path) < size:
+            file.truncate(size)
+        return mmap.mmap(file.fileno(), size, access=mmap.ACCESS_WRITE)
 
 
 class INesHeader:
@@ -8,44 +39,134 @@ class INesHeader:
         self.flags_6 = flags_6
         self.flags_7 = flags_7
         self.prg_ram_size = prg_ram_size * 8 * KB
+        # battery-backed PRG RAM, only NES 2.0 headers tell it apart (iNES 1.0 has the battery flag of flags 6)
+        self.prg_nvram_size = 0
         self.flags_9 = flags_9
         self.flags_10 = flags_10
 
+        self.mapper = (flags_7 & 0xF0) | (flags_6 >> 4)
+        self.submapper = 0
+        self.vertical_mirroring = (flags_6 & 0b00000001) != 0
+        self.battery = (flags_6 & 0b00000010) != 0
+        self.trainer = (flags_6 & 0b00000100) != 0
+        self.four_screen = (flags_6 & 0b00001000) != 0
+        # bits 2-3 of flags 7 are 0b10 in a NES 2.0 header
+        self.nes2 = (flags_7 & 0b00001100) == 0b00001000
+        if self.nes2:
+            # byte 8 holds the mapper MSB and the submapper, byte 9 the MSB of the ROM sizes
+            self.mapper |= (prg_ram_size & 0x0F) << 8
+            self.submapper = prg_ram_size >> 4
+            self.prg_rom_size = _nes2_rom_size(prg_rom_size, flags_9 & 0x0F, 16 * KB)
+            self.chr_rom_size = _nes2_rom_size(chr_rom_size, flags_9 >> 4, 8 * KB)
+            # byte 10: volatile (low nibble) and battery-backed (high nibble) PRG RAM, as 64 << shift
+            self.prg_ram_size = _nes2_ram_size(flags_10 & 0x0F)
+            self.prg_nvram_size = _nes2_ram_size(flags_10 >> 4)
+
+    @property
+    def mirroring(self):
+        if self.four_screen:
+            return Mirroring.FOUR_SCREEN
+        return Mirroring.VERTICAL if self.vertical_mirroring else Mirroring.HORIZONTAL
+
+    @property
+    def prg_rom_start(self):
+        return INES_HEADER_SIZE + (TRAINER_SIZE if self.trainer else 0)
+
+    @property
+    def size(self):
+        """
+        Expected size of the whole file
+        """
+        return self.prg_rom_start + self.prg_rom_size + self.chr_rom_size
+
+    @classmethod
+    def from_bytes(cls, cartridge_content):
+        if len(cartridge_content) > INES_HEADER_SIZE and bytes(cartridge_content[:4]) == INES_MAGIC:
+            # 4: Size of PRG ROM in 16 KB units
+            prg_rom_size = cartridge_content[4]
+            # 5: Size of CHR ROM in 8 KB units (Value 0 means the board uses CHR RAM)
+            chr_rom_size = cartridge_content[5]
+            # 6: Flags 6
+            flags_6 = cartridge_content[6]
+            # 7: Flags 7
+            flags_7 = cartridge_content[7]
+            # 8: Size of PRG RAM in 8 KB units (Value 0 infers 8 KB for compatibility; see PRG RAM circuit)
+            prg_ram_size = cartridge_content[8]
+            # 9: Flags 9
+            flags_9 = cartridge_content[9]
+            # 10: Flags 10 (unofficial)
+            flags_10 = cartridge_content[10]
+            # 11-15: Zero filled
+            return cls(prg_rom_size, chr_rom_size, flags_6, flags_7, prg_ram_size, flags_9, flags_10)
+        raise ValueError("Invalid iNES Header!")
+
 
 class Cartridge:
-    def __init__(self, header, prg_rom, chr_rom):
+    def __init__(self, header, prg_rom, chr_rom, trainer=None, save_path=None):
         self.header = header
         self.prg_rom = prg_rom
         self.chr_rom = chr_rom
+        self.trainer = trainer
+        self.save_path = save_path
+        self.prg_ram, self.prg_nvram = self.create_prg_ram()
+        # picked from the mapper number in the header
+        self.mapper = Mappers.create(self)
+
+    def create_prg_ram(self):
+        """
+        Returns the volatile PRG RAM and the battery-backed one (NVRAM), None when the board has none.
+        Only the NVRAM is backed by the save file. The trainer is loaded at $7000-$71FF
+        """
+        ram_size, nvram_size = self.header.prg_ram_size, self.header.prg_nvram_size
+        if not self.header.nes2:
+            # iNES 1.0 headers use 0 for 8KB, for compatibility, and the battery flag covers all of it
+            size = ram_size or 8 * KB
+            ram_size, nvram_size = (0, size) if self.header.battery else (size, 0)
+        if self.trainer is not None:
+            # it goes into the RAM mapped at $6000-$7FFF, which needs the whole 8KB
+            if nvram_size:
+                nvram_size = max(nvram_size, 8 * KB)
+            else:
+                ram_size = max(ram_size, 8 * KB)
+
+        prg_ram = bytearray(ram_size) if ram_size else None
+        if not nvram_size:
+            prg_nvram = None
+        elif self.header.battery and self.save_path is not None:
+            prg_nvram = _map_save_file(self.save_path, nvram_size)
+        else:
+            prg_nvram = bytearray(nvram_size)
+        if self.trainer is not None:
+            mapped = prg_nvram if prg_nvram is not None else prg_ram
+            mapped[TRAINER_START:TRAINER_START + TRAINER_SIZE] = self.trainer
+        return prg_ram, prg_nvram
 
     @classmethod
-    def from_bytes(cls, cartridge_content):
-        if cartridge_content and len(cartridge_content) > 16:
-            # 0-3: Constant $4E $45 $53 $1A (“NES” followed by MS-DOS end-of-file)
-            if "NES\x1A" == cartridge_content[:4].decode("utf-8"):
-                # 4: Size of PRG ROM in 16 KB units
-                prg_rom_size = cartridge_content[4]
-                # 5: Size of CHR ROM in 8 KB units (Value 0 means the board uses CHR RAM)
-                chr_rom_size = cartridge_content[5]
-                # 6: Flags 6
-                flags_6 = cartridge_content[6]
-                # 7: Flags 7
-                flags_7 = cartridge_content[7]
-                # 8: Size of PRG RAM in 8 KB units (Value 0 infers 8 KB for compatibility; see PRG RAM circuit)
-                prg_ram_size = cartridge_content[8]
-                # 9: Flags 9
-                flags_9 = cartridge_content[9]
-                # 10: Flags 10 (unofficial)
-                flags_10 = cartridge_content[10]
-                # 11-15: Zero filled
-
-                header = INesHeader(prg_rom_size, chr_rom_size, flags_6, flags_7, prg_ram_size, flags_9, flags_10)
-                prg_rom = cartridge_content[16:(header.prg_rom_size + 16)]
-                if len(cartridge_content) < (header.prg_rom_size + 16 + header.chr_rom_size):
-                    cartridge_content = bytearray(cartridge_content)
-                    for i in range((header.prg_rom_size + 16 + header.chr_rom_size) - len(cartridge_content)):
-                        cartridge_content.append(0)
-                chr_rom = cartridge_content[(header.prg_rom_size + 16):(header.prg_rom_size + 16 + header.chr_rom_size)]
-
-                return cls(header, prg_rom, chr_rom)
-        raise ValueError("Invalid iNES Header!")
+    def from_bytes(cls, cartridge_content, save_path=None):
+        header = INesHeader.from_bytes(cartridge_content)
+        if len(cartridge_content) < header.size:
+            # truncated dump, pad it with zeros in one go
+            cartridge_content = bytes(cartridge_content) + bytes(header.size - len(cartridge_content))
+
+        # PRG, CHR and the trainer are views over the same image, nothing is copied
+        image = memoryview(cartridge_content)
+        prg_rom_end = header.prg_rom_start + header.prg_rom_size
+        trainer = image[INES_HEADER_SIZE:header.prg_rom_start] if header.trainer else None
+        prg_rom = image[header.prg_rom_start:prg_rom_end]
+        chr_rom = image[prg_rom_end:prg_rom_end + header.chr_rom_size]
+        return cls(header, prg_rom, chr_rom, trainer, save_path)
+
+    @classmethod
+    def from_file(cls, file_path):
+        """
+        Maps the ROM file read-only instead of reading it, the banks are views over the mapping.
+        Every emulator running the same ROM shares its pages through the OS page cache.
+        Battery-backed PRG RAM is saved next to the ROM, with a `.sav` extension.
+        """
+        with open(file_path, mode='rb') as file:
+            try:
+                image = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                raise ValueError("Invalid iNES Header!")
+        return cls.from_bytes(image, save_path=os.path.splitext(file_path)[0] + ".sav")
@@ -1,12 +1,11 @@
-import pygame
-
 DISPLAY_SCALE = 2
 
-A_BUTTON = pygame.K_3
-B_BUTTON = pygame.K_2
-SELECT_BUTTON = pygame.K_TAB
-START_BUTTON = pygame.K_RETURN
-UP_BUTTON = pygame.K_w
-DOWN_BUTTON = pygame.K_s
-LEFT_BUTTON = pygame.K_a
-RIGHT_BUTTON = pygame.K_d
\ No newline at end of file
+# pygame key names, without the `K_` prefix
+A_BUTTON = "3"
+B_BUTTON = "2"
+SELECT_BUTTON = "TAB"
+START_BUTTON = "RETURN"
+UP_BUTTON = "w"
+DOWN_BUTTON = "s"
+LEFT_BUTTON = "a"
+RIGHT_BUTTON = "d"
@@ -1,7 +1,17 @@
-from enum import auto, Enum
+from enum import auto, Enum, unique
 
-CPU_FREQUENCY = 1.79e6
-CYCLE_PERIOD = 1. / CPU_FREQUENCY  # seconds
+CPU_FREQUENCY = 1.789773e6  # Hz (NTSC)
+FRAME_RATE = 60.0988  # Hz (NTSC)
+CYCLES_PER_FRAME = CPU_FREQUENCY / FRAME_RATE
+
+# PPU timing, in dots (3 per CPU cycle on NTSC)
+DOTS_PER_CYCLE = 3
+DOTS_PER_SCANLINE = 341
+SCANLINES_PER_FRAME = 262
+VBLANK_SCANLINE = 241
+PRE_RENDER_SCANLINE = 261
+# the pixels of a line are out by this dot, what changes later shows from the next line
+VISIBLE_DOTS = 256
 
 KB = 1024
 
@@ -9,3 +19,26 @@ HIGH_BITS_MASK = 0b1111111100000000
 LOW_BITS_MASK = 0b0000000011111111
 
 NEGATIVE_BIT = 0b0000000010000000
+
+
+@unique
+class Mirroring(Enum):
+    """
+    How the 4 nametables of the PPU address space map to the 2KB of VRAM (or 4KB for four-screen boards)
+    """
+    HORIZONTAL = auto()
+    VERTICAL = auto()
+    SINGLE_SCREEN_LOW = auto()
+    SINGLE_SCREEN_HIGH = auto()
+    FOUR_SCREEN = auto()
+
+    @property
+    def nametable_offsets(self):
+        # offset in VRAM of the nametables at $2000, $2400, $2800 and $2C00
+        return {
+            Mirroring.HORIZONTAL: (0x000, 0x000, 0x400, 0x400),
+            Mirroring.VERTICAL: (0x000, 0x400, 0x000, 0x400),
+            Mirroring.SINGLE_SCREEN_LOW: (0x000, 0x000, 0x000, 0x000),
+            Mirroring.SINGLE_SCREEN_HIGH: (0x400, 0x400, 0x400, 0x400),
+            Mirroring.FOUR_SCREEN: (0x000, 0x400, 0x800, 0xC00),
+        }[self]
@@ -0,0 +1,89 @@
+import sys
+from collections import deque
+from enum import unique, Enum, IntEnum, auto
+
+
+@unique
+class Category(Enum):
+    CPU = auto()
+    PPU = auto()
+    IO = auto()
+    INTERRUPT = auto()
+    MAPPER = auto()
+
+    @property
+    def flag(self):
+        # name of the `Log` attribute telling whether the category is enabled
+        return self.name.lower()
+
+
+@unique
+class Level(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+
+class Log:
+    """
+    In-memory log, the last `size` records are kept in a ring buffer and written out by `dump`
+    (on demand, or by the main loop when it crashes).
+
+    Every category is disabled by default and has a boolean attribute (`LOG.io`, `LOG.interrupt`...),
+    so hot paths only pay for that check:
+
+        if LOG.io:
+            LOG.debug(Category.IO, "strobe %d", value)
+
+    Errors are recorded whatever the category settings, a crash always leaves something to dump.
+
+    Messages are formatted when dumped, not when recorded.
+    """
+
+    def __init__(self, size=1024):
+        self.records = deque(maxlen=size)
+        self.levels = {}
+        for category in Category:
+            self.disable(category)
+
+    def enable(self, category, level=Level.DEBUG):
+        self.levels[category] = level
+        setattr(self, category.flag, True)
+
+    def disable(self, category):
+        self.levels[category] = None
+        setattr(self, category.flag, False)
+
+    def log(self, category, level, message, *args):
+        threshold = self.levels[category]
+        if level >= Level.ERROR or (threshold is not None and level >= threshold):
+            self.records.append((category, level, message, args))
+
+    def debug(self, category, message, *args):
+        self.log(category, Level.DEBUG, message, *args)
+
+    def info(self, category, message, *args):
+        self.log(category, Level.INFO, message, *args)
+
+    def warning(self, category, message, *args):
+        self.log(category, Level.WARNING, message, *args)
+
+    def error(self, category, message, *args):
+        self.log(category, Level.ERROR, message, *args)
+
+    def lines(self):
+        for category, level, message, args in self.records:
+            yield "{:<9} {:<7} {}".format(category.name, level.name, message % args if args else message)
+
+    def dump(self, out=None, clear=True):
+        out = out if out is not None else sys.stderr
+        for line in self.lines():
+            out.write(line + "\n")
+        out.flush()
+        if clear:
+            self.records.clear()
+
+
+# shared by the whole emulator
+LOG = Log()
@@ -0,0 +1,102 @@
+from emulator.constants import KB
+
+
+class Mapper(object):
+    """
+    Cartridge board logic.
+
+    Bank switches only repoint entries of the CPU page tables (`Memory.map_rom`) and of the PPU pattern table
+    slots (`PPU.map_chr`), bank data is never copied.
+    """
+    # iNES mapper numbers handled by the class
+    ids = ()
+    # `scanline` has to be called at the end of every scanline, the PPU can't skip ahead
+    counts_scanlines = False
+
+    def __init__(self, cartridge):
+        self.cartridge = cartridge
+        self.prg_rom = cartridge.prg_rom
+        if len(cartridge.chr_rom):
+            self.chr = cartridge.chr_rom
+            self.chr_writable = False
+        else:
+            # boards without CHR ROM have 8KB of CHR RAM
+            self.chr = bytearray(8 * KB)
+            self.chr_writable = True
+        # the window at $6000-$7FFF shows the NVRAM when the board has both kinds of PRG RAM
+        self.prg_ram = cartridge.prg_nvram if cartridge.prg_nvram is not None else cartridge.prg_ram
+        self.mirroring = cartridge.header.mirroring
+        self.memory = None
+        self.ppu = None
+        self.cpu = None
+        self.irq = None
+        self.irq_pending = False
+
+    def attach(self, memory, ppu=None):
+        """
+        Plugs the cartridge in, $8000-$FFFF writes go to the mapper registers
+        """
+        self.memory = memory
+        self.ppu = ppu
+        memory.map_write_handler(0x8000, 32 * KB, self.write)
+        self.map_prg_ram()
+        if ppu is not None:
+            ppu.mapper = self
+        self.set_mirroring(self.mirroring)
+        self.reset()
+
+    def set_irq(self, cpu, irq):
+        self.cpu = cpu
+        self.irq = irq
+
+    def reset(self):
+        """
+        Maps the power-on banks
+        """
+        pass
+
+    def write(self, addr, value):
+        """
+        CPU write to $8000-$FFFF
+        """
+        pass
+
+    def scanline(self):
+        """
+        Called by the PPU at the end of every rendered scanline
+        """
+        pass
+
+    def request_irq(self):
+        # the IRQ line stays asserted until the mapper acknowledges it, the CPU decides when to take it
+        if not self.irq_pending:
+            self.irq_pending = True
+            if self.irq is not None:
+                self.irq(self.cpu, self.memory)
+
+    def map_prg(self, addr, bank, size):
+        """
+        Maps the PRG bank `bank` (counted in `size` units, negative values count from the end) at `addr`
+        """
+        count = max(len(self.prg_rom) // size, 1)
+        self.memory.map_rom(addr, self.prg_rom, (bank % count) * size, size)
+
+    def map_prg_ram(self, enabled=True, writable=True):
+        """
+        Maps the PRG RAM at $6000-$7FFF (mirrored if smaller than 8KB), disabled RAM reads as open bus
+        """
+        for page in range(0x60, 0x80):
+            if self.prg_ram is not None and enabled:
+                self.memory.map_buffer(page, self.prg_ram, ((page << 8) - 0x6000) % len(self.prg_ram), writable)
+            else:
+                self.memory.map_handler(page, self.memory.fetch_open_bus, self.memory.store_nothing)
+
+    def map_chr(self, addr, bank, size):
+        if self.ppu is not None:
+            count = max(len(self.chr) // size, 1)
+            self.ppu.map_chr(addr >> 10, self.chr, (bank % count) * size, size, self.chr_writable)
+
+    def set_mirroring(self, mirroring):
+        self.mirroring = mirroring
+        if self.ppu is not None:
+            self.ppu.set_mirroring(mirroring)
@@ -0,0 +1,17 @@
+from emulator.constants import KB
+from emulator.mappers.base import Mapper
+
+
+class CNROM(Mapper):
+    """
+    Fixed PRG ROM (like NROM) and a switchable 8KB CHR bank
+    """
+    ids = (3,)
+
+    def reset(self):
+        self.map_prg(0x8000, 0, 16 * KB)
+        self.map_prg(0xC000, -1, 16 * KB)
+        self.map_chr(0x0000, 0, 8 * KB)
+
+    def write(self, addr, value):
+        self.map_chr(0x0000, value, 8 * KB)
@@ -0,0 +1,28 @@
+from more_itertools import flatten
+
+from emulator.mappers.cnrom import CNROM
+from emulator.mappers.mmc1 import MMC1
+from emulator.mappers.mmc3 import MMC3
+from emulator.mappers.nrom import NROM
+from emulator.mappers.uxrom import UxROM
+
+
+class Mappers:
+    types = [
+        NROM,
+        MMC1,
+        UxROM,
+        CNROM,
+        MMC3
+    ]
+
+    all = dict(flatten(
+        map(lambda x: [(mapper_id, x) for mapper_id in x.ids], types)
+    ))
+
+    @staticmethod
+    def create(cartridge):
+        mapper_id = cartridge.header.mapper
+        if mapper_id not in Mappers.all:
+            raise ValueError("Unsupported mapper {}".format(mapper_id))
+        return Mappers.all[mapper_id](cartridge)
@@ -0,0 +1,67 @@
+from emulator.constants import KB, Mirroring
+from emulator.mappers.base import Mapper
+
+
+class MMC1(Mapper):
+    """
+    Registers are written one bit at a time through a 5 bit shift register:
+        $8000-$9FFF: control (mirroring, PRG and CHR bank modes)
+        $A000-$BFFF: CHR bank 0
+        $C000-$DFFF: CHR bank 1
+        $E000-$FFFF: PRG bank
+    """
+    ids = (1,)
+
+    MIRRORING = (Mirroring.SINGLE_SCREEN_LOW, Mirroring.SINGLE_SCREEN_HIGH, Mirroring.VERTICAL, Mirroring.HORIZONTAL)
+
+    def reset(self):
+        # the 1 marks the end of the shift register, once it gets to bit 0 the fifth bit is being written
+        self.shift = 0b10000
+        # PRG mode 3: $8000 switchable, last bank fixed at $C000, the header mirroring until the game sets its own
+        self.control = 0b01100 | (0b10 if self.mirroring == Mirroring.VERTICAL else 0b11)
+        self.chr_bank_0 = 0
+        self.chr_bank_1 = 0
+        self.prg_bank = 0
+        self.update_banks()
+
+    def write(self, addr, value):
+        if value & 0b10000000:
+            self.shift = 0b10000
+            self.control |= 0b01100
+            self.update_banks()
+            return
+
+        complete = self.shift & 1
+        self.shift = (self.shift >> 1) | ((value & 1) << 4)
+        if complete:
+            register = (addr >> 13) & 0b11
+            if register == 0:
+                self.control = self.shift
+            elif register == 1:
+                self.chr_bank_0 = self.shift
+            elif register == 2:
+                self.chr_bank_1 = self.shift
+            else:
+                self.prg_bank = self.shift & 0b01111
+            self.shift = 0b10000
+            self.update_banks()
+
+    def update_banks(self):
+        self.set_mirroring(MMC1.MIRRORING[self.control & 0b11])
+
+        prg_mode = (self.control >> 2) & 0b11
+        if prg_mode < 2:
+            # 32KB mode, the low bit of the bank number is ignored
+            self.map_prg(0x8000, self.prg_bank >> 1, 32 * KB)
+        elif prg_mode == 2:
+            self.map_prg(0x8000, 0, 16 * KB)
+            self.map_prg(0xC000, self.prg_bank, 16 * KB)
+        else:
+            self.map_prg(0x8000, self.prg_bank, 16 * KB)
+            self.map_prg(0xC000, -1, 16 * KB)
+
+        if self.control & 0b10000:
+            self.map_chr(0x0000, self.chr_bank_0, 4 * KB)
+            self.map_chr(0x1000, self.chr_bank_1, 4 * KB)
+        else:
+            self.map_chr(0x0000, self.chr_bank_0 >> 1, 8 * KB)
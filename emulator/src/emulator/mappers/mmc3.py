@@ -0,0 +1,82 @@
+from emulator.constants import KB, Mirroring
+from emulator.mappers.base import Mapper
+
+
+class MMC3(Mapper):
+    """
+    8KB PRG banks, 2KB and 1KB CHR banks and a scanline counter that raises IRQs. Registers (even / odd address):
+        $8000-$9FFF: bank select / bank data
+        $A000-$BFFF: mirroring / PRG RAM protect
+        $C000-$DFFF: IRQ latch / IRQ reload
+        $E000-$FFFF: IRQ disable / IRQ enable
+    """
+    ids = (4,)
+    counts_scanlines = True
+
+    def reset(self):
+        self.bank_select = 0
+        # R0-R7
+        self.registers = [0, 2, 4, 5, 6, 7, 0, 1]
+        self.irq_latch = 0
+        self.irq_counter = 0
+        self.irq_reload = False
+        self.irq_enabled = False
+        self.irq_pending = False
+        self.update_banks()
+
+    def write(self, addr, value):
+        even = (addr & 1) == 0
+        if addr < 0xA000:
+            if even:
+                self.bank_select = value
+            else:
+                self.registers[self.bank_select & 0b111] = value
+            self.update_banks()
+        elif addr < 0xC000:
+            if not even:
+                # bit 7 enables the PRG RAM, bit 6 protects it from writes
+                self.map_prg_ram(enabled=(value & 0b10000000) != 0, writable=(value & 0b01000000) == 0)
+            elif self.mirroring != Mirroring.FOUR_SCREEN:
+                self.set_mirroring(Mirroring.HORIZONTAL if value & 1 else Mirroring.VERTICAL)
+        elif addr < 0xE000:
+            if even:
+                self.irq_latch = value
+            else:
+                self.irq_counter = 0
+                self.irq_reload = True
+        else:
+            if even:
+                # also acknowledges a pending IRQ
+                self.irq_enabled = False
+                self.irq_pending = False
+            else:
+                self.irq_enabled = True
+
+    def update_banks(self):
+        registers = self.registers
+        # bit 6 swaps the switchable bank at $8000 with the second to last bank at $C000
+        if self.bank_select & 0b01000000:
+            self.map_prg(0x8000, -2, 8 * KB)
+            self.map_prg(0xC000, registers[6], 8 * KB)
+        else:
+            self.map_prg(0x8000, registers[6], 8 * KB)
+            self.map_prg(0xC000, -2, 8 * KB)
+        self.map_prg(0xA000, registers[7], 8 * KB)
+        self.map_prg(0xE000, -1, 8 * KB)
+
+        # bit 7 swaps the 2KB banks (R0, R1) with the 1KB banks (R2-R5)
+        low = 0x1000 if self.bank_select & 0b10000000 else 0x0000
+        high = low ^ 0x1000
+        self.map_chr(low, registers[0] >> 1, 2 * KB)
+        self.map_chr(low + 0x0800, registers[1] >> 1, 2 * KB)
+        for i in range(4):
+            self.map_chr(high + i * 0x0400, registers[2 + i], 1 * KB)
+
+    def scanline(self):
+        if self.irq_counter == 0 or self.irq_reload:
+            self.irq_counter = self.irq_latch
+            self.irq_reload = False
+        else:
+            self.irq_counter -= 1
+        if self.irq_counter == 0 and self.irq_enabled:
+            self.request_irq()
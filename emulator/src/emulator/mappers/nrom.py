@@ -0,0 +1,14 @@
+from emulator.constants import KB
+from emulator.mappers.base import Mapper
+
+
+class NROM(Mapper):
+    """
+    No bank switching, NROM-128 mirrors its 16KB of PRG ROM at $C000, NROM-256 fills $8000-$FFFF
+    """
+    ids = (0,)
+
+    def reset(self):
+        self.map_prg(0x8000, 0, 16 * KB)
+        self.map_prg(0xC000, -1, 16 * KB)
+        self.map_chr(0x0000, 0, 8 * KB)
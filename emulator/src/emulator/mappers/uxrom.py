@@ -0,0 +1,17 @@
+from emulator.constants import KB
+from emulator.mappers.base import Mapper
+
+
+class UxROM(Mapper):
+    """
+    16KB switchable PRG bank at $8000, the last bank is fixed at $C000
+    """
+    ids = (2,)
+
+    def reset(self):
+        self.map_prg(0x8000, 0, 16 * KB)
+        self.map_prg(0xC000, -1, 16 * KB)
+        self.map_chr(0x0000, 0, 8 * KB)
+
+    def write(self, addr, value):
+        self.map_prg(0x8000, value, 16 * KB)
@@ -1,7 +1,9 @@
 from enum import unique, Enum, auto
 
 from emulator.constants import KB
-from emulator.ppu import PPU
+from emulator.log import LOG, Category
+from emulator.ppu import PPU, VISIBLE_SCANLINES
+from emulator.scheduler import EventType
 
 
 @unique
@@ -34,84 +36,176 @@ class MemoryPositions(Enum):
         return (self.start + (addr - self.start) % ((self.end + 1) - self.start))
 
 
+# the CPU bus is split in 256 pages of 256 bytes
+PAGE_SIZE = 0x100
+PAGE_COUNT = 0x100
+
+
 class Memory:
-    def __init__(self, rom=None, ram=None, ppu=None):
-        def __pad_or_truncate(some_list, target_len):
-            return some_list[:target_len] + [0x0] * (target_len - len(some_list))
+    """
+    CPU address space.
 
-        if not ram:
-            self.ram = [0x0] * Memory.ram_size()
-        else:
-            self.ram = __pad_or_truncate(ram, Memory.ram_size())
+    Every page has an entry `(buffer, offset, handler)` in `read_pages` and `write_pages`: plain memory pages
+    (RAM and its mirrors, PRG ROM) are accessed as `buffer[offset + (addr & 0xFF)]`, pages with side effects
+    (PPU registers, APU and I/O) go through `handler`, so decoding an address is a single list lookup.
+    """
+
+    def __init__(self, rom=None, ram=None, ppu=None):
+        self.ram = bytearray(Memory.ram_size())
+        if ram:
+            ram = ram[:Memory.ram_size()]
+            self.ram[:len(ram)] = bytes(ram)
         self.rom = rom
         self.debug_mem = []
         self.ppu = ppu
+        # OAM DMA stalls the CPU through the scheduler, when there is one
+        self.scheduler = None
+
+        self.read_pages = [None] * PAGE_COUNT
+        self.write_pages = [None] * PAGE_COUNT
+        # $0000-$1FFF: 2KB of RAM, mirrored 4 times
+        for page in range(MemoryPositions.ZERO_PAGE.start >> 8, (MemoryPositions.RAM_MIRROR_3.end >> 8) + 1):
+            self.map_buffer(page, self.ram, (page * PAGE_SIZE) % Memory.ram_size())
+        # $2000-$3FFF: the 8 PPU registers, mirrored every 8 bytes
+        for page in range(MemoryPositions.PPU_REGISTERS.start >> 8, (MemoryPositions.PPU_REGISTERS_MIRROR.end >> 8) + 1):
+            self.map_handler(page, self.fetch_ppu_registers, self.store_ppu_registers)
+        # $4000-$40FF: APU and I/O registers, the rest of the page already belongs to the cartridge
+        self.map_handler(MemoryPositions.APU_IO_REGISTERS.start >> 8, self.fetch_io, self.store_io)
+        # $4100-$FFFF: cartridge space, the PRG ROM is mapped on top of it
+        for page in range((MemoryPositions.CARTRIDGE.start >> 8) + 1, PAGE_COUNT):
+            self.map_handler(page, self.fetch_open_bus, self.store_nothing)
+        if rom is not None:
+            self.map_prg_rom(rom)
+
+    def map_buffer(self, page, buffer, offset, writable=True):
+        self.read_pages[page] = (buffer, offset, None)
+        if writable:
+            self.write_pages[page] = (buffer, offset, None)
+        else:
+            self.write_pages[page] = (None, 0, self.store_nothing)
+
+    def map_handler(self, page, read, write):
+        self.read_pages[page] = (None, 0, read)
+        self.write_pages[page] = (None, 0, write)
+
+    def map_rom(self, addr, buffer, offset=0, size=PAGE_SIZE):
+        """
+        Points the read pages of `addr` to `addr + size - 1` to `buffer[offset:]`, writes are left alone
+        so mappers can switch PRG banks without touching their registers
+        """
+        for i in range(size // PAGE_SIZE):
+            self.read_pages[(addr >> 8) + i] = (buffer, offset + i * PAGE_SIZE, None)
 
+    def map_write_handler(self, addr, size, handler):
+        for page in range(addr >> 8, (addr + size) >> 8):
+            self.write_pages[page] = (None, 0, handler)
+
+    def map_prg_rom(self, rom):
+        """
+        16KB of PRG ROM are mirrored at $8000 and $C000, 32KB fill the whole $8000-$FFFF window
+        """
+        if len(rom) > 16 * KB:
+            start, size = 0x8000, 32 * KB
+        else:
+            start, size = 0x8000, 16 * KB
+        for page in range(start >> 8, PAGE_COUNT):
+            self.map_buffer(page, rom, ((page * PAGE_SIZE) - start) % size, writable=False)
 
     def fetch(self, addr, ld=0):
-        if MemoryPositions.ZERO_PAGE.contains(addr) or \
-                MemoryPositions.STACK.contains(addr) or \
-                MemoryPositions.RAM.contains(addr):
-            return self.ram[addr]
-        elif MemoryPositions.RAM_MIRROR_1.contains(addr):
-            return self.ram[addr - MemoryPositions.RAM_MIRROR_1.start]
-        elif MemoryPositions.RAM_MIRROR_2.contains(addr):
-            return self.ram[addr - MemoryPositions.RAM_MIRROR_2.start]
-        elif MemoryPositions.RAM_MIRROR_3.contains(addr):
-            return self.ram[addr - MemoryPositions.RAM_MIRROR_3.start]
-        elif MemoryPositions.PPU_REGISTERS.contains(addr) or addr == 0x4014:
+        try:
+            buffer, offset, handler = self.read_pages[addr >> 8]
+        except IndexError:
+            raise IndexError("Invalid Address 0x{:04x}".format(addr))
+        if handler is None:
+            return buffer[offset + (addr & 0xFF)]
+        return handler(addr, ld)
+
+    def peek(self, addr):
+        """
+        Same as `fetch`, but never changes the state of the PPU or the controllers, used for tracing
+        """
+        if MemoryPositions.PPU_REGISTERS.start <= addr <= MemoryPositions.PPU_REGISTERS_MIRROR.end:
+            if self.ppu is None:
+                return 0x00
+            register = addr % 8 + 0x2000
+            if register == 0x2002:
+                return self.ppu.ppustatus
+            elif register == 0x2004:
+                return int(self.ppu.oam[self.ppu.oamaddr])
+            elif register == 0x2007:
+                return self.ppu.fetch(self.ppu.ppuaddr & 0x3FFF)
+            else:
+                return 0x00
+        elif addr == 0x4014 or MemoryPositions.APU_IO_REGISTERS.contains(addr):
+            return 0xFF
+        else:
+            return self.fetch(addr)
+
+    def store(self, addr, value):
+        try:
+            buffer, offset, handler = self.write_pages[addr >> 8]
+        except IndexError:
+            raise IndexError("Invalid Address 0x{:04x}".format(addr))
+        if handler is None:
+            buffer[offset + (addr & 0xFF)] = value
+        else:
+            handler(addr, value)
+
+    def fetch_ppu_registers(self, addr, ld=0):
+        if self.ppu is None:
+            return 0x00
+        # the PPU runs lazily, it has to reach the current cycle before the CPU can see or change its state
+        self.ppu.catchUp()
+        return self.fetch_ppu(addr % 8 + 0x2000)
+
+    def store_ppu_registers(self, addr, value):
+        if self.ppu is not None:
+            self.ppu.catchUp()
+            self.store_ppu(addr % 8 + 0x2000, value)
+
+    def fetch_io(self, addr, ld=0):
+        if addr == 0x4014:
+            if self.ppu is None:
+                return 0x00
+            self.ppu.catchUp()
             return self.fetch_ppu(addr)
-        elif MemoryPositions.PPU_REGISTERS_MIRROR.contains(addr):
-            return self.fetch_ppu(addr%8 + 0x2000)
         elif MemoryPositions.APU_IO_REGISTERS.contains(addr):
             # TODO
-            return self.readIORegisters(addr,ld)
+            return self.readIORegisters(addr, ld)
         elif MemoryPositions.APU_IO_EXTRAS.contains(addr):
             # TODO
             return 0xFF
-        elif MemoryPositions.CARTRIDGE.contains(addr):
-            return self.rom[addr - MemoryPositions.PRG_ROM_START.start]
         else:
-            raise IndexError("Invalid Address 0x{:04x}".format(addr))
+            return self.fetch_open_bus(addr, ld)
 
-    def store(self, addr, value):
-        if MemoryPositions.ZERO_PAGE.contains(addr) or \
-                MemoryPositions.STACK.contains(addr) or \
-                MemoryPositions.RAM.contains(addr):
-            self.ram[addr] = value
-        elif MemoryPositions.RAM_MIRROR_1.contains(addr):
-            self.ram[addr - MemoryPositions.RAM_MIRROR_1.start] = value
-        elif MemoryPositions.RAM_MIRROR_2.contains(addr):
-            self.ram[addr - MemoryPositions.RAM_MIRROR_2.start] = value
-        elif MemoryPositions.RAM_MIRROR_3.contains(addr):
-            self.ram[addr - MemoryPositions.RAM_MIRROR_3.start] = value
-        elif MemoryPositions.PPU_REGISTERS.contains(addr) or addr == 0x4014:
+    def store_io(self, addr, value):
+        if addr == 0x4014:
+            if self.ppu is None:
+                return
+            self.ppu.catchUp()
             self.store_ppu(addr, value)
-        elif MemoryPositions.PPU_REGISTERS_MIRROR.contains(addr):
-            self.store_ppu(addr%8 + 0x2000, value)
-        #elif 0x4000 <= addr <= 0xFFFF:
-            # TODO: remove later
-         #   self.debug_mem.append(("%04X" % addr, "%02X" % value))
         elif MemoryPositions.APU_IO_REGISTERS.contains(addr):
-            self.storeIORegisters(addr,value)
             # TODO
-        elif MemoryPositions.APU_IO_EXTRAS.contains(addr):
-            # TODO
-            return
-        else:
-            raise IndexError("Invalid Address 0x{:04x}".format(addr))
+            self.storeIORegisters(addr, value)
+
+    def fetch_open_bus(self, addr, ld=0):
+        # nothing drives the bus, the last value on it was (usually) the high byte of the address
+        return addr >> 8
+
+    def store_nothing(self, addr, value):
+        pass
 
     def storeIORegisters(self,addr,value):#TODO
         if (addr == 0x4016):#TODO expansion port latch bits?
+            if self.ppu is None:
+                return
             b = value&1
-            self.ppu.latchButtons = b
-            if (b>0):
-                print("Latch------")
-            else:
-                print("-----------")
+            self.ppu.strobeControllers(b)
+            if LOG.io:
+                LOG.debug(Category.IO, "controller strobe %d", b)
 
     def readIORegisters(self,addr,ld):#TODO
-        if ld==1:
+        if ld==1 and self.ppu is not None:
             if (addr == 0x4016):
                 value=self.ppu.readController(1)
                 return value
@@ -125,79 +219,123 @@ class Memory:
 
     def fetch_ppu(self, addr):
         if addr == 0x2002:
+            # the sprite 0 hit and overflow flags are predicted, the prediction may be behind the last writes
+            self.ppu.updateSpriteFlags()
             self.ppu.hi_lo_latch = False
             status = self.ppu.ppustatus
             self.ppu.ppustatus = self.ppu.ppustatus & 0b01111111 # clears vblank flag
             return status
         elif addr == 0x2004:
-            return self.ppu.oam[oamaddr]
+            return int(self.ppu.oam[self.ppu.oamaddr])
         elif addr == 0x2007:
             # self.ppu.ppudata = self.ppu.ram[self.ppu.ppuaddr]
-            self.ppu.ppudata = self.ppu.fetch(self.ppu.ppuaddr)
+            self.ppu.ppudata = self.ppu.fetch(self.ppu.ppuaddr & 0x3FFF)
+            self.increment_ppuaddr()
             return self.ppu.ppudata
         else:
             return 0x00
 
     def store_ppu(self, addr, value):
+        if self.ppu.deferred:
+            # the frame is rasterised at vblank from this log
+            if addr == 0x2007:
+                self.ppu.logData(self.ppu.ppuaddr, value)
+            else:
+                self.ppu.logWrite(addr, value)
         if addr == 0x2000:
             self.ppu.ppuctrl = value
+            # the nametable goes to t
+            self.ppu.tempaddr = (self.ppu.tempaddr & ~0xC00) | ((value & 0b11) << 10)
         elif addr == 0x2001:
             self.ppu.ppumask = value
         elif addr == 0x2003:
             self.ppu.oamaddr = value
         elif addr == 0x2004:
-            self.ppu.oam[oamaddr] = value
+            self.ppu.storeOAM(value)
         elif addr == 0x2005:
-            # Write low byte
+            # Write Y scroll: fine and coarse Y of t
             if self.ppu.hi_lo_latch:
-                self.ppu.ppuscroll |= value
-            # Write high byte
+                self.ppu.tempaddr = (self.ppu.tempaddr & ~0x73E0) | ((value & 0b111) << 12) | ((value & 0xF8) << 2)
+                self.ppu.hi_lo_latch = False
+            # Write X scroll: coarse X of t and fine X
             else:
-                self.ppu.ppuscroll = value << 8
+                self.ppu.tempaddr = (self.ppu.tempaddr & ~0x1F) | (value >> 3)
+                self.ppu.finex = value & 0b111
                 self.ppu.hi_lo_latch = True
         elif addr == 0x2006:
-            # Write low byte
+            # Write low byte, t is copied to v
             if self.ppu.hi_lo_latch:
-                self.ppu.ppuaddr |= value
+                self.ppu.tempaddr = (self.ppu.tempaddr & 0xFF00) | value
+                self.ppu.ppuaddr = self.ppu.tempaddr
+                self.ppu.hi_lo_latch = False
             # Write high byte
             else:
-                self.ppu.ppuaddr = value << 8
+                self.ppu.tempaddr = (self.ppu.tempaddr & 0x00FF) | ((value & 0x3F) << 8)
                 self.ppu.hi_lo_latch = True
         elif addr == 0x2007:
-            self.ppu.store(self.ppu.ppuaddr, value)
-            #print(hex(self.ppu.ppuaddr) + " "+str(self.ppu.ram[self.ppu.ppuaddr]))
-            if (self.ppu.ppuaddr >= 0x3F00 and self.ppu.ppuaddr <=0x3F31): #palette change
-                self.ppu.getPalettes()
+            buffer, _offset = self.ppu.decode[self.ppu.ppuaddr & 0x3FFF]
+            if buffer is not self.ppu.palletes:
+                # nametables and CHR RAM
+                self.ppu.invalidateSpriteFlags()
+            self.ppu.store(self.ppu.ppuaddr & 0x3FFF, value)
+            self.increment_ppuaddr()
         elif addr == 0x4014:
             self.ppu.oamdma = value
             # DMA Transfer
-            # TODO: Cycle count
             #     513 or 514 cycles after the $4014 write tick. (1 dummy read cycle
             #     while waiting for writes to complete, +1 if on an odd CPU cycle,
             #     then 256 alternating read/write cycles.)
-            for dma_addr in range(0x0,0x100):
-                self.ppu.oam[dma_addr] = self.ram[value << 8 | dma_addr]
+            if self.scheduler is not None:
+                self.scheduler.schedule_now(EventType.DMA_STALL, 513 + (self.scheduler.cpu.cycle & 1))
+            buffer, offset, _handler = self.read_pages[value]
+            if buffer is not None:
+                self.ppu.loadOAM(buffer[offset:offset + PAGE_SIZE])
+            else:
+                self.ppu.loadOAM([self.fetch(value << 8 | dma_addr) for dma_addr in range(PAGE_SIZE)])
+        if addr in (0x2000, 0x2005, 0x2006):
+            self.ppu.logScroll()
+        # the writes that may move the sprite 0 hit or the overflow, `$2005` and `$2006` once both bytes are in
+        if addr in (0x2000, 0x2001, 0x2004, 0x4014) or (addr in (0x2005, 0x2006) and not self.ppu.hi_lo_latch):
+            self.ppu.invalidateSpriteFlags()
+
+    def increment_ppuaddr(self):
+        # PPUCTRL bit 2 selects going across (+1) or down (+32) the nametable
+        if self.ppu.ppuctrl & 0b0000100:
+            self.ppu.ppuaddr = (self.ppu.ppuaddr + 32) & 0x7FFF
+        else:
+            self.ppu.ppuaddr = (self.ppu.ppuaddr + 1) & 0x7FFF
+        if self.ppu.line < VISIBLE_SCANLINES:
+            # moves the scroll of the next lines
+            self.ppu.logScroll()
 
     def stack_push(self, cpu, value):
-        self.store(cpu.sp, value)
-        cpu.sp -= 1
-        cpu.sp = cpu.sp & 0xff ^ 0x0100
+        buffer, offset, _handler = self.write_pages[cpu.sp >> 8]
+        buffer[offset + (cpu.sp & 0xFF)] = value
+        cpu.sp = ((cpu.sp - 1) & 0xFF) | MemoryPositions.STACK.start
 
     def stack_pop(self, cpu):
-        value = self.fetch(cpu.sp + 1)
-        cpu.sp += 1
-        cpu.sp = cpu.sp & 0xff ^ 0x0100
-        return value
+        cpu.sp = ((cpu.sp + 1) & 0xFF) | MemoryPositions.STACK.start
+        buffer, offset, _handler = self.read_pages[cpu.sp >> 8]
+        return buffer[offset + (cpu.sp & 0xFF)]
 
     def get_effective_address(self, addr):
-        if MemoryPositions.RAM_MIRROR_1.contains(addr):
-            return addr - MemoryPositions.RAM_MIRROR_1.start
-        elif MemoryPositions.RAM_MIRROR_2.contains(addr):
-            return addr - MemoryPositions.RAM_MIRROR_2.start
-        elif MemoryPositions.RAM_MIRROR_3.contains(addr):
-            return addr - MemoryPositions.RAM_MIRROR_3.start
-        else:
-            return addr
+        """
+        Resolves RAM mirrors, other addresses are returned as they are
+        """
+        buffer, offset, _handler = self.read_pages[addr >> 8]
+        if buffer is self.ram:
+            return offset + (addr & 0xFF)
+        return addr
+
+    def snapshot(self):
+        """
+        Copy of the RAM, can be hashed, compared or given back to `restore`
+        """
+        return bytes(self.ram)
+
+    def restore(self, snapshot):
+        # the RAM pages point to this buffer, so it is updated in place
+        self.ram[:] = snapshot
 
     @staticmethod
     def ram_size():
@@ -25,10 +25,6 @@ class ORA(OpCode):
             cpu.a |= value
             cpu.zero = (cpu.a == 0)
             cpu.negative = (cpu.a & NEGATIVE_BIT) > 0
-            if self.addressing_mode != Immediate:
-                cpu.data = value
-                cpu.addr = memory.get_effective_address(address)
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
 
         _cycle()
 
@@ -53,10 +49,6 @@ class AND(OpCode):
             cpu.a &= value
             cpu.zero = (cpu.a == 0)
             cpu.negative = (cpu.a & NEGATIVE_BIT) > 0
-            if self.addressing_mode != Immediate:
-                cpu.data = value
-                cpu.addr = memory.get_effective_address(address)
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
 
         _cycle()
 
@@ -81,10 +73,6 @@ class EOR(OpCode):
             cpu.a ^= value
             cpu.zero = (cpu.a == 0)
             cpu.negative = (cpu.a & NEGATIVE_BIT) > 0
-            if self.addressing_mode != Immediate:
-                cpu.data = value
-                cpu.addr = memory.get_effective_address(address)
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
 
         _cycle()
 
@@ -114,10 +102,6 @@ class ADC(OpCode):
             cpu.negative = cpu.a >> 7 == 1
             cpu.zero = cpu.a == 0
 
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = addend2
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
 
         _cycle()
 
@@ -140,10 +124,6 @@ class SBC(OpCode):
             address = self.addressing_mode.fetch_address(cpu, memory)
             subtrahend = self.addressing_mode.read_from(cpu, memory, address)
             minuend = cpu.a
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = subtrahend
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
 
             n = np.int16(minuend) - np.int16(subtrahend) - np.int16(0 if cpu.carry else 1)
             a = np.uint8(n)
@@ -174,10 +154,6 @@ class CMP(OpCode):
             address = self.addressing_mode.fetch_address(cpu, memory)
             subtrahend = self.addressing_mode.read_from(cpu, memory, address)
             minuend = cpu.a
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = subtrahend
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             # Two's complement
             subtrahend = abs(~subtrahend ^ 0xFF) & 0xFF
             tmp = minuend + subtrahend
@@ -202,10 +178,6 @@ class CPX(OpCode):
             address = self.addressing_mode.fetch_address(cpu, memory)
             subtrahend = self.addressing_mode.read_from(cpu, memory, address)
             minuend = cpu.x
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = subtrahend
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             # Two's complement
             subtrahend = abs(~subtrahend ^ 0xFF) & 0xFF
             tmp = minuend + subtrahend
@@ -230,10 +202,6 @@ class CPY(OpCode):
             address = self.addressing_mode.fetch_address(cpu, memory)
             subtrahend = self.addressing_mode.read_from(cpu, memory, address)
             minuend = cpu.y
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = subtrahend
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
 
             # Two's complement
             subtrahend = abs(~subtrahend ^ 0xFF) & 0xFF
@@ -274,10 +242,7 @@ class DEC(OpCode):
             cpu.negative = (value & 0b10000000) > 0
             cpu.zero = (value == 0)
 
-            self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, value)
-            cpu.addr = memory.get_effective_address(address)
-            cpu.data = value
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
@@ -349,10 +314,7 @@ class INC(OpCode):
             cpu.negative = (value & 0b10000000) > 0
             cpu.zero = (value == 0)
 
-            self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, value)
-            cpu.addr = memory.get_effective_address(address)
-            cpu.data = value
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
@@ -426,12 +388,7 @@ class ASL(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_asl(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
-            if self.addressing_mode != Accumulator:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = new_value
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
@@ -475,12 +432,7 @@ class ROL(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_rol(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
-            if self.addressing_mode != Accumulator:
-                cpu.data = new_value
-                cpu.addr = memory.get_effective_address(address)
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
@@ -520,12 +472,7 @@ class LSR(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_lsr(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
-            if self.addressing_mode != Accumulator:
-                cpu.data = new_value
-                cpu.addr = memory.get_effective_address(address)
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
@@ -569,12 +516,7 @@ class ROR(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_ror(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
-            if self.addressing_mode != Accumulator:
-                cpu.data = new_value
-                cpu.addr = memory.get_effective_address(address)
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
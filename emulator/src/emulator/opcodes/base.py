@@ -1,10 +1,22 @@
 class OpCode(object):
+    # name used when disassembling, defaults to the class name
+    mnemonic = None
+    # unofficial opcodes are marked with a `*` in the trace
+    unofficial = False
+    # whether the trace shows the byte at the effective address (JMP and JSR only use the address)
+    traces_data = True
+
     def __init__(self, code, addressing_mode, cycles):
         self.id = code
         self.addressing_mode = addressing_mode
         self.cycles = cycles
+        if self.mnemonic is None:
+            self.mnemonic = type(self).__name__
 
     def exec(self, cpu, memory):
+        """
+        Executes the instruction, returns a truthy value if the CPU must halt (BRK, JAM)
+        """
         raise NotImplementedError("Class {} not implemented yet! CPU: {}, MEM: {}".format(self, cpu, memory))
 
     @classmethod
@@ -15,21 +27,19 @@ class OpCode(object):
     def create_dict_entry(cls, x):
         return tuple((x[0], cls(*x)))
 
-    def __str__(self):
-        def __str_addr():
-            if self.addressing_mode is not None:
-                if self.addressing_mode.low is not None and self.addressing_mode.high is not None:
-                    return "{:02X} {:02X}".format(self.addressing_mode.low, (self.addressing_mode.high >> 8))
-                elif self.addressing_mode.low is not None:
-                    return "{:02X}".format(self.addressing_mode.low)
-            return ""
-
-        def __str_addr_2():
-            if self.addressing_mode is not None:
-                if self.addressing_mode.addr is not None and self.addressing_mode.data is not None:
-                    return "{} {} {}".format(type(self).__name__, self.addressing_mode.addr, self.addressing_mode.data)
-                elif self.addressing_mode.addr is not None:
-                    return "{} {}".format(type(self).__name__, self.addressing_mode.addr)
-            return "{}".format(type(self).__name__)
+    def disassemble(self, operand, address, value, x, y):
+        """
+        Assembly text of the instruction in the Nintendulator log format, `value` is the byte at the effective address
+        before the instruction was executed (None when it doesn't touch memory)
+        """
+        text = self.mnemonic
+        if self.addressing_mode is not None:
+            operand_text = self.addressing_mode.format_operand(operand, address, x, y)
+            if operand_text:
+                text = "{} {}".format(text, operand_text)
+        if value is not None:
+            text = "{} = {:02X}".format(text, value)
+        return text
 
-        return "{:02X} {:<6} {:<30}".format(self.id, __str_addr(), __str_addr_2())
+    def __str__(self):
+        return "{:02X} {}{}".format(self.id, "*" if self.unofficial else "", self.mnemonic)
@@ -23,9 +23,6 @@ class BIT(OpCode):
             def _cycle():
                 address = self.addressing_mode.fetch_address(cpu, memory)
                 value = self.addressing_mode.read_from(cpu, memory, address)
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = value
                 cpu.negative = (value & 0b10000000) > 0
                 cpu.overflow = (value & 0b01000000) > 0
                 cpu.zero = (value & cpu.a) == 0
@@ -60,7 +60,6 @@ class BPL(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -89,7 +88,6 @@ class BMI(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -118,7 +116,6 @@ class BVC(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -147,7 +144,6 @@ class BVS(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -176,7 +172,6 @@ class BCC(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -205,7 +200,6 @@ class BCS(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -234,7 +228,6 @@ class BNE(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -263,7 +256,6 @@ class BEQ(OpCode):
                 new_pc, overflow = cpu.exec_in_cycle(_calculate_new_pc, cpu, operand)
             else:
                 new_pc = cpu.pc + 1
-            self.addressing_mode.addr = "$%04X" % (_calculate_new_pc(cpu, operand)[0])
             new_next_instruction = memory.fetch(new_pc)
             if should_take_branch:
                 cpu.pc = new_pc
@@ -288,8 +280,7 @@ class BRK(OpCode):
         cpu.exec_in_cycle(memory.stack_push, cpu, (cpu.pc & HIGH_BITS_MASK) >> 8)
         cpu.exec_in_cycle(memory.stack_push, cpu, (cpu.pc & LOW_BITS_MASK))
 
-        status = cpu.flags
-        cpu.exec_in_cycle(memory.stack_push, cpu, (status | 0b00010000))
+        cpu.exec_in_cycle(memory.stack_push, cpu, (cpu.p | 0b00110000))
 
         pcl = Absolute.read_from(cpu, memory, 0xFFFE)
         pch = Absolute.read_from(cpu, memory, 0xFFFF)
@@ -297,6 +288,8 @@ class BRK(OpCode):
 
         cpu.pc = new_pc
         cpu.break_command = True
+        # we abort the program on BRK
+        return True
 
 
 class RTI(OpCode):
@@ -321,8 +314,7 @@ class RTI(OpCode):
         """
         from_stack = cpu.exec_in_cycle(memory.stack_pop, cpu)
         cpu.exec_in_cycle(_stall)
-        status = (from_stack & 0b11101111) | 0b00100000
-        cpu.flags = status
+        cpu.p = (from_stack & 0b11101111) | 0b00100000
         cpu.exec_in_cycle(_stall)
         pcl = cpu.exec_in_cycle(memory.stack_pop, cpu)
         pch = cpu.exec_in_cycle(memory.stack_pop, cpu)
@@ -330,6 +322,8 @@ class RTI(OpCode):
 
 
 class JSR(OpCode):
+    traces_data = False
+
     @classmethod
     def create_variations(cls):
         variations = [(0x20, Absolute, 6,)]
@@ -389,6 +383,8 @@ class RTS(OpCode):
 
 
 class JMP(OpCode):
+    traces_data = False
+
     @classmethod
     def create_variations(cls):
         variations = [(0x4C, Absolute, 3,),
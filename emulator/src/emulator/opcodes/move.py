@@ -23,10 +23,6 @@ class LDA(OpCode):
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
                 value = self.addressing_mode.read_from(cpu, memory, address,ld=1)
-                if self.addressing_mode != Immediate:
-                    self.addressing_mode.data = "= %02X" % memory.fetch(address)
-                    cpu.addr = memory.get_effective_address(address)
-                    cpu.data = value
 
                 cpu.a = value
                 cpu.zero = cpu.a == 0
@@ -54,9 +50,6 @@ class STA(OpCode):
         def cycle_sta():
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = cpu.a
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
                 self.addressing_mode.write_to(cpu, memory, address, cpu.a)
 
         if self.addressing_mode in [IndirectY, AbsoluteY, AbsoluteX]:
@@ -85,10 +78,6 @@ class LDX(OpCode):
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
                 value = self.addressing_mode.read_from(cpu, memory, address,ld=1)
-                if self.addressing_mode != Immediate:
-                    self.addressing_mode.data = "= %02X" % memory.fetch(address)
-                    cpu.addr = memory.get_effective_address(address)
-                    cpu.data = value
 
                 cpu.x = value
                 cpu.zero = cpu.x == 0
@@ -117,9 +106,6 @@ class STX(OpCode):
             """
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = cpu.x
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
                 self.addressing_mode.write_to(cpu, memory, address, cpu.x)
 
         cycle_stx()
@@ -140,10 +126,6 @@ class LDY(OpCode):
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
                 value = self.addressing_mode.read_from(cpu, memory, address,ld=1)
-                if self.addressing_mode != Immediate:
-                    self.addressing_mode.data = "= %02X" % memory.fetch(address)
-                    cpu.addr = memory.get_effective_address(address)
-                    cpu.data = value
 
                 cpu.y = value
                 cpu.zero = cpu.y == 0
@@ -164,9 +146,6 @@ class STY(OpCode):
         def cycle_sty():
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = cpu.y
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
                 self.addressing_mode.write_to(cpu, memory, address, cpu.y)
 
         cycle_sty()
@@ -298,8 +277,7 @@ class PLP(OpCode):
         cpu.sp += 1
         cpu.sp = cpu.sp & 0xff ^ 0x0100
         from_stack = memory.fetch(cpu.sp)
-        status = (from_stack & 0b11101111) | 0b00100000
-        cpu.flags = status
+        cpu.p = (from_stack & 0b11101111) | 0b00100000
         cpu.inc_cycle()
         cpu.inc_cycle()
         cpu.inc_cycle()
@@ -315,8 +293,7 @@ class PHP(OpCode):
         """
         In the byte pushed, bit 5 is always set to 1, and bit 4 is 1 if from an instruction (PHP or BRK) or 0 if from an interrupt line being pulled low (/IRQ or /NMI).
         """
-        status = cpu.flags | 0b00110000
-        memory.store(cpu.sp, status)
+        memory.store(cpu.sp, cpu.p | 0b00110000)
         cpu.sp -= 1
         cpu.sp = cpu.sp & 0xff ^ 0x0100
         cpu.inc_cycle()
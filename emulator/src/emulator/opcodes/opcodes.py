@@ -1,12 +1,31 @@
 from more_itertools import flatten
 
 from emulator.opcodes.arithmetic import ArithmeticAndLogicalOpCodes
+from emulator.opcodes.base import OpCode
 from emulator.opcodes.flag import FlagOpCodes
 from emulator.opcodes.jump import JumpOpCodes
 from emulator.opcodes.move import MoveOpCodes
 from emulator.opcodes.unofficial import UnofficialOpcodes
 
 
+class Unimplemented(OpCode):
+    """
+    Placeholder for the opcodes we don't emulate yet, the opcode byte is consumed and execution goes on.
+    """
+    mnemonic = "???"
+
+    def __init__(self, code):
+        super().__init__(code, None, 2)
+
+    def exec(self, cpu, memory):
+        # the opcode fetch is the first of its cycles, like every other handler
+        cpu.inc_cycle_by(self.cycles - 1)
+
+
+def _dispatch_table(opcodes):
+    return [opcodes[code] if code in opcodes else Unimplemented(code) for code in range(0x100)]
+
+
 class OpCodes:
     types = [
         ArithmeticAndLogicalOpCodes,
@@ -19,3 +38,6 @@ class OpCodes:
     all = dict(flatten(
         map(lambda x: list(x.all_commands()), types)
     ))
+
+    # flat dispatch table indexed by the opcode byte, every slot has a handler
+    table = _dispatch_table(all)
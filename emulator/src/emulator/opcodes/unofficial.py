@@ -2,42 +2,14 @@ from more_itertools import flatten
 
 from emulator.adressing import Immediate, ZeroPage, Absolute, ZeroPageY, AbsoluteY, IndirectY, ZeroPageX, AbsoluteX, IndirectX, Accumulator
 from emulator.constants import NEGATIVE_BIT, LOW_BITS_MASK
-from emulator.cpu import StatusRegisterFlags
 from emulator.opcodes.base import OpCode
 import numpy as np
 
 
-def unofficial_opcode_str(self, name=None):
-    if name == None:
-        name = type(self).__name__
-
-    def __str_addr():
-        if self.addressing_mode is not None:
-            if self.addressing_mode.low is not None and self.addressing_mode.high is not None:
-                return "{:02X} {:02X}".format(self.addressing_mode.low, (self.addressing_mode.high >> 8))
-            elif self.addressing_mode.low is not None:
-                return "{:02X}".format(self.addressing_mode.low)
-        return ""
-
-    def __str_addr_2():
-        if self.addressing_mode is not None:
-            if self.addressing_mode.addr is not None and self.addressing_mode.data is not None:
-                return "*{} {} {}".format(name, self.addressing_mode.addr, self.addressing_mode.data)
-            elif self.addressing_mode.addr is not None:
-                return "*{} {}".format(name, self.addressing_mode.addr)
-        return "*{}".format(name)
-    with_space = "{:02X} {:<6}{:<30} ".format(
-        self.id, __str_addr(), __str_addr_2())
-    without_space = "{:02X} {:<6}{:<30}".format(
-        self.id, __str_addr(), __str_addr_2())
-
-    if len(with_space) > 40:
-        return without_space
-    else:
-        return with_space
-
-
 class IGN(OpCode):
+    mnemonic = "NOP"
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [(0x0C, Absolute, 4),
@@ -63,18 +35,13 @@ class IGN(OpCode):
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
                 value = self.addressing_mode.read_from(cpu, memory, address)
-                if self.addressing_mode != Immediate:
-                    self.addressing_mode.data = "= %02X" % memory.fetch(
-                        address)
-                    cpu.addr = memory.get_effective_address(address)
-                    cpu.data = value
         _cycle()
 
-    def __str__(self):
-        return unofficial_opcode_str(self, "NOP")
-
 
 class SKB(OpCode):
+    mnemonic = "NOP"
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [(0x80, Immediate, 2),
@@ -87,11 +54,10 @@ class SKB(OpCode):
     def exec(self, cpu, memory):
         _address = self.addressing_mode.fetch_address(cpu, memory)
 
-    def __str__(self):
-        return unofficial_opcode_str(self, "NOP")
-
 
 class NOP(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [(0x1A, None, 2),
@@ -108,11 +74,10 @@ class NOP(OpCode):
 
         cpu.exec_in_cycle(_stall)
 
-    def __str__(self):
-        return unofficial_opcode_str(self)
-
 
 class LAX(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [
@@ -129,11 +94,6 @@ class LAX(OpCode):
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
                 value = self.addressing_mode.read_from(cpu, memory, address)
-                if self.addressing_mode != Immediate:
-                    self.addressing_mode.data = "= %02X" % memory.fetch(
-                        address)
-                    cpu.addr = memory.get_effective_address(address)
-                    cpu.data = value
 
                 cpu.a = value
                 cpu.zero = cpu.a == 0
@@ -147,14 +107,14 @@ class LAX(OpCode):
         _lda()
         _tax()
 
-    def __str__(self):
-        return unofficial_opcode_str(self)
 
 # SAX (d,X) ($83 dd; 6 cycles)
 # SAX d ($87 dd; 3 cycles)
 # SAX a ($8F aa aa; 4 cycles)
 # SAX d,Y ($97 dd; 4 cycles)
 class SAX(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [(0x83, IndirectX, 6),
@@ -170,17 +130,14 @@ class SAX(OpCode):
         def cycle_sta():
             if self.addressing_mode:
                 address = self.addressing_mode.fetch_address(cpu, memory)
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = cpu.a & cpu.x
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
                 self.addressing_mode.write_to(cpu, memory, address, cpu.a & cpu.x)
 
         cycle_sta()
 
-    def __str__(self):
-        return unofficial_opcode_str(self)
 
 class SBC(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [(0xEB, Immediate, 2,)]
@@ -194,10 +151,6 @@ class SBC(OpCode):
             address = self.addressing_mode.fetch_address(cpu, memory)
             subtrahend = self.addressing_mode.read_from(cpu, memory, address)
             minuend = cpu.a
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = subtrahend
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
 
             new_a = (wrap_sub(wrap_sub(minuend, subtrahend), (0 if cpu.carry else 1)))
             cpu.carry = (new_a & 0b01111111) == new_a
@@ -209,8 +162,6 @@ class SBC(OpCode):
 
         _cycle()
         
-    def __str__(self):
-        return unofficial_opcode_str(self)
 
 
 # DCP (d,X) ($C3 dd; 8 cycles)
@@ -221,6 +172,8 @@ class SBC(OpCode):
 # DCP a,Y ($DB aa aa; 7 cycles)
 # DCP a,X ($DF aa aa; 7 cycles)
 class DCP(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [
@@ -252,15 +205,9 @@ class DCP(OpCode):
                 cpu.negative = (value & 0b10000000) > 0
                 cpu.zero = (value == 0)
 
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
                 self.addressing_mode.write_to(cpu, memory, address, value)
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = value
 
                 minuend = cpu.a
-                if self.addressing_mode != Immediate:
-                    cpu.addr = memory.get_effective_address(address)
-                    cpu.data = value
                 # Two's complement
                 subatrend = value
                 subatrend = abs(~subatrend ^ 0xFF) & 0xFF
@@ -282,10 +229,12 @@ class DCP(OpCode):
 
         _exec()
         
-    def __str__(self):
-        return unofficial_opcode_str(self)
+
 
 class ISC(OpCode):
+    mnemonic = "ISB"
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [
@@ -316,16 +265,10 @@ class ISC(OpCode):
             cpu.negative = (value & 0b10000000) > 0
             cpu.zero = (value == 0)
 
-            self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, value)
-            cpu.addr = memory.get_effective_address(address)
-            cpu.data = value
 
             subtrahend = value
             minuend = cpu.a
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = subtrahend
 
             n = np.int16(minuend) - np.int16(subtrahend) - np.int16(0 if cpu.carry else 1)
             a = np.uint8(n)
@@ -345,11 +288,11 @@ class ISC(OpCode):
         else:
             _cycle()
         
-    def __str__(self):
-        return unofficial_opcode_str(self, "ISB")
 
 
 class SLO(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [
@@ -382,21 +325,13 @@ class SLO(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_asl(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
 
-            if self.addressing_mode != Accumulator:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = new_value
 
             value = new_value
             cpu.a |= value
             cpu.zero = (cpu.a == 0)
             cpu.negative = (cpu.a & NEGATIVE_BIT) > 0
-            if self.addressing_mode != Immediate:
-                cpu.data = value
-                cpu.addr = memory.get_effective_address(address)
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
@@ -408,10 +343,11 @@ class SLO(OpCode):
         else:
             _cycle()
         
-    def __str__(self):
-        return unofficial_opcode_str(self)
+
 
 class RLA(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [
@@ -445,20 +381,12 @@ class RLA(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_rol(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
-            if self.addressing_mode != Accumulator:
-                cpu.data = new_value
-                cpu.addr = memory.get_effective_address(address)
 
             value = new_value
             cpu.a &= value
             cpu.zero = (cpu.a == 0)
             cpu.negative = (cpu.a & NEGATIVE_BIT) > 0
-            if self.addressing_mode != Immediate:
-                cpu.data = value
-                cpu.addr = memory.get_effective_address(address)
 
         if self.addressing_mode == AbsoluteX:
             # FIXME: this is ugly, but it works
@@ -470,10 +398,11 @@ class RLA(OpCode):
         else:
             _cycle()
         
-    def __str__(self):
-        return unofficial_opcode_str(self)
+
 
 class SRE(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [
@@ -504,20 +433,12 @@ class SRE(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_lsr(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
-            if self.addressing_mode != Accumulator:
-                cpu.data = new_value
-                cpu.addr = memory.get_effective_address(address)
 
             value = new_value
             cpu.a ^= value
             cpu.zero = (cpu.a == 0)
             cpu.negative = (cpu.a & NEGATIVE_BIT) > 0
-            if self.addressing_mode != Immediate:
-                cpu.data = value
-                cpu.addr = memory.get_effective_address(address)
 
         if self.addressing_mode == AbsoluteX:
             cycle_start = cpu.cycle
@@ -528,12 +449,11 @@ class SRE(OpCode):
         else:
             _cycle()
         
-    def __str__(self):
-        return unofficial_opcode_str(self)
-
 
 
 class RRA(OpCode):
+    unofficial = True
+
     @classmethod
     def create_variations(cls):
         variations = [
@@ -567,12 +487,7 @@ class RRA(OpCode):
             value = self.addressing_mode.read_from(cpu, memory, address)
             self.addressing_mode.write_to(cpu, memory, address, value)
             new_value = _exec_ror(value)
-            if self.addressing_mode != Accumulator:
-                self.addressing_mode.data = "= %02X" % memory.fetch(address)
             self.addressing_mode.write_to(cpu, memory, address, new_value)
-            if self.addressing_mode != Accumulator:
-                cpu.data = new_value
-                cpu.addr = memory.get_effective_address(address)
 
             addend2 = new_value
             addend1 = cpu.a
@@ -583,9 +498,6 @@ class RRA(OpCode):
             cpu.negative = cpu.a >> 7 == 1
             cpu.zero = cpu.a == 0
 
-            if self.addressing_mode != Immediate:
-                cpu.addr = memory.get_effective_address(address)
-                cpu.data = addend2
 
 
         if self.addressing_mode == AbsoluteX:
@@ -598,8 +510,20 @@ class RRA(OpCode):
         else:
             _cycle()
         
-    def __str__(self):
-        return unofficial_opcode_str(self)
+
+
+class JAM(OpCode):
+    """
+    Also known as KIL or HLT, locks up the CPU until the next reset.
+    """
+
+    @classmethod
+    def create_variations(cls):
+        variations = [(code, None, 2) for code in (0x02, 0x12, 0x22, 0x32, 0x42, 0x52, 0x62, 0x72, 0x92, 0xB2, 0xD2, 0xF2)]
+        return map(cls.create_dict_entry, variations)
+
+    def exec(self, cpu, memory):
+        return True
 
 
 class UnofficialOpcodes:
@@ -615,7 +539,8 @@ class UnofficialOpcodes:
         SLO,
         RLA,
         SRE,
-        RRA
+        RRA,
+        JAM
     ]
 
     @staticmethod
@@ -0,0 +1,73 @@
+import time
+from enum import unique, Enum, auto
+
+from emulator.constants import CPU_FREQUENCY, CYCLES_PER_FRAME, FRAME_RATE
+
+
+@unique
+class PacingMode(Enum):
+    REALTIME = auto()
+    UNTHROTTLED = auto()
+    MULTIPLIER = auto()
+
+
+class Pacer:
+    """
+    Keeps emulated time in step with wall-clock time.
+
+    The CPU only counts cycles; the main loop compares `cpu.cycle` against `next_sync` after each
+    instruction and calls `throttle` once a quantum (one frame by default) worth of cycles has run.
+    Deadlines are measured from a fixed origin, so sleep jitter does not accumulate into drift.
+    """
+
+    # if we fall this far behind (in seconds) we stop trying to catch up and re-anchor the origin
+    MAX_LAG = 0.25
+
+    def __init__(self, mode=PacingMode.REALTIME, speed=1.0, quantum=CYCLES_PER_FRAME, clock=time.monotonic, sleep=time.sleep):
+        if mode == PacingMode.MULTIPLIER and speed <= 0:
+            raise ValueError("Invalid speed multiplier {}".format(speed))
+        self.mode = mode
+        self.speed = speed if mode == PacingMode.MULTIPLIER else 1.0
+        self.quantum = quantum
+        self.clock = clock
+        self.sleep = sleep
+        self.reset()
+
+    @classmethod
+    def unthrottled(cls):
+        return cls(PacingMode.UNTHROTTLED)
+
+    @property
+    def cycles_per_second(self):
+        return CPU_FREQUENCY * self.speed
+
+    @property
+    def frames_per_second(self):
+        return FRAME_RATE * self.speed
+
+    def reset(self, cycle=0):
+        self.origin_time = self.clock()
+        self.origin_cycle = cycle
+        if self.mode == PacingMode.UNTHROTTLED:
+            self.next_sync = float("inf")
+        else:
+            self.next_sync = cycle + self.quantum
+
+    def throttle(self, cycle):
+        """
+        Sleeps until wall-clock time catches up with `cycle`, then schedules the next sync point.
+        """
+        if self.mode == PacingMode.UNTHROTTLED:
+            return
+
+        target = self.origin_time + (cycle - self.origin_cycle) / self.cycles_per_second
+        now = self.clock()
+        if target > now:
+            self.sleep(target - now)
+        elif now - target > Pacer.MAX_LAG:
+            # we can't keep up (or we were paused), so forget the debt instead of running flat out
+            self.origin_time = now
+            self.origin_cycle = cycle
+
+        while self.next_sync <= cycle:
+            self.next_sync += self.quantum
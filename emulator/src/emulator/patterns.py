@@ -0,0 +1,45 @@
+import numpy as np
+
+# 8x8 pixels, 2 bitplanes of 8 bytes each
+TILE_SIZE = 16
+
+
+def decode_tiles(chr_data):
+    """
+    Expands CHR data into an array of shape (tiles, 8, 8) of 2-bit color indices.
+    Bit 7 of each bitplane byte is the leftmost pixel, the low plane holds bit 0 of the color and the high plane bit 1
+    """
+    try:
+        # ROM views and CHR RAM are read in place
+        data = np.frombuffer(chr_data, dtype=np.uint8)
+    except TypeError:
+        data = np.asarray(chr_data, dtype=np.uint8)
+    planes = data.reshape(-1, 2, 8)
+    bits = np.unpackbits(planes[..., np.newaxis], axis=3)
+    return bits[:, 0] | (bits[:, 1] << 1)
+
+
+class PatternCache:
+    """
+    Decoded tiles of a CHR buffer. Writes to CHR RAM only mark the tile as dirty, it is decoded again the next time
+    the renderer asks for the tiles
+    """
+
+    def __init__(self, chr_data):
+        self.chr_data = chr_data
+        self.tiles = decode_tiles(chr_data)
+        self.dirty = set()
+
+    def invalidate(self, offset):
+        """
+        `offset` is the address of the written byte in the CHR buffer
+        """
+        self.dirty.add(offset // TILE_SIZE)
+
+    def decoded(self):
+        if self.dirty:
+            for tile in self.dirty:
+                start = tile * TILE_SIZE
+                self.tiles[tile] = decode_tiles(self.chr_data[start:start + TILE_SIZE])[0]
+            self.dirty.clear()
+        return self.tiles
@@ -0,0 +1,91 @@
+import numpy as np
+
+# the 4 logical nametables side by side, 2x2 screens
+PLAYFIELD_WIDTH = 512
+PLAYFIELD_HEIGHT = 480
+# in tiles
+PLAYFIELD_COLUMNS = 64
+PLAYFIELD_ROWS = 60
+
+
+class Playfield:
+    """
+    The 4 logical nametables drawn into one (480, 512) bitmap of palette RAM indices, `palette * 4 + color` and 0
+    where the background is transparent, so a scrolled line is a wrapped slice of it.
+
+    The bitmap is drawn for a state (the PPU or a `RenderState`). Changes only mark tiles in a 64x60 dirty bitmap:
+    the tiles under a written nametable or attribute byte (`store`), the tiles using a written pattern
+    (`invalidatePattern`) or every tile when the background pattern table, its CHR banks or the mirroring changed.
+    `sync` draws the dirty tiles again and records in `versions` the `generation` they were drawn in.
+    """
+
+    def __init__(self):
+        self.bitmap = np.zeros((PLAYFIELD_HEIGHT, PLAYFIELD_WIDTH), dtype=np.uint8)
+        self.tileTypes = np.zeros((PLAYFIELD_ROWS, PLAYFIELD_COLUMNS), dtype=np.uint8)
+        self.dirty = np.ones((PLAYFIELD_ROWS, PLAYFIELD_COLUMNS), dtype=bool)
+        self.versions = np.zeros((PLAYFIELD_ROWS, PLAYFIELD_COLUMNS), dtype=np.int64)
+        self.generation = 0
+        self.key = None
+
+    @staticmethod
+    def keyOf(state):
+        # everything the bitmap depends on besides VRAM and the tiles
+        first = 4 if state.ppuctrl & 0b10000 else 0
+        banks = tuple((id(state.chr_caches[slot]), state.chr_slots[slot][1]) for slot in range(first, first + 4))
+        return state.ppuctrl & 0b10000, banks, state.nametable_offsets
+
+    def sync(self, state):
+        """
+        Bitmap as seen by `state`
+        """
+        key = self.keyOf(state)
+        if key != self.key:
+            self.key = key
+            self.dirty[:] = True
+        if self.dirty.any():
+            self.generation += 1
+            self.draw(state, *np.nonzero(self.dirty))
+            self.versions[self.dirty] = self.generation
+            self.dirty[:] = False
+        return self.bitmap
+
+    def store(self, state, offset):
+        """
+        Marks the tiles under the VRAM byte at `offset`, in every nametable it shows in
+        """
+        page, index = offset & ~0x3FF, offset & 0x3FF
+        if index < 0x3C0:
+            rows = slice(index // 32, index // 32 + 1)
+            columns = slice(index % 32, index % 32 + 1)
+        else:
+            # the 4x4 tiles of an attribute byte
+            block = index - 0x3C0
+            rows = slice(block // 8 * 4, min(block // 8 * 4 + 4, 30))
+            columns = slice(block % 8 * 4, block % 8 * 4 + 4)
+        for nametable, start in enumerate(state.nametable_offsets):
+            if start == page:
+                top, left = (nametable >> 1) * 30, (nametable & 1) * 32
+                self.dirty[top + rows.start:top + rows.stop, left + columns.start:left + columns.stop] = True
+
+    def invalidatePattern(self, tileType):
+        """
+        Marks the tiles drawn with pattern `tileType` of the background pattern table
+        """
+        self.dirty |= self.tileTypes == tileType
+
+    def draw(self, state, rows, columns):
+        """
+        Draws the tiles at `rows`, `columns` (arrays of playfield tile coordinates)
+        """
+        nametables = np.array(state.nametable_offsets)[(rows // 30) * 2 + columns // 32]
+        tileRows, tileColumns = rows % 30, columns % 32
+        tileTypes = state.nametables_view[nametables + tileRows * 32 + tileColumns]
+        attributes = state.nametables_view[nametables + 0x3C0 + tileRows // 4 * 8 + tileColumns // 4]
+        # bottom quadrants of the 32x32 block use bits 4-7, right quadrants bits 2-3 and 6-7
+        paletteNos = (attributes >> (((tileRows & 0b10) << 1) | (tileColumns & 0b10))) & 0b11
+        colorCodes = state.patternTiles(0x1000 if state.ppuctrl & 0b10000 else 0x0)[tileTypes]
+        pixels = np.where(colorCodes != 0, paletteNos[:, np.newaxis, np.newaxis] * 4 + colorCodes, 0)
+        # (rows, 8 lines, columns, 8 pixels) view of the bitmap, every tile is written at once
+        tiles = self.bitmap.reshape(PLAYFIELD_ROWS, 8, PLAYFIELD_COLUMNS, 8)
+        tiles[rows, :, columns, :] = pixels
+        self.tileTypes[rows, columns] = tileTypes
@@ -1,36 +1,132 @@
 from enum import unique, Enum, auto
-from emulator.window import Window
-from emulator.config import *
-
-# pygame silent import
-import os, sys
-with open(os.devnull, 'w') as f:
-    oldstdout = sys.stdout
-    sys.stdout = f
-
-    import pygame
-
-    sys.stdout = oldstdout
-
-from pygame import Color
-
-COLORS = [Color(124,124,124),Color(0,0,252),Color(0,0,188),Color(68,40,188),
-        Color(148,0,132),Color(168,0,32),Color(168,16,0),Color(136,20,0),
-        Color(80,48,0),Color(0,120,0),Color(0,104,0),Color(0,88,0),
-        Color(0,64,88),Color(0,0,0),Color(0,0,0),Color(0,0,0),
-        Color(188,188,188),Color(0,120,248),Color(0,88,248),
-        Color(104,68,252),Color(216,0,204),Color(228,0,88),
-        Color(248,56,0),Color(228,92,16),Color(172,124,0),
-        Color(0,184,0),Color(0,168,0),Color(0,168,68),Color(0,136,136),
-        Color(0,0,0),Color(0,0,0),Color(0,0,0),Color(248,248,248),
-        Color(60,188,252),Color(104,136,252),Color(152,120,248),Color(248,120,248),
-        Color(248,88,152),Color(248,120,88),Color(252,160,68),Color(248,184,0),
-        Color(184,248,24),Color(88,216,84),Color(88,248,152),Color(0,232,216),
-        Color(120,120,120),Color(0,0,0),Color(0,0,0),Color(252,252,252),
-        Color(164,228,252),Color(184,184,248),Color(216,184,248),Color(248,184,248),
-        Color(248,164,192),Color(240,208,176),Color(252,224,168),Color(248,216,120),
-        Color(216,248,120),Color(184,248,184),Color(184,248,216),Color(0,252,252),
-        Color(248,216,248),Color(0,0,0),Color(0,0,0)]
+import numpy as np
+
+from emulator.constants import Mirroring, DOTS_PER_SCANLINE, PRE_RENDER_SCANLINE, SCANLINES_PER_FRAME, VBLANK_SCANLINE, \
+    VISIBLE_DOTS
+from emulator.patterns import PatternCache, TILE_SIZE
+from emulator.playfield import Playfield, PLAYFIELD_HEIGHT, PLAYFIELD_WIDTH
+from emulator.scheduler import EventType
+from emulator.window import HeadlessWindow
+
+# RGB of the 64 NES colors
+COLORS = np.array([(124,124,124),(0,0,252),(0,0,188),(68,40,188),
+        (148,0,132),(168,0,32),(168,16,0),(136,20,0),
+        (80,48,0),(0,120,0),(0,104,0),(0,88,0),
+        (0,64,88),(0,0,0),(0,0,0),(0,0,0),
+        (188,188,188),(0,120,248),(0,88,248),
+        (104,68,252),(216,0,204),(228,0,88),
+        (248,56,0),(228,92,16),(172,124,0),
+        (0,184,0),(0,168,0),(0,168,68),(0,136,136),
+        (0,0,0),(0,0,0),(0,0,0),(248,248,248),
+        (60,188,252),(104,136,252),(152,120,248),(248,120,248),
+        (248,88,152),(248,120,88),(252,160,68),(248,184,0),
+        (184,248,24),(88,216,84),(88,248,152),(0,232,216),
+        (120,120,120),(0,0,0),(0,0,0),(252,252,252),
+        (164,228,252),(184,184,248),(216,184,248),(248,184,248),
+        (248,164,192),(240,208,176),(252,224,168),(248,216,120),
+        (216,248,120),(184,248,184),(184,248,216),(0,252,252),
+        (248,216,248),(0,0,0),(0,0,0)], dtype=np.uint8)
+
+# every emphasis bit darkens the other two channels
+EMPHASIS_ATTENUATION = 0.75
+
+
+def palette_variants(colors):
+    """
+    One copy of `colors` per combination of the PPUMASK greyscale (bit 0) and emphasis (bits 5-7: red, green and
+    blue) bits, indexed by `mask_variant`
+    """
+    variants = np.empty((16,) + colors.shape, dtype=np.uint8)
+    for variant in range(16):
+        greyscale, emphasis = variant & 1, variant >> 1
+        # greyscale keeps the luminance column of the palette
+        table = colors[np.arange(len(colors)) & 0x30] if greyscale else colors
+        factors = np.array([EMPHASIS_ATTENUATION if emphasis & ~(1 << channel) else 1.0 for channel in range(3)])
+        variants[variant] = np.round(table * factors)
+    return variants
+
+
+def mask_variant(ppumask):
+    return ((ppumask >> 4) & 0b1110) | (ppumask & 1)
+
+
+# RGB of `variant * 64 + color index`, used to present the frame
+COLOR_LUT = palette_variants(COLORS).reshape(-1, 3)
+
+VISIBLE_SCANLINES = 240
+SPRITES_PER_LINE = 8
+
+# entries of the render log that are not register writes
+CHR_BANK = 0x10000
+MIRRORING = 0x10001
+OAM = 0x10002
+SCROLL = 0x10003
+PALETTE = 0x10004  # `$2007` writes to palette RAM, `$2007` entries are the ones to VRAM
+
+# the PPU bus is 14 bits wide, $4000-$FFFF mirrors it
+PPU_ADDRESS_SPACE = 0x4000
+# the 8 CHR slots of the pattern tables
+CHR_SLOT_SIZE = 0x400
+
+# bits of the VRAM address (loopy v and t): yyy NN YYYYY XXXXX, fine Y, nametable, coarse Y and coarse X
+HORIZONTAL_BITS = 0b000010000011111
+VERTICAL_BITS = 0b111101111100000
+
+
+def palette_addr(addr):
+    """
+    Index in palette RAM of a palette address, $3F10/$3F14/$3F18/$3F1C are the entries of $3F00/$3F04/$3F08/$3F0C
+    """
+    addr &= 0x1F
+    return addr & 0x0F if addr & 0x13 == 0x10 else addr
+
+
+def increment_x(v):
+    # next tile, coarse X wraps at the right of the nametable and switches the horizontal nametable
+    if v & 0b11111 == 0b11111:
+        return (v & ~0b11111) ^ 0x400
+    return v + 1
+
+
+def increment_y(v):
+    # down a line, coarse Y wraps at the bottom of the nametable (29) and switches the vertical nametable
+    if v & 0x7000 != 0x7000:
+        return v + 0x1000
+    v &= ~0x7000
+    coarseY = (v >> 5) & 0b11111
+    if coarseY == 29:
+        coarseY = 0
+        v ^= 0x800
+    elif coarseY == 31:
+        coarseY = 0
+    else:
+        coarseY += 1
+    return (v & ~0x3E0) | (coarseY << 5)
+
+
+def line_origins(state, count):
+    """
+    Playfield coordinates (y, x) of the first pixel of the next `count` lines drawn from `state`, and the VRAM
+    address after them. While rendering, every line ends by moving v down a line and reloading its horizontal bits
+    from t
+    """
+    v = state.ppuaddr
+    rendering = state.ppumask & 0b11000
+    ys, xs = np.empty(count, dtype=np.intp), np.empty(count, dtype=np.intp)
+    for i in range(count):
+        # coarse Y 30 and 31 are past the nametable, they wrap to the next one
+        ys[i] = (((v >> 11) & 1) * 240 + ((v >> 5) & 0b11111) * 8 + ((v >> 12) & 0b111)) % PLAYFIELD_HEIGHT
+        xs[i] = ((v >> 10) & 1) * 256 + (v & 0b11111) * 8 + state.finex
+        if rendering:
+            v = (increment_y(v) & ~HORIZONTAL_BITS) | (state.tempaddr & HORIZONTAL_BITS)
+    return ys, xs, v
+
+
+@unique
+class Renderer(Enum):
+    NUMPY = auto()  # whole scanlines with NumPy indexing
+    REFERENCE = auto()  # pixel by pixel, kept for pixel-exact comparisons
+    DOTS = auto()  # NumPy, lines written to mid-scanline are drawn dot by dot
 
 @unique
 class PPUMemoryPositions(Enum):
@@ -53,94 +149,73 @@ class PPUMemoryPositions(Enum):
         return (self.start + (addr - self.start) % ((self.end + 1) - self.start))
 
 class Controller:
+    """
+    Standard controller, the buttons (bit n is `BUTTONS[n]`) are loaded into an 8-bit shift register while the
+    strobe is high. Every read returns the low bit and shifts, after the 8 buttons it returns 1
+    """
     def __init__(self):
-        self.up = 0
-        self.down = 0
-        self.left = 0
-        self.right = 0
-        self.A = 0
-        self.B = 0
-        self.select = 0
-        self.start = 0
-        self.whichButton = 0
+        self.buttons = 0
+        self.shifter = 0
+        self.strobe = False
 
-    def readButton(self):
-        pressed = 0
-        if (self.whichButton==0):
-            pressed = self.A
-            print("A: " + str(pressed))
-        elif (self.whichButton==1):
-            pressed = self.B
-            print("B: " + str(pressed))
-        elif (self.whichButton==2):
-            pressed = self.select
-            print("Select: " + str(pressed))
-        elif (self.whichButton==3):
-            pressed = self.start
-            print("Start: " + str(pressed))
-        elif (self.whichButton==4):
-            pressed = self.up
-            print("up: " + str(pressed))
-        elif (self.whichButton==5):
-            pressed = self.down
-            print("down: " + str(pressed))
-        elif (self.whichButton==6):
-            pressed = self.left
-            print("left: " + str(pressed))
-        elif (self.whichButton==7):
-            pressed = self.right
-            print("right: " + str(pressed))
-        else:
-            pressed = 1
-            print("None")
-        self.whichButton += 1
-        return pressed
+    def setButtons(self, buttons):
+        self.buttons = buttons
+        if self.strobe:
+            self.shifter = buttons
 
+    def write(self, strobe):
+        # the register keeps reloading while the strobe is high, the 1 -> 0 transition freezes it
+        self.strobe = strobe
+        self.shifter = self.buttons
 
-    def reload(self,A,B,select,start,up,down,left,right):
-        self.whichButton = 0
-        self.A = A
-        self.B = B
-        self.select = select
-        self.start = start
-        self.up = up
-        self.down = down
-        self.left = left
-        self.right = right
+    def readButton(self):
+        if self.strobe:
+            return self.buttons & 1
+        pressed = self.shifter & 1
+        self.shifter = (self.shifter >> 1) | 0x80
+        return pressed
 
 class PPU:
     #shifter
     class TileDataShifter:#shifts right 16 bits
+        # pattern bytes have their leftmost pixel in bit 7, the shifters output bit 0 first
+        REVERSED = bytes(int("{:08b}".format(byte)[::-1], 2) for byte in range(256))
+
         def __init__(self):
-            self.attribute = 0
+            self.attributelo = 0
+            self.attributehi = 0
             self.patternlo = 0
             self.patternhi = 0
 
+        def pixel(self, finex):
+            #palette number and color code `finex` pixels in
+            paletteNo = (((self.attributehi >> finex) & 1) << 1) | ((self.attributelo >> finex) & 1)
+            colorCode = (((self.patternhi >> finex) & 1) << 1) | ((self.patternlo >> finex) & 1)
+            return paletteNo, colorCode
+
         def shift(self):
-            #gets rightmost bit and shifts
-            atBit = (self.attribute & 1)
-            loBit = (self.patternlo & 1)
-            hiBit = (self.patternhi & 1)
-            self.attribute >>= 1
+            self.attributelo >>= 1
+            self.attributehi >>= 1
             self.patternlo >>= 1
             self.patternhi >>= 1
-            return (atBit,loBit,hiBit)
 
         def shift8(self):
-            self.attribute >>= 8
+            self.attributelo >>= 8
+            self.attributehi >>= 8
             self.patternlo >>= 8
             self.patternhi >>= 8
 
         #DO NOT RELOAD WITHOUT USING THE FIRST 8 BITS FIRST
-        def reload(self, attribute, patternlo, patternhi):
+        def reload(self, paletteNo, patternlo, patternhi):
             #new byte is high
             #old data is low
-            self.attribute = ((attribute << 8) | (self.attribute & 0b11111111))
-            self.patternlo = ((patternlo << 8) | (self.patternlo & 0b11111111))
-            self.patternhi = ((patternhi << 8) | (self.patternhi & 0b11111111))
+            self.attributelo = (((0xFF if paletteNo & 1 else 0) << 8) | (self.attributelo & 0b11111111))
+            self.attributehi = (((0xFF if paletteNo & 2 else 0) << 8) | (self.attributehi & 0b11111111))
+            self.patternlo = ((self.REVERSED[patternlo] << 8) | (self.patternlo & 0b11111111))
+            self.patternhi = ((self.REVERSED[patternhi] << 8) | (self.patternhi & 0b11111111))
 
 
-    def __init__(self, pattern_tables, ppuctrl=0x0, ppumask=0x0, ppustatus=0x0, oamaddr=0x0, oamdata=0x0, ppuscroll=0x0, ppuaddr=0x0, ppudata=0x0, oamdma=0x0, hi_lo_latch=False, mirroring=True):
+    def __init__(self, pattern_tables, ppuctrl=0x0, ppumask=0x0, ppustatus=0x0, oamaddr=0x0, oamdata=0x0, ppuscroll=0x0, ppuaddr=0x0, ppudata=0x0, oamdma=0x0, hi_lo_latch=False, mirroring=True, renderer=Renderer.NUMPY, screen=None):
 
         self.ppuctrl = ppuctrl
         self.ppumask = ppumask
@@ -148,135 +223,487 @@ class PPU:
         self.oamaddr = oamaddr
         self.oamdata = oamdata
         self.ppuscroll = ppuscroll
+        # loopy registers: `ppuaddr` is v, the VRAM address, `tempaddr` is t, `finex` is x and `hi_lo_latch` is w
         self.ppuaddr = ppuaddr
+        self.tempaddr = 0
+        self.finex = 0
         self.ppudata = ppudata
         self.oamdma = oamdma
-        self.mirroring = mirroring
         self.hi_lo_latch = hi_lo_latch
 
-        self.oam = [0x0] * 256  # 64 sprites * 4 bytes
-        self.pattern_tables = pattern_tables
-        self.nametables = [0x0] * 0x800
-        self.palletes = [0x0] * 0x20
-
-
-        #palettes
-        self.bgPalettes = [[0 for x in range(4)] for y in range(4)]
-        self.sprPalettes = [[0 for x in range(4)] for y in range(4)]
-
-        #clock sync
-        self.scnLine = 261
-        self.clock = 0
+        self.oam = np.zeros(256, dtype=np.uint8)  # 64 sprites * 4 bytes
+        # sprites drawn on every line, see `evaluateSprites`
+        self.spriteIndex = None
+        self.spriteCounts = None
+        self.spriteHeight = 8
+        # dot of the first change the sprite 0 hit and overflow prediction has not seen, None when it is up to date
+        self.spriteFlagsStaleSince = None
+        # once attached to a scheduler the PPU runs lazily (see `catchUp`), otherwise `scanLine` drives it
+        self.scheduler = None
+        self.frameStart = 0  # dot where line 0 of the current frame starts
+        self.line = 0  # next scanline to finish
+        # with the NumPy renderer the frame is only rasterised at vblank (see `rasterise`)
+        self.deferred = False
+        self.renderLog = []
+        self.renderState = None
+        self.rasterLine = 0  # next line to rasterise
+        # (buffer, offset) of every PPU address, see `fetch`. One table per mirroring mode, built the first time
+        # the mode is set, the pattern table entries follow the CHR slots
+        self.decode = [None] * PPU_ADDRESS_SPACE
+        self.decode_tables = {}
+        self.chr_entries = {}
+        # the pattern tables are split in 8 1KB slots of (buffer, offset) so mappers can switch CHR banks
+        self.chr_slots = [None] * 8
+        self.chr_writable = False
+        # decoded tiles of every CHR buffer mapped so far, and the one backing each slot
+        self.pattern_caches = {}
+        self.chr_caches = [None] * 8
+        self.map_chr(0, pattern_tables)
+        # 2KB of VRAM, four-screen boards add 2KB more
+        self.nametables = bytearray(0x1000)
+        self.nametables_view = np.frombuffer(self.nametables, dtype=np.uint8)
+        self.palletes = bytearray(0x20)
+        self.palletes_view = np.frombuffer(self.palletes, dtype=np.uint8)
+        self.set_mirroring(mirroring)
+        # mapper notified at the end of each rendered scanline (MMC3 IRQ counter)
+        self.mapper = None
+        # background of the 4 nametables, the NumPy renderer slices its lines out of it
+        self.playfield = Playfield()
+
+        # with rendering on, odd frames are a dot shorter (`Renderer.DOTS` only)
         self.evenFrame = False
 
         #screen
-        self.screen = Window()
+        self.renderer = renderer
+        # NES color index of every pixel, and the PPUMASK palette variant of every line
+        self.frame = np.zeros((240, 256), dtype=np.uint8)
+        self.lineVariants = np.zeros(240, dtype=np.uint16)
+        # background layer, kept across frames: a line is only sliced out of the playfield again when its scroll,
+        # the background bits of PPUMASK, the background palettes or the tiles of its row changed
+        self.background = np.zeros((240, 256), dtype=np.uint8)
+        self.backgroundOrigins = np.full((240, 2), -1, dtype=np.intp)
+        self.backgroundMasks = np.zeros(240, dtype=np.uint8)
+        self.backgroundPalettes = np.zeros((240, 0x10), dtype=np.uint8)
+        self.backgroundVersions = np.zeros(240, dtype=np.int64)
+        # non transparent background pixels, sprites with priority bit set are drawn behind them
+        self.bgOpaque = np.zeros((240, 256), dtype=bool)
+        # frames stay in memory (`HeadlessWindow`) unless a backend is given, `main` opens the pygame `Window`
+        self.screen = screen if screen is not None else HeadlessWindow()
 
         #io
-        self.latchButtons = False
         self.control1 = Controller()
         self.control2 = Controller()
 
-    def nametable_addr(self, addr):
-        addr -= PPUMemoryPositions.NAMETABLES.start
-
-        # Vertical mirroring
-        if self.mirroring:
-            # Nametables 2 and 3
-            if addr >= 0x800:
-                addr -= 0x800
-
-        # Horizontal mirroring
+    def set_mirroring(self, mirroring):
+        self.catchUp()
+        if not isinstance(mirroring, Mirroring):
+            # True / 1 is the iNES header bit for vertical mirroring
+            mirroring = Mirroring.VERTICAL if mirroring else Mirroring.HORIZONTAL
+        self.mirroring = mirroring
+        self.nametable_offsets = mirroring.nametable_offsets
+        table = self.decode_tables.get(mirroring)
+        if table is None:
+            table = self.decode_tables[mirroring] = self.decodeTable(self.nametable_offsets)
+        table[:PPUMemoryPositions.NAMETABLES.start] = self.decode[:PPUMemoryPositions.NAMETABLES.start]
+        self.decode = table
+        if self.deferred:
+            self.logWrite(MIRRORING, (self.nametable_offsets, self.decode))
+        self.invalidateSpriteFlags()
+
+    def map_chr(self, slot, buffer, offset=0, size=0x2000, writable=False):
+        """
+        Points `size` bytes of the pattern tables, starting at the 1KB slot `slot`, to `buffer[offset:]`
+        """
+        self.catchUp()
+        cache = self.pattern_caches.get(id(buffer))
+        if cache is None or cache.chr_data is not buffer:
+            cache = self.pattern_caches[id(buffer)] = PatternCache(buffer)
+        for i in range(size // CHR_SLOT_SIZE):
+            self.chr_slots[slot + i] = (buffer, offset + i * CHR_SLOT_SIZE)
+            self.chr_caches[slot + i] = cache
+            first = (slot + i) * CHR_SLOT_SIZE
+            self.decode[first:first + CHR_SLOT_SIZE] = self.chrEntries(buffer, offset + i * CHR_SLOT_SIZE)
+            if self.deferred:
+                self.logWrite(CHR_BANK, (slot + i, self.chr_slots[slot + i], cache))
+        self.chr_writable = writable
+        self.invalidateSpriteFlags()
+
+    def chrEntries(self, buffer, offset):
+        # decode table entries of a 1KB CHR bank, kept so switching banks back and forth is a slice assignment
+        entries = self.chr_entries.get((id(buffer), offset))
+        if entries is None or entries[0][0] is not buffer:
+            entries = self.chr_entries[(id(buffer), offset)] = [(buffer, offset + i) for i in range(CHR_SLOT_SIZE)]
+        return entries
+
+    def decodeTable(self, nametable_offsets):
+        """
+        Decode table with the nametables at `nametable_offsets` in VRAM, the pattern table entries are left to
+        `map_chr`
+        """
+        table = [None] * PPU_ADDRESS_SPACE
+        for addr in range(PPUMemoryPositions.NAMETABLES.start, PPUMemoryPositions.PALLETES.start):
+            # $3000-$3EFF mirrors the nametables
+            table[addr] = (self.nametables, nametable_offsets[(addr >> 10) & 0b11] + (addr & 0x3FF))
+        for addr in range(PPUMemoryPositions.PALLETES.start, PPU_ADDRESS_SPACE):
+            table[addr] = (self.palletes, palette_addr(addr))
+        return table
+
+    def patternTiles(self, patternTable):
+        """
+        Decoded tiles of the pattern table at `patternTable`, shape (256, 8, 8)
+        """
+        first = patternTable >> 10
+        slots = [(self.chr_caches[slot].decoded(), self.chr_slots[slot][1] // TILE_SIZE) for slot in range(first, first + 4)]
+        tiles, start = slots[0]
+        if all(s[0] is tiles and s[1] == start + i * 64 for i, s in enumerate(slots)):
+            # contiguous banks, no copy
+            return tiles[start:start + 256]
+        return np.concatenate([tiles[start:start + 64] for tiles, start in slots])
+
+    def storeOAM(self, value):
+        # $2004 write
+        self.oam[self.oamaddr] = value
+        self.oamaddr = (self.oamaddr + 1) & 0xFF
+        self.spriteIndex = None
+
+    def loadOAM(self, data):
+        # OAM DMA, `data` is the 256 bytes of the page
+        self.oam[:] = np.frombuffer(bytes(data), dtype=np.uint8)
+        self.spriteIndex = None
+        if self.deferred:
+            self.logWrite(OAM, self.oam.copy())
+
+    def evaluateSprites(self):
+        """
+        Sprites drawn on every visible line: a (240, 8) array of sprite numbers in OAM order, -1 in the unused
+        slots. Sprites past the 8th on a line are dropped, `spriteCounts` keeps how many were in range.
+
+        The whole of OAM is evaluated at once and kept until OAM or the sprite size changes.
+        """
+        height = 16 if self.ppuctrl & 0b100000 else 8
+        if self.spriteIndex is None or self.spriteHeight != height:
+            # a sprite is drawn from the line after its Y coordinate
+            rows = np.arange(VISIBLE_SCANLINES)[:, np.newaxis] - (self.oam[0::4].astype(np.intp) + 1)
+            inRange = (rows >= 0) & (rows < height)
+            counts = np.cumsum(inRange, axis=1)
+            lines, sprites = np.nonzero(inRange & (counts <= SPRITES_PER_LINE))
+            self.spriteIndex = np.full((VISIBLE_SCANLINES, SPRITES_PER_LINE), -1, dtype=np.intp)
+            self.spriteIndex[lines, counts[lines, sprites] - 1] = sprites
+            self.spriteCounts = counts[:, -1]
+            self.spriteHeight = height
+        return self.spriteIndex
+
+    def spriteRows(self, sprites, lines):
+        """
+        Color codes of the row of every sprite in `sprites` drawn on the matching line of `lines`, flipped as the
+        sprites are, shape (sprites, 8)
+        """
+        height = 16 if self.ppuctrl & 0b100000 else 8
+        tileTypes = self.oam[sprites * 4 + 1].astype(np.intp)
+        attributes = self.oam[sprites * 4 + 2]
+        rows = lines - (self.oam[sprites * 4].astype(np.intp) + 1)
+        rows = np.where(attributes & 0b10000000, height - 1 - rows, rows)
+        if height == 16:
+            # bit 0 of the tile type selects the pattern table, the bottom half is the next tile
+            tiles = np.concatenate([self.patternTiles(0x0), self.patternTiles(0x1000)])
+            tileTypes = (tileTypes & 1) * 256 + (tileTypes & 0xFE) + (rows >> 3)
+            rows = rows & 0b111
         else:
-            # Nametable 3
-            if addr >= 0xC00:
-                addr -= 0x800
-            # Nametable 2
-            elif addr >= 0x800:
-                addr -= 0x400
-            # Nametable 1
-            elif addr >= 0x400:
-                addr -= 0x400
+            tiles = self.patternTiles(0x1000 if self.ppuctrl & 0b1000 else 0x0)
+        colorCodes = tiles[tileTypes, rows]
+        return np.where((attributes & 0b1000000)[:, np.newaxis] != 0, colorCodes[:, ::-1], colorCodes)
+
+    def spriteZeroHits(self, first, last):
+        """
+        Lines and columns of lines `first` to `last` - 1 where sprite 0 and the background are both opaque
+        """
+        none = np.zeros(0, dtype=np.intp)
+        if self.ppumask & 0b11000 != 0b11000:
+            return none, none
+        # when in range, sprite 0 is always first
+        lines = first + np.flatnonzero(self.evaluateSprites()[first:last, 0] == 0)
+        if not len(lines):
+            return none, none
+        sprite = self.spriteRows(np.zeros(len(lines), dtype=np.intp), lines)
+        columns = int(self.oam[3]) + np.arange(8)
+        ys, xs, _v = line_origins(self, lines[-1] + 1 - first)
+        ys, xs = ys[lines - first, np.newaxis], xs[lines - first, np.newaxis]
+        background = self.backgroundCodes(ys, xs + np.minimum(columns, 255))
+        # never on the last column, nor on the first 8 when either layer is clipped there
+        visible = columns < 255
+        if self.ppumask & 0b110 != 0b110:
+            visible &= columns >= 8
+        hits = (sprite != 0) & (background != 0) & visible
+        rows, pixels = np.nonzero(hits)
+        return lines[rows], columns[pixels]
+
+    def backgroundCodes(self, ys, xs):
+        """
+        Color codes of the background at playfield coordinates `ys`, `xs`, read straight from VRAM
+        """
+        ys, xs = ys % PLAYFIELD_HEIGHT, xs % PLAYFIELD_WIDTH
+        nametables = np.array(self.nametable_offsets)[(ys // 240) * 2 + xs // 256]
+        tileTypes = self.nametables_view[nametables + (ys % 240) // 8 * 32 + (xs % 256) // 8]
+        tiles = self.patternTiles(0x1000 if self.ppuctrl & 0b10000 else 0x0)
+        return tiles[tileTypes, ys % 8, xs % 8]
+
+    def scheduleSpriteFlags(self, since=None):
+        """
+        Works out when sprite 0 hits and when a line has too many sprites with the current state, and schedules
+        the status flags for those dots, flags due between `since` and now are set right away. Done at the start
+        of the frame and lazily after the state changed while the visible lines are drawn (`updateSpriteFlags`).
+        """
+        self.spriteFlagsStaleSince = None
+        if self.scheduler is None or self.line >= VISIBLE_SCANLINES:
+            return
+        now = self.scheduler.now
+        since = now if since is None else since
+        if not self.ppustatus & 0b1000000:
+            self.scheduler.cancel(EventType.SPRITE_ZERO_HIT)
+            lines, columns = self.spriteZeroHits(self.line, VISIBLE_SCANLINES)
+            # pixel x is output on dot x + 1
+            dots = self.frameStart + lines * DOTS_PER_SCANLINE + columns + 1
+            dots = dots[dots >= since]
+            if len(dots):
+                self.scheduleFlag(int(dots[0]), EventType.SPRITE_ZERO_HIT)
+        if not self.ppustatus & 0b100000:
+            self.scheduler.cancel(EventType.SPRITE_OVERFLOW)
+            if self.ppumask & 0b11000:
+                self.evaluateSprites()
+                # the sprites of a line are evaluated by the end of the line before
+                lines = np.flatnonzero(self.spriteCounts > SPRITES_PER_LINE)
+                dots = self.frameStart + lines * DOTS_PER_SCANLINE - DOTS_PER_SCANLINE + VISIBLE_DOTS
+                dots = dots[dots >= since]
+                if len(dots):
+                    self.scheduleFlag(int(dots[0]), EventType.SPRITE_OVERFLOW)
+
+    def scheduleFlag(self, dot, event):
+        if dot <= self.scheduler.now:
+            self.scheduler.handlers[event](dot)
+        else:
+            self.scheduler.schedule(dot, event)
+
+    def invalidateSpriteFlags(self):
+        """
+        The state changed in a way that may move the sprite 0 hit or the overflow. The prediction is only redone
+        when it matters: on a `$2002` read, before a line is finished or when the flag it scheduled is due
+        """
+        if self.spriteFlagsStaleSince is None and self.scheduler is not None and self.line < VISIBLE_SCANLINES:
+            self.spriteFlagsStaleSince = self.scheduler.now
+
+    def updateSpriteFlags(self):
+        if self.spriteFlagsStaleSince is not None:
+            self.scheduleSpriteFlags(self.spriteFlagsStaleSince)
+
+    def onSpriteZeroHit(self, dot):
+        if self.spriteFlagsStaleSince is not None:
+            # predicted with an older state
+            self.updateSpriteFlags()
+        else:
+            self.ppustatus |= 0b1000000
 
-        return addr
+    def onSpriteOverflow(self, dot):
+        if self.spriteFlagsStaleSince is not None:
+            self.updateSpriteFlags()
+        else:
+            self.ppustatus |= 0b100000
 
 
     def fetch(self, addr):
-        if PPUMemoryPositions.PATTERN_TABLES.contains(addr):
-            return self.pattern_tables[addr]
-        elif PPUMemoryPositions.NAMETABLES.contains(addr):
-            return self.nametables[self.nametable_addr(addr)]
-        elif PPUMemoryPositions.NAMETABLES_MIRROR.contains(addr):
-            return self.fetch(addr % 0x1000 + PPUMemoryPositions.NAMETABLES.start)
-        elif PPUMemoryPositions.PALLETES.contains(addr):
-            return self.palletes[addr - PPUMemoryPositions.PALLETES.start]
-        elif PPUMemoryPositions.PALLETE_MIRROR.contains(addr):
-            return self.fetch(addr % 0x20 + PPUMemoryPositions.PALLETES.start)
-        elif PPUMemoryPositions.MIRROR.contains(addr):
-            return self.fetch(addr % 0x4000)
-        else:
-            raise IndexError("Invalid Address 0x{:04x}".format(addr))
-
+        buffer, offset = self.decode[addr & (PPU_ADDRESS_SPACE - 1)]
+        return buffer[offset]
 
     def store(self, addr, value):
-        if PPUMemoryPositions.PATTERN_TABLES.contains(addr):
-            pass
-        elif PPUMemoryPositions.NAMETABLES.contains(addr):
-            self.nametables[self.nametable_addr(addr)] = value
-        elif PPUMemoryPositions.NAMETABLES_MIRROR.contains(addr):
-            self.store(addr % 0x1000 + PPUMemoryPositions.NAMETABLES.start)
-        elif PPUMemoryPositions.PALLETES.contains(addr):
-            self.palletes[addr - PPUMemoryPositions.PALLETES.start] = value
-        elif PPUMemoryPositions.PALLETE_MIRROR.contains(addr):
-            self.store(addr % 0x20 + PPUMemoryPositions.PALLETES.start)
-        elif PPUMemoryPositions.MIRROR.contains(addr):
-            self.store(addr % 0x4000)
-        else:
-            raise IndexError("Invalid Address 0x{:04x}".format(addr))
+        addr &= PPU_ADDRESS_SPACE - 1
+        buffer, offset = self.decode[addr]
+        if buffer is self.nametables:
+            buffer[offset] = value
+            if not self.deferred:
+                # with the render log the playfield follows the render state instead
+                self.playfield.store(self, offset)
+        elif buffer is self.palletes:
+            buffer[offset] = value
+        elif self.chr_writable:
+            # only boards with CHR RAM can be written
+            buffer[offset] = value
+            self.chr_caches[addr >> 10].invalidate(offset)
+            if (addr >> 12) == (self.ppuctrl & 0b10000) >> 4:
+                # the render state is up to date, the logged write rasterised what came before
+                self.playfield.invalidatePattern((addr & 0xFFF) // TILE_SIZE)
 
     def setNMI(self,cpu=None,memory=None, nmi=None):
         self.cpu = cpu
         self.memory = memory
         self.nmi = nmi
 
-    def getPalettes(self):
-        bgAddr = 0x3F00
-        sprAddr = bgAddr+16
-
-        for i in range(16):
-            k = self.fetch(bgAddr + i)
-            c = COLORS[k]
-            self.bgPalettes[i//4][i%4] = c
-
-            k = self.fetch(sprAddr + i)
-            c = COLORS[k]
-            self.sprPalettes[i//4][i%4]= c
-
-    def reloadControllers(self):
-        A1=B1=select1=start1=up1=down1=left1=right1 = 0
-        A2=B2=select2=start2=up2=down2=left2=right2 = 0
-        if self.latchButtons:
-            print("reloaded")
-            KEYS = pygame.key.get_pressed()
-            if KEYS[UP_BUTTON]:
-                up1=1
-            if KEYS[DOWN_BUTTON]:
-                down1=1
-            if KEYS[LEFT_BUTTON]:
-                left1=1
-            if KEYS[RIGHT_BUTTON]:
-                right1=1
-            if KEYS[SELECT_BUTTON]:
-                select1=1
-            if KEYS[START_BUTTON]:
-                start1=1
-            if KEYS[A_BUTTON]:
-                A1=1
-            if KEYS[B_BUTTON]:
-                B1=1
-            self.control1.reload(A1,B1,select1,start1,up1,down1,left1,right1)
-            self.control2.reload(A2,B2,select2,start2,up2,down2,left2,right2)
-        pygame.event.pump()
+    def attach(self, scheduler):
+        """
+        Runs the PPU on the scheduler clock, the current dot is the start of line 0.
+
+        Scanlines are not stepped: the PPU remembers the next line to finish and `catchUp` renders the lines
+        that ended since then. That happens when the CPU touches the PPU registers, when a mapper switches
+        CHR banks or mirroring, on vblank and at the end of the frame. Only boards counting scanlines (MMC3)
+        get an event at the end of every line.
+        """
+        self.scheduler = scheduler
+        self.deferred = self.renderer in (Renderer.NUMPY, Renderer.DOTS)
+        scheduler.on(EventType.SCANLINE, self.onScanLine)
+        scheduler.on(EventType.VBLANK_SET, self.onVBlank)
+        scheduler.on(EventType.VBLANK_CLEAR, self.onVBlank)
+        scheduler.on(EventType.FRAME, self.onFrame)
+        scheduler.on(EventType.SPRITE_ZERO_HIT, self.onSpriteZeroHit)
+        scheduler.on(EventType.SPRITE_OVERFLOW, self.onSpriteOverflow)
+        self.scheduleFrame(scheduler.now)
+        if self.mapper is not None and self.mapper.counts_scanlines:
+            scheduler.schedule(scheduler.now + VISIBLE_DOTS, EventType.SCANLINE)
+
+    def scheduleFrame(self, start):
+        self.frameStart = start
+        self.line = 0
+        if self.deferred:
+            self.renderState = RenderState(self)
+            self.renderLog.clear()
+            self.rasterLine = 0
+        # the flag changes on dot 1 of the line
+        self.scheduler.schedule(start + VBLANK_SCANLINE * DOTS_PER_SCANLINE + 1, EventType.VBLANK_SET)
+        self.scheduler.schedule(start + PRE_RENDER_SCANLINE * DOTS_PER_SCANLINE + 1, EventType.VBLANK_CLEAR)
+        self.scheduler.schedule(start + SCANLINES_PER_FRAME * DOTS_PER_SCANLINE, EventType.FRAME)
+        self.scheduleSpriteFlags()
+
+    def catchUp(self, dot=None):
+        """
+        Finishes every scanline whose pixels are out by `dot` (now by default)
+        """
+        if self.scheduler is None:
+            return
+        if dot is None:
+            dot = self.scheduler.now
+        end = self.frameStart + self.line * DOTS_PER_SCANLINE + VISIBLE_DOTS
+        if end <= dot:
+            # the prediction starts from the next line to finish
+            self.updateSpriteFlags()
+        while end <= dot and self.line < SCANLINES_PER_FRAME:
+            self.endScanLine(self.line)
+            self.line += 1
+            end += DOTS_PER_SCANLINE
+
+    def onScanLine(self, dot):
+        # frames are a whole number of lines, so this keeps ticking across frames
+        self.catchUp(dot)
+        self.scheduler.schedule(dot + DOTS_PER_SCANLINE, EventType.SCANLINE)
+
+    def onVBlank(self, dot):
+        self.catchUp(dot)
+        if self.deferred:
+            self.rasterise(dot)
+        self.vBlank(self.line == VBLANK_SCANLINE)
+
+    def logWrite(self, register, value):
+        """
+        Appends a write to the render log of the frame
+        """
+        self.renderLog.append((self.scheduler.now, register, value))
+
+    def logData(self, addr, value):
+        """
+        Logs a `$2007` write to `addr` as `(offset, value)`, decoded once here: a VRAM offset (`$2007` entries)
+        or a palette RAM index (`PALETTE` entries)
+        """
+        buffer, offset = self.decode[addr & (PPU_ADDRESS_SPACE - 1)]
+        if buffer is self.nametables:
+            self.logWrite(0x2007, (offset, value))
+        elif buffer is self.palletes:
+            self.logWrite(PALETTE, (offset, value))
+        else:
+            # CHR RAM is not copied in the render state, the lines before the write are rasterised right away
+            self.rasterise(self.scheduler.now)
+
+    def logScroll(self):
+        # the loopy registers are logged as they are after a write, the `$2002` reads that reset w are not logged
+        if self.deferred:
+            self.logWrite(SCROLL, (self.ppuaddr, self.tempaddr, self.finex))
+
+    def rasterise(self, dot):
+        """
+        Rasterises the lines that ended by `dot`: the render state is brought forward by replaying the log and
+        every run of lines between two writes is rendered in one go. With `Renderer.DOTS`, a line written to
+        while its pixels were output is drawn by `renderLineDots` instead, with the writes on their dots
+        """
+        state = self.renderState
+        endLine = self.linesOutBy(dot)
+        firstLine = self.rasterLine
+        log, i = self.renderLog, 0
+        while i < len(log):
+            writeDot, register, value = log[i]
+            # the write shows from the line it happened on, unless that line was already out
+            line = self.linesOutBy(writeDot)
+            if line > self.rasterLine:
+                state.ppuaddr = self.renderLines(self.rasterLine, line, state)
+                self.rasterLine = line
+            if self.renderer == Renderer.DOTS and self.midLine(writeDot) is not None:
+                if line >= endLine:
+                    # the line is not out yet, its writes stay in the log
+                    break
+                writes = []
+                while i < len(log) and self.midLine(log[i][0]) == line:
+                    writes.append(log[i])
+                    i += 1
+                state.ppuaddr = self.renderLineDots(line, state, writes)
+                self.rasterLine = line + 1
+                continue
+            state.apply(register, value)
+            i += 1
+        del log[:i]
+        if endLine > self.rasterLine:
+            state.ppuaddr = self.renderLines(self.rasterLine, endLine, state)
+            self.rasterLine = endLine
+        if firstLine < VISIBLE_SCANLINES <= self.rasterLine:
+            self.presentFrame()
+
+    def midLine(self, dot):
+        # visible line whose pixels were being output on `dot`, None between them
+        line, lineDot = divmod(dot - self.frameStart, DOTS_PER_SCANLINE)
+        if 0 <= line < VISIBLE_SCANLINES and 0 < lineDot < VISIBLE_DOTS:
+            return line
+        return None
+
+    def linesOutBy(self, dot):
+        # visible lines of the frame drawn by `dot`
+        return max(0, min((dot - self.frameStart - VISIBLE_DOTS) // DOTS_PER_SCANLINE + 1, VISIBLE_SCANLINES))
+
+    def onFrame(self, dot):
+        self.catchUp(dot)
+        if self.deferred:
+            # the writes of vblank still have to reach the playfield
+            self.rasterise(dot)
+        start = dot
+        if self.renderer == Renderer.DOTS and not self.evenFrame and self.ppumask & 0b11000:
+            # the pre-render line of odd frames skips its last dot while rendering
+            start -= 1
+            if self.mapper is not None and self.mapper.counts_scanlines:
+                self.scheduler.cancel(EventType.SCANLINE)
+                self.scheduler.schedule(start + VISIBLE_DOTS, EventType.SCANLINE)
+        self.evenFrame = not self.evenFrame
+        self.scheduleFrame(start)
+
+    def presentFrame(self):
+        # one lookup converts the whole frame to RGB, the frame itself stays indexed
+        if self.lineVariants.any():
+            self.screen.present(self.lineVariants[:, np.newaxis] * 64 + self.frame, COLOR_LUT)
+        else:
+            self.screen.present(self.frame, COLOR_LUT)
+
+    def pollControllers(self):
+        """
+        Samples the host input, once per frame
+        """
+        self.screen.poll()
+        self.control1.setButtons(self.screen.buttons(1))
+        self.control2.setButtons(self.screen.buttons(2))
+
+    def strobeControllers(self, strobe):
+        self.control1.write(strobe)
+        self.control2.write(strobe)
 
     def readController(self,which):
         if (which == 1):
@@ -284,91 +711,206 @@ class PPU:
         else:
             return self.control2.readButton()
 
-    def tick(self):
-
-        if (self.scnLine >= 0 and self.scnLine <= 239): #TODO: visible scanlines
-            #cycle 0: idle
-            if (self.cycle >=1 and self.cycle<=256):
-                pass
-                #every 8 cycles:
-                #load nametable byte
-                #attribute table byte
-                #pattern table low
-                #pattern table hi
-                #2 cycles each
-
-                #every cycle:
-                #get pixel from latch
-                #print pixel
-
-            if (self.cycle >=9 and self.cycle<= 257 and self.cycle%8 == 1):
-                #reload shifters
-                pass
-
-            if (self.cycle >=257 and self.cycle <=320):
-                pass
-
-        elif (self.scnLine == 240): #TODO: Post render scanline
-            pass
-        elif (self.scnLine >=241 and self.scnLine <= 260):#TODO: vblank
-            pass
-        else:# TODO: pre-render scanline
-            #gets ppu base nameTable address
-            nameTable = 0xF100
-            #gets ppu base patternTable address
-            patternTable = 0xD000
-            #gets ppu base attributeTable address
-            attributeTable = 0xF4C0
-
-            tileType = self.memory.fetch(nameTable)
-
-            pass
-
-        #odd frames have less clocks
-        if (self.evenFrame == False and self.scnLine == 261 and self.clock == 339):
-            self.evenFrame = True
-            self.scnLine = 0
-            self.clock = 0
-        elif (self.scnLine == 261 and self.clock == 340): # last clock of a frame
-            self.evenFrame = not self.evenFrame
-            self.scnLine = 0
-            self.clock = 0
-        elif (self.clock == 340): # last clock of a scanline
-            self.scnLine += 1
-            self.clock = 0
-        else:
-            self.clock +=1 # a normal clock
-
-
+    def tick(self, state, shifter, line, dot):
+        """
+        Dot `dot` (1 to 257) of the visible line `line`, drawn from `state`: the pixel of dot - 1 comes out of the
+        shifters, the next tile is fetched every 8 dots and v moves on as the PPU moves it
+        """
+        rendering = state.ppumask & 0b11000
+        if dot <= VISIBLE_DOTS:
+            x = dot - 1
+            paletteNo, colorCode = shifter.pixel(state.finex)
+            #hidden background, or its left column, shows the backdrop
+            if not state.ppumask & 0b1000 or (x < 8 and not state.ppumask & 0b10):
+                colorCode = 0
+            #transparent pixels are all the backdrop color
+            self.background[line, x] = state.palletes_view[paletteNo * 4 + colorCode if colorCode else 0] & 0x3F
+            self.bgOpaque[line, x] = colorCode != 0
+            shifter.shift()
+            if dot % 8 == 0 and rendering:
+                self.fetchTile(state, shifter)
+        if dot == VISIBLE_DOTS and rendering:
+            state.ppuaddr = increment_y(state.ppuaddr)
+        elif dot == VISIBLE_DOTS + 1 and rendering:
+            state.ppuaddr = (state.ppuaddr & ~HORIZONTAL_BITS) | (state.tempaddr & HORIZONTAL_BITS)
+
+    def fetchTile(self, state, shifter):
+        """
+        Loads the tile at v into the high byte of the shifters and moves v to the next tile
+        """
+        v = state.ppuaddr
+        _buffer, offset = state.decode[0x2000 | (v & 0xFFF)]
+        tileType = int(state.nametables_view[offset])
+        _buffer, offset = state.decode[0x23C0 | (v & 0xC00) | ((v >> 4) & 0x38) | ((v >> 2) & 0x07)]
+        attribute = state.nametables_view[offset]
+        # bottom quadrants of the 32x32 block use bits 4-7, right quadrants bits 2-3 and 6-7
+        paletteNo = (int(attribute) >> (((v >> 4) & 0b100) | (v & 0b10))) & 0b11
+        addr = (0x1000 if state.ppuctrl & 0b10000 else 0x0) + tileType * 16 + ((v >> 12) & 0b111)
+        buffer, offset = state.chr_slots[addr >> 10]
+        offset += addr & 0x3FF
+        shifter.reload(paletteNo, buffer[offset], buffer[offset + 8])
+        state.ppuaddr = increment_x(v)
+
+    def renderLineDots(self, line, state, writes):
+        """
+        Draws the background of `line` dot by dot with `tick`, applying `writes` (the render log entries made
+        while its pixels were output) on their dot, so split scrolls and palette or PPUMASK changes show from
+        the right pixel. The sprites are drawn as they are at the end of the line. Returns the VRAM address
+        after the line
+        """
+        start = self.frameStart + line * DOTS_PER_SCANLINE
+        # v as the CPU side has it, `SCROLL` entries only move the v of the line when the CPU changed it
+        cpuAddr = state.ppuaddr
+        shifter = PPU.TileDataShifter()
+        if state.ppumask & 0b11000:
+            # the first two tiles are fetched at the end of the line before
+            self.fetchTile(state, shifter)
+            shifter.shift8()
+            self.fetchTile(state, shifter)
+        i = 0
+        for dot in range(1, VISIBLE_DOTS + 2):
+            while i < len(writes) and writes[i][0] - start < dot:
+                _writeDot, register, value = writes[i]
+                if register == SCROLL:
+                    if value[0] != cpuAddr:
+                        state.ppuaddr = cpuAddr = value[0]
+                    state.tempaddr, state.finex = value[1:]
+                else:
+                    state.apply(register, value)
+                i += 1
+            self.tick(state, shifter, line, dot)
+        # the fast path has to slice the line again
+        self.backgroundOrigins[line] = -1
+        self.frame[line] = self.background[line]
+        self.lineVariants[line] = mask_variant(state.ppumask)
+        self.renderSprites(line, line + 1, state)
+        return state.ppuaddr
 
     def vBlank(self,vb):
         if(vb):#vblank starts
             self.ppustatus = self.ppustatus | 0b10000000 #updates vblank flag
+            self.pollControllers()
 
             generateNMI = (self.ppuctrl & 0b10000000) > 0
             if generateNMI:
-                self.nmi(self.cpu,self.memory)
+                if self.scheduler is not None:
+                    self.scheduler.schedule_now(EventType.NMI)
+                else:
+                    self.nmi(self.cpu,self.memory)
 
         else:#vblank ends
-            self.ppustatus = self.ppustatus & 0b01111111 # updates vblank flag
-
-    def scanLine(self,line):# TODO: 8x16 mode
-        nameTable = 0
-        attributeTable = 0
-        nameTableCtrlBits = (self.ppuctrl & 0b11)
-
-        if (nameTableCtrlBits == 0):
-            nameTable = 0x2000
-            attributeTable = 0x23C0
-        elif (nameTableCtrlBits==1):
-            nameTable = 0x2400
-            attributeTable = 0x27C0
-        elif (nameTableCtrlBits==2):
-            nameTable = 0x2800
-            attributeTable = 0x2BC0
-        else:
-            nameTable = 0x2C00
-            attributeTable = 0x2FC0
+            self.ppustatus = self.ppustatus & 0b00011111 # clears the vblank, sprite 0 hit and overflow flags
+
+    def scanLine(self,line):
+        self.endScanLine(line)
+        if line == VBLANK_SCANLINE:
+            self.vBlank(True)
+        if line == PRE_RENDER_SCANLINE:
+            self.vBlank(False)
+
+    def endScanLine(self,line):
+        if line < 240 and not self.deferred: #visible scanlines
+            if self.renderer == Renderer.REFERENCE:
+                self.renderBackgroundReference(line)
+                self.renderSpritesReference(line)
+            else:
+                self.renderLines(line, line + 1)
+
+            if line==239:
+                self.presentFrame()
+
+        if line < 240 and self.scheduler is None:
+            # without a clock the flags are only set once the line is done
+            if len(self.spriteZeroHits(line, line + 1)[0]):
+                self.ppustatus |= 0b1000000
+            if self.ppumask & 0b11000:
+                self.evaluateSprites()
+                if self.spriteCounts[line] > SPRITES_PER_LINE:
+                    self.ppustatus |= 0b100000
+
+        if (line < 240 or line == 261) and (self.ppumask & 0b00011000):
+            # down a line and back to the left, the pre-render line starts the frame over from t
+            self.ppuaddr = (increment_y(self.ppuaddr) & ~HORIZONTAL_BITS) | (self.tempaddr & HORIZONTAL_BITS)
+            if line == 261:
+                self.ppuaddr = (self.ppuaddr & ~VERTICAL_BITS) | (self.tempaddr & VERTICAL_BITS)
+            if self.mapper is not None:
+                self.mapper.scanline()
+
+
+    def renderLines(self, first, last, state=None):
+        """
+        Renders lines `first` to `last` - 1 into `self.frame` with NumPy indexing, as seen by `state` (a
+        `RenderState`, the PPU itself by default). Returns the VRAM address after the lines
+        """
+        if state is None:
+            state = self
+        ys, xs, v = line_origins(state, last - first)
+        self.renderBackground(first, last, state, ys, xs)
+        self.renderSprites(first, last, state)
+        return v
+
+    def renderBackground(self, first, last, state, ys, xs):
+        bitmap = self.playfield.sync(state)
+        origins = np.stack([ys, xs % PLAYFIELD_WIDTH], axis=1)
+        mask = state.ppumask & 0b1010
+        palettes = state.palletes_view[:0x10]
+        stale = ((origins != self.backgroundOrigins[first:last]).any(axis=1)
+                 | (self.backgroundMasks[first:last] != mask)
+                 | (self.backgroundPalettes[first:last] != palettes).any(axis=1)
+                 | (self.playfield.versions.max(axis=1)[ys // 8] > self.backgroundVersions[first:last]))
+        if stale.any():
+            lines = np.flatnonzero(stale)
+            # every line is a slice of the playfield, wrapping around its right edge
+            columns = (origins[lines, 1, np.newaxis] + np.arange(256)) % PLAYFIELD_WIDTH
+            indices = bitmap[origins[lines, 0, np.newaxis], columns]
+            if not mask & 0b1000:
+                indices[:] = 0
+            elif not mask & 0b10:
+                indices[:, :8] = 0
+            lines += first
+            self.background[lines] = palettes[indices] & 0x3F
+            self.bgOpaque[lines] = indices != 0
+            self.backgroundOrigins[lines] = origins[lines - first]
+            self.backgroundMasks[lines] = mask
+            self.backgroundPalettes[lines] = palettes
+            self.backgroundVersions[lines] = self.playfield.generation
+        self.frame[first:last] = self.background[first:last]
+        self.lineVariants[first:last] = mask_variant(state.ppumask)
+
+    def renderSprites(self, first, last, state):
+        if not state.ppumask & 0b10000:
+            return
+        index = state.evaluateSprites()[first:last]
+        if (index < 0).all():
+            return
+        # color code, palette and priority of the front sprite pixel, 8 columns wider for sprites past the edge
+        colorCodes = np.zeros((last - first, 256 + 8), dtype=np.uint8)
+        paletteNos = np.zeros_like(colorCodes)
+        behind = np.zeros(colorCodes.shape, dtype=bool)
+        # a slot has at most one sprite per line, the lower OAM numbers are in front so they are drawn last
+        for slot in reversed(range(SPRITES_PER_LINE)):
+            lines = np.flatnonzero(index[:, slot] >= 0)
+            if not len(lines):
+                continue
+            sprites = index[lines, slot]
+            spriteCodes = state.spriteRows(sprites, first + lines)
+            opaque = spriteCodes != 0
+            attributes = np.broadcast_to(state.oam[sprites * 4 + 2, np.newaxis], spriteCodes.shape)[opaque]
+            rows = np.broadcast_to(lines[:, np.newaxis], spriteCodes.shape)[opaque]
+            columns = (state.oam[sprites * 4 + 3].astype(np.intp)[:, np.newaxis] + np.arange(8))[opaque]
+            colorCodes[rows, columns] = spriteCodes[opaque]
+            paletteNos[rows, columns] = attributes & 0b11
+            behind[rows, columns] = (attributes & 0b100000) != 0
+        colorCodes = colorCodes[:, :256]
+        if not state.ppumask & 0b100:
+            colorCodes[:, :8] = 0
+        shown = (colorCodes != 0) & ~(behind[:, :256] & self.bgOpaque[first:last])
+        sprites = state.palletes_view[0x10 + paletteNos[:, :256] * 4 + colorCodes] & 0x3F
+        self.frame[first:last][shown] = sprites[shown]
+
+    def renderBackgroundReference(self, line):
+        #where the line starts in the 2x2 nametables, see `line_origins`
+        (y,), (x,), _v = line_origins(self, 1)
 
         patternTable = 0
         patternTableCtrlBits = (self.ppuctrl & 0b10000)
@@ -377,57 +919,162 @@ class PPU:
         else:
             patternTable = 0x1000
 
-        if line < 240: #visible scanlines
-            for i in range(256):
-
-                #calculates the tile position
-                tileVer = line//8
-                tileHor = i//8
-                tileNo = 32*tileVer+tileHor
-
-                #gets the tile type by looking at name table
-                tileType = self.fetch(nameTable+tileNo) #1 byte tile
-
-                patternVer = line%8
-                patternHor = i%8
+        for i in range(256):
+            scrolledHor = (x+i)%512
+
+            #which of the 4 nametables
+            nameTable = 0x2000 + 0x400*(2*(y//240) + scrolledHor//256)
+            attributeTable = nameTable + 0x3C0
+            screenVer = y%240
+            screenHor = scrolledHor%256
+
+            #calculates the tile position
+            tileVer = screenVer//8
+            tileHor = screenHor//8
+            tileNo = 32*tileVer+tileHor
+
+            #gets the tile type by looking at name table
+            tileType = self.fetch(nameTable+tileNo) #1 byte tile
+
+            patternVer = screenVer%8
+            patternHor = screenHor%8
+
+            #gets the pattern
+            patternlo = self.fetch(patternTable+tileType*16+patternVer)
+            patternhi = self.fetch(patternTable+tileType*16+8+patternVer)
+
+            #gets the colorCode
+            hiBit = (patternhi&(1<<7-patternHor)) > 0
+            loBit = (patternlo&(1<<7-patternHor)) > 0
+            colorCode = hiBit*2 + loBit
+
+            #which block
+            blockVer = screenVer//32
+            blockHor = screenHor//32
+            blockNo = 8*blockVer + blockHor
+            attribute = self.fetch(attributeTable+blockNo)
+
+            #which tile in block
+            whichTile = 0
+            offVer = screenVer%32
+            offHor = screenHor%32
+            if (offVer<16 and offHor<16):
+                whichTile=0
+            elif (offVer<16 and offHor>=16):
+                whichTile=1
+            elif (offVer>=16 and offHor<16):
+                whichTile=2
+            else:
+                whichTile=3
+
+            #hidden background, or its left column, shows the backdrop
+            if not self.ppumask & 0b1000 or (i < 8 and not self.ppumask & 0b10):
+                colorCode = 0
+
+            paletteNo = ((attribute & (0b11 << whichTile*2)) >> whichTile*2)
+            if colorCode == 0: #transparent pixels are all the backdrop color
+                paletteNo = 0
+            self.frame[line, i] = self.fetch(PPUMemoryPositions.PALLETES.start + paletteNo*4 + colorCode) & 0x3F
+            self.bgOpaque[line, i] = colorCode != 0
+        self.lineVariants[line] = mask_variant(self.ppumask)
+
+    def renderSpritesReference(self, line):
+        if not self.ppumask & 0b10000:
+            return
+        height = 16 if self.ppuctrl & 0b100000 else 8
+
+        #the first 8 sprites in range, in OAM order
+        sprites = []
+        for n in range(64):
+            y, tileType, attribute, x = [int(byte) for byte in self.oam[n*4:n*4+4]]
+            if 0 <= line-(y+1) < height and len(sprites) < 8:
+                sprites.append((y, tileType, attribute, x))
+
+        for i in range(256):
+            for y, tileType, attribute, x in sprites:
+                patternHor = i-x
+                if not 0 <= patternHor < 8:
+                    continue
+                patternVer = line-(y+1)
+                if attribute & 0b10000000: #vertical flip
+                    patternVer = height-1-patternVer
+                if attribute & 0b1000000: #horizontal flip
+                    patternHor = 7-patternHor
+
+                if height == 16:
+                    patternTable = (tileType & 1) * 0x1000
+                    tileType = (tileType & 0xFE) + patternVer//8
+                    patternVer = patternVer%8
+                else:
+                    patternTable = 0x1000 if self.ppuctrl & 0b1000 else 0x0
 
-                #gets the pattern
                 patternlo = self.fetch(patternTable+tileType*16+patternVer)
                 patternhi = self.fetch(patternTable+tileType*16+8+patternVer)
-
-                #gets the colorCode
                 hiBit = (patternhi&(1<<7-patternHor)) > 0
                 loBit = (patternlo&(1<<7-patternHor)) > 0
                 colorCode = hiBit*2 + loBit
-
-                #which block
-                blockVer = line//32
-                blockHor = i//32
-                blockNo = 8*blockVer + blockHor
-                attribute = self.fetch(attributeTable+blockNo)
-
-                #which tile in block
-                whichTile = 0
-                offVer = line%32
-                offHor = i%32
-                if (offVer<16 and offHor<16):
-                    whichTile=0
-                elif (offVer<16 and offHor>=16):
-                    whichTile=1
-                elif (offVer>=16 and offHor<16):
-                    whichTile=2
-                else:
-                    whichTile=3
-
-                paletteNo = ((attribute & (0b11 << whichTile*2)) >> whichTile*2)
-                color = self.bgPalettes[paletteNo][colorCode]
-                self.screen.setPixel(i,line,color)
-
-            if line==239:
-                self.screen.flip()
-
-        if line==241: # vblank
-            self.vBlank(True)
-        if line== 261:
-            self.vBlank(False)
-
+                if colorCode == 0: #transparent, the next sprite may show
+                    continue
+
+                #the front sprite hides the others, even behind the background or clipped
+                clipped = i < 8 and not self.ppumask & 0b100
+                if not clipped and not (attribute & 0b100000 and self.bgOpaque[line, i]):
+                    self.frame[line, i] = self.fetch(0x3F10 + (attribute&0b11)*4 + colorCode) & 0x3F
+                break
+
+
+class RenderState:
+    """
+    What the renderer reads, copied from the PPU at the start of a frame and brought forward by
+    `apply`-ing the render log. It has the same attributes as the PPU, so the PPU methods work on it too.
+    """
+    patternTiles = PPU.patternTiles
+    evaluateSprites = PPU.evaluateSprites
+    spriteRows = PPU.spriteRows
+
+    def __init__(self, ppu):
+        self.ppuctrl = ppu.ppuctrl
+        self.ppumask = ppu.ppumask
+        self.nametables_view = ppu.nametables_view.copy()
+        self.palletes_view = ppu.palletes_view.copy()
+        self.nametable_offsets = ppu.nametable_offsets
+        # only the VRAM offsets of the decode table are used, they index the copy as well
+        self.decode = ppu.decode
+        self.ppuaddr = ppu.ppuaddr
+        self.tempaddr = ppu.tempaddr
+        self.finex = ppu.finex
+        self.playfield = ppu.playfield
+        self.chr_slots = list(ppu.chr_slots)
+        self.chr_caches = list(ppu.chr_caches)
+        self.oam = ppu.oam.copy()
+        self.oamaddr = ppu.oamaddr
+        # the evaluation is never changed in place, it can be shared until OAM changes
+        self.spriteIndex = ppu.spriteIndex
+        self.spriteCounts = ppu.spriteCounts
+        self.spriteHeight = ppu.spriteHeight
+
+    def apply(self, register, value):
+        if register == 0x2000:
+            self.ppuctrl = value
+        elif register == 0x2001:
+            self.ppumask = value
+        elif register == 0x2003:
+            self.oamaddr = value
+        elif register == 0x2004:
+            PPU.storeOAM(self, value)
+        elif register == 0x2007:
+            offset, value = value
+            self.nametables_view[offset] = value
+            self.playfield.store(self, offset)
+        elif register == PALETTE:
+            index, value = value
+            self.palletes_view[index] = value
+        elif register == CHR_BANK:
+            slot, self.chr_slots[slot], self.chr_caches[slot] = value
+        elif register == MIRRORING:
+            self.nametable_offsets, self.decode = value
+        elif register == SCROLL:
+            self.ppuaddr, self.tempaddr, self.finex = value
+        elif register == OAM:
+            self.oam = value
+            self.spriteIndex = None
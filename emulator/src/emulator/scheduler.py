@@ -0,0 +1,67 @@
+import heapq
+from enum import unique, Enum, auto
+
+from emulator.constants import DOTS_PER_CYCLE
+
+
+@unique
+class EventType(Enum):
+    SCANLINE = auto()  # end of a scanline
+    FRAME = auto()  # end of the pre-render scanline
+    VBLANK_SET = auto()
+    VBLANK_CLEAR = auto()
+    NMI = auto()
+    IRQ = auto()
+    DMA_STALL = auto()  # the CPU is halted during OAM DMA
+    SPRITE_ZERO_HIT = auto()
+    SPRITE_OVERFLOW = auto()
+    SYNC = auto()  # wall-clock pacing
+
+
+class Scheduler:
+    """
+    Master clock, counted in PPU dots (3 per CPU cycle) so scanlines of 341 dots end on exact deadlines.
+
+    Timed events are kept in a heap of `(dot, sequence, event, args)`, events due at the same dot fire in the
+    order they were scheduled. The main loop runs the CPU straight through to `deadline` and then calls
+    `run_due`, which passes every due event to the handler registered with `on` as `handler(dot, *args)`.
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.queue = []
+        self.sequence = 0
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    @property
+    def now(self):
+        return self.cpu.cycle * DOTS_PER_CYCLE
+
+    @property
+    def deadline(self):
+        """
+        First CPU cycle at which an event is due
+        """
+        if not self.queue:
+            return float("inf")
+        return -(-self.queue[0][0] // DOTS_PER_CYCLE)
+
+    def schedule(self, dot, event, *args):
+        heapq.heappush(self.queue, (dot, self.sequence, event, args))
+        self.sequence += 1
+
+    def schedule_now(self, event, *args):
+        self.schedule(self.now, event, *args)
+
+    def cancel(self, event):
+        self.queue = [entry for entry in self.queue if entry[2] != event]
+        heapq.heapify(self.queue)
+
+    def run_due(self):
+        # handlers may add cycles (DMA) or schedule events that are already due, so `now` is read on every turn
+        while self.queue and self.queue[0][0] <= self.now:
+            dot, _sequence, event, args = heapq.heappop(self.queue)
+            self.handlers[event](dot, *args)
@@ -0,0 +1,36 @@
+import random
+
+from emulator.constants import Mirroring
+from emulator.cpu import CPU
+from emulator.ppu import PPU, Renderer
+from emulator.scheduler import Scheduler
+from emulator.window import HeadlessWindow
+
+
+def random_bytes(rng, count):
+    # Random.randbytes needs Python 3.9
+    return rng.getrandbits(count * 8).to_bytes(count, "little")
+
+
+def clocked_ppu(chr_rom=None, **kwargs):
+    """
+    Headless PPU with a CPU at cycle 0 and its scheduler, returns `(cpu, scheduler, ppu)`. The PPU isn't attached,
+    the test sets it up first and then calls `ppu.attach(scheduler)`
+    """
+    cpu = CPU()
+    cpu.cycle = 0
+    scheduler = Scheduler(cpu)
+    ppu = PPU(bytes(0x2000) if chr_rom is None else chr_rom, screen=HeadlessWindow(), **kwargs)
+    return cpu, scheduler, ppu
+
+
+def random_ppu(seed=1, mirroring=Mirroring.VERTICAL, renderer=Renderer.NUMPY):
+    """
+    Headless PPU with random CHR ROM, nametables and palettes
+    """
+    rng = random.Random(seed)
+    ppu = PPU(random_bytes(rng, 0x2000), mirroring=mirroring, renderer=renderer, screen=HeadlessWindow())
+    ppu.nametables[:] = random_bytes(rng, 0x1000)
+    for addr in range(0x3F00, 0x3F20):
+        ppu.store(addr, rng.getrandbits(6))
+    return ppu
@@ -0,0 +1,99 @@
+import pytest
+
+from emulator.cartridge import Cartridge, INesHeader
+from emulator.memory import Memory
+
+
+def _image(flags_6=0x00, flags_7=0x00, prg_banks=1, chr_banks=1, byte_8=0x00, byte_9=0x00, byte_10=0x00, trainer=b""):
+    header = bytes([0x4E, 0x45, 0x53, 0x1A, prg_banks, chr_banks, flags_6, flags_7, byte_8, byte_9, byte_10, 0, 0, 0, 0, 0])
+    prg = bytes([0xAA]) * (prg_banks * 0x4000)
+    chr = bytes([0xBB]) * (chr_banks * 0x2000)
+    return header + trainer + prg + chr
+
+
+def test_header_flags():
+    header = INesHeader.from_bytes(_image(flags_6=0b00010011, flags_7=0b01000000))
+    assert header.mapper == 0x41
+    assert header.vertical_mirroring
+    assert header.battery
+    assert not header.trainer and not header.four_screen and not header.nes2
+
+
+def test_nes2_header():
+    header = INesHeader.from_bytes(_image(flags_7=0b00001000, byte_8=0x21, byte_9=0x00, byte_10=0x70))
+    assert header.nes2
+    assert header.mapper == 0x100
+    assert header.submapper == 2
+    assert header.prg_ram_size == 0
+    assert header.prg_nvram_size == 0x2000
+
+
+def test_invalid_header():
+    with pytest.raises(ValueError):
+        INesHeader.from_bytes(b"NOTANESFILE" + bytes(16))
+
+
+def test_trainer_is_loaded_at_7000():
+    cartridge = Cartridge.from_bytes(_image(flags_6=0b00000100, trainer=bytes([0xCC]) * 512))
+    assert len(cartridge.trainer) == 512
+    assert cartridge.prg_rom[0] == 0xAA and len(cartridge.prg_rom) == 0x4000
+    assert cartridge.chr_rom[0] == 0xBB and len(cartridge.chr_rom) == 0x2000
+    memory = Memory()
+    cartridge.mapper.attach(memory)
+    assert [memory.fetch(addr) for addr in (0x6FFF, 0x7000, 0x71FF, 0x7200)] == [0x00, 0xCC, 0xCC, 0x00]
+
+
+def test_truncated_image_is_padded():
+    cartridge = Cartridge.from_bytes(_image()[:-0x1000])
+    assert len(cartridge.chr_rom) == 0x2000
+    assert cartridge.chr_rom[-1] == 0x00
+
+
+def test_from_file_maps_the_image(tmp_path):
+    path = tmp_path / "test.nes"
+    path.write_bytes(_image(prg_banks=2))
+    cartridge = Cartridge.from_file(str(path))
+    assert isinstance(cartridge.prg_rom, memoryview)
+    assert len(cartridge.prg_rom) == 0x8000
+    assert cartridge.prg_rom[-1] == 0xAA
+
+
+def test_prg_ram():
+    cartridge = Cartridge.from_bytes(_image())
+    memory = Memory()
+    cartridge.mapper.attach(memory)
+    memory.store(0x6000, 0x42)
+    assert cartridge.prg_ram[0] == 0x42
+    assert memory.fetch(0x6000) == 0x42
+
+
+def test_battery_backed_prg_ram_is_saved(tmp_path):
+    path = tmp_path / "game.nes"
+    path.write_bytes(_image(flags_6=0b00000010))
+    cartridge = Cartridge.from_file(str(path))
+    memory = Memory()
+    cartridge.mapper.attach(memory)
+    memory.store(0x7FFF, 0x42)
+
+    # the save file is the RAM itself, nothing has to be flushed
+    save = (tmp_path / "game.sav").read_bytes()
+    assert len(save) == 0x2000 and save[-1] == 0x42
+
+    cartridge = Cartridge.from_file(str(path))
+    memory = Memory()
+    cartridge.mapper.attach(memory)
+    assert memory.fetch(0x7FFF) == 0x42
+
+
+def test_only_the_nvram_is_saved(tmp_path):
+    # NES 2.0: 8KB of volatile PRG RAM and 2KB of NVRAM
+    path = tmp_path / "game.nes"
+    path.write_bytes(_image(flags_6=0b00000010, flags_7=0b00001000, byte_10=0x57))
+    cartridge = Cartridge.from_file(str(path))
+    assert isinstance(cartridge.prg_ram, bytearray) and len(cartridge.prg_ram) == 0x2000
+    memory = Memory()
+    cartridge.mapper.attach(memory)
+    memory.store(0x6001, 0x42)
+
+    save = (tmp_path / "game.sav").read_bytes()
+    assert len(save) == 0x800 and save[1] == 0x42
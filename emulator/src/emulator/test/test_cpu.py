@@ -0,0 +1,39 @@
+from emulator.cpu import CPU, CPUState
+
+
+def test_flags_are_packed():
+    cpu = CPU()
+    cpu.flags = 0x00
+    assert cpu.flags == 0b00100000
+
+    cpu.carry = True
+    cpu.zero = True
+    cpu.negative = True
+    assert cpu.flags == 0b10100011
+    assert cpu.carry and cpu.zero and cpu.negative
+    assert not (cpu.overflow or cpu.decimal or cpu.interrupts_disabled or cpu.break_command)
+
+    cpu.zero = False
+    assert cpu.flags == 0b10100001
+
+    cpu.flags = 0xFF
+    assert cpu.overflow and cpu.decimal and cpu.interrupts_disabled and cpu.break_command
+
+
+def test_cpus_do_not_share_registers():
+    cpu_1 = CPU()
+    cpu_2 = CPU()
+    cpu_1.a = 0x42
+    cpu_1.carry = True
+    assert cpu_2.a == 0
+    assert not cpu_2.carry
+
+
+def test_state_str():
+    state = CPUState(pc=0xC5F5, sp=0x01FD, a=0x01, x=0x02, y=0x03, p=0x24, log_compatible_mode=True)
+    assert str(state) == "A:01 X:02 Y:03 P:24 SP:FD"
+
+    cpu = CPU(state=CPUState(pc=0xC002, sp=0x01FD, a=0x0F, p=0x34))
+    assert str(cpu) == "| pc = 0xc002 | a = 0x0f | x = 0x00 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 |"
+    state = CPUState(pc=0xC002, sp=0x01FD, a=0x0F, p=0x34, addr=0x0200, data=0x10)
+    assert str(state).endswith("| p[NV-BDIZC] = 00110100 | MEM[0x0200] = 0x10 |")
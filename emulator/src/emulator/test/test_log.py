@@ -0,0 +1,37 @@
+import io
+
+from emulator.log import Category, Level, Log
+
+
+def test_categories_are_disabled_by_default():
+    log = Log()
+    assert not log.io
+    log.debug(Category.IO, "strobe %d", 1)
+    assert not log.records
+
+
+def test_level_gating():
+    log = Log()
+    log.enable(Category.CPU, Level.WARNING)
+    assert log.cpu and not log.ppu
+    log.debug(Category.CPU, "ignored")
+    log.error(Category.CPU, "%s at 0x%04X", "oops", 0xC000)
+    assert list(log.lines()) == ["CPU       ERROR   oops at 0xC000"]
+
+
+def test_errors_are_recorded_in_disabled_categories():
+    log = Log()
+    log.warning(Category.CPU, "ignored")
+    log.error(Category.CPU, "%s at 0x%04X", "IndexError", 0xC000)
+    assert list(log.lines()) == ["CPU       ERROR   IndexError at 0xC000"]
+
+
+def test_ring_buffer_keeps_the_last_records():
+    log = Log(size=3)
+    log.enable(Category.INTERRUPT)
+    for i in range(5):
+        log.debug(Category.INTERRUPT, "NMI %d", i)
+    out = io.StringIO()
+    log.dump(out)
+    assert out.getvalue() == "".join("INTERRUPT DEBUG   NMI {}\n".format(i) for i in range(2, 5))
+    assert not log.records
@@ -0,0 +1,156 @@
+from emulator.cartridge import Cartridge
+from emulator.constants import Mirroring
+from emulator.cpu import CPU
+from emulator.memory import Memory
+from emulator.pacing import Pacer
+from emulator.ppu import PPU
+from emulator.window import HeadlessWindow
+from main import create_scheduler, run_cpu
+
+
+def _cartridge(mapper, prg_banks, chr_banks, flags_6=0x00):
+    """
+    Every 8KB PRG bank and 1KB CHR bank is filled with its own number
+    """
+    header = bytes([0x4E, 0x45, 0x53, 0x1A, prg_banks, chr_banks, ((mapper & 0x0F) << 4) | flags_6, mapper & 0xF0,
+                    0, 0, 0, 0, 0, 0, 0, 0])
+    prg = b"".join(bytes([bank]) * 0x2000 for bank in range(prg_banks * 2))
+    chr = b"".join(bytes([bank]) * 0x0400 for bank in range(chr_banks * 8))
+    cartridge = Cartridge.from_bytes(header + prg + chr)
+    memory = Memory()
+    ppu = PPU(cartridge.chr_rom, mirroring=cartridge.header.mirroring, screen=HeadlessWindow())
+    cartridge.mapper.attach(memory, ppu)
+    return cartridge.mapper, memory, ppu
+
+
+def _prg_banks(memory):
+    return [memory.fetch(addr) for addr in (0x8000, 0xA000, 0xC000, 0xE000)]
+
+
+def _chr_banks(ppu):
+    return [ppu.fetch(addr) for addr in range(0x0000, 0x2000, 0x0400)]
+
+
+def test_nrom():
+    _mapper, memory, _ppu = _cartridge(0, 1, 1)
+    assert _prg_banks(memory) == [0, 1, 0, 1]
+    _mapper, memory, _ppu = _cartridge(0, 2, 1)
+    assert _prg_banks(memory) == [0, 1, 2, 3]
+    memory.store(0x8000, 0xFF)
+    assert memory.fetch(0x8000) == 0
+
+
+def test_uxrom():
+    _mapper, memory, ppu = _cartridge(2, 4, 0)
+    assert _prg_banks(memory) == [0, 1, 6, 7]
+    memory.store(0x8000, 2)
+    assert _prg_banks(memory) == [4, 5, 6, 7]
+    # CHR RAM
+    ppu.store(0x0010, 0x42)
+    assert ppu.fetch(0x0010) == 0x42
+
+
+def test_cnrom():
+    _mapper, memory, ppu = _cartridge(3, 2, 4)
+    memory.store(0x8000, 3)
+    assert _chr_banks(ppu) == list(range(24, 32))
+
+
+def _mmc1_write(memory, addr, value):
+    for bit in range(5):
+        memory.store(addr, (value >> bit) & 1)
+
+
+def test_mmc1():
+    mapper, memory, ppu = _cartridge(1, 8, 4)
+    assert _prg_banks(memory)[2:] == [14, 15]
+    # PRG mode 3, 4KB CHR, horizontal mirroring
+    _mmc1_write(memory, 0x8000, 0b11111)
+    _mmc1_write(memory, 0xE000, 2)
+    _mmc1_write(memory, 0xA000, 3)
+    _mmc1_write(memory, 0xC000, 6)
+    assert _prg_banks(memory) == [4, 5, 14, 15]
+    assert _chr_banks(ppu) == [12, 13, 14, 15, 24, 25, 26, 27]
+    assert ppu.mirroring == Mirroring.HORIZONTAL
+
+    # a write with bit 7 set resets the shift register
+    memory.store(0xE000, 1)
+    memory.store(0xE000, 0x80)
+    _mmc1_write(memory, 0xE000, 5)
+    assert _prg_banks(memory) == [10, 11, 14, 15]
+
+
+def test_mmc3_banks():
+    mapper, memory, ppu = _cartridge(4, 4, 4)
+    for register, bank in enumerate([8, 10, 1, 2, 3, 4, 5, 3]):
+        memory.store(0x8000, register)
+        memory.store(0x8001, bank)
+    assert _prg_banks(memory) == [5, 3, 6, 7]
+    assert _chr_banks(ppu) == [8, 9, 10, 11, 1, 2, 3, 4]
+
+    memory.store(0x8000, 0b11000000)
+    assert _prg_banks(memory) == [6, 3, 5, 7]
+    assert _chr_banks(ppu) == [1, 2, 3, 4, 8, 9, 10, 11]
+
+    memory.store(0xA000, 1)
+    assert ppu.mirroring == Mirroring.HORIZONTAL
+
+
+def test_mmc3_irq():
+    mapper, memory, ppu = _cartridge(4, 2, 1)
+    cpu = CPU()
+    irqs = []
+    mapper.set_irq(cpu, lambda cpu, memory: irqs.append(cpu))
+
+    memory.store(0xC000, 2)
+    memory.store(0xC001, 0)
+    memory.store(0xE001, 0)
+    mapper.scanline()
+    mapper.scanline()
+    assert irqs == []
+    mapper.scanline()
+    assert len(irqs) == 1
+
+    # acknowledged
+    memory.store(0xE000, 0)
+    mapper.scanline()
+    assert len(irqs) == 1
+
+
+def test_mmc3_irq_masked_by_sei_is_taken_after_cli():
+    header = bytes([0x4E, 0x45, 0x53, 0x1A, 2, 1, 0x40, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+    prg = bytearray(0x8000)  # $E000-$FFFF is the last 8KB
+    prg[0x6000:0x6008] = [0x78, 0xEA, 0x58, 0xEA, 0xEA, 0x4C, 0x05, 0xE0]  # SEI, NOP, CLI, NOP, NOP, JMP $E005
+    prg[0x6100:0x6104] = [0x8D, 0x00, 0xE0, 0x40]  # STA $E000 (acknowledge), RTI
+    prg[0x7FFE:0x8000] = [0x00, 0xE1]
+    cartridge = Cartridge.from_bytes(header + bytes(prg) + bytes(0x2000))
+    memory = Memory()
+    ppu = PPU(cartridge.chr_rom, screen=HeadlessWindow())
+    cartridge.mapper.attach(memory, ppu)
+    cpu = CPU()
+    cpu.pc = 0xE000
+    scheduler = create_scheduler(cpu, memory, ppu, cartridge.mapper, Pacer.unthrottled())
+
+    def step():
+        run_cpu(cpu, memory, min(scheduler.deadline, cpu.cycle + 1), None)
+        scheduler.run_due()
+        return cpu.pc
+
+    assert step() == 0xE001 and cpu.interrupts_disabled
+    cartridge.mapper.request_irq()
+    scheduler.run_due()
+    assert cpu.pc == 0xE001
+    assert step() == 0xE002
+    # taken as soon as CLI clears I, and not again once acknowledged
+    assert step() == 0xE100
+    assert [step(), step(), step()] == [0xE103, 0xE003, 0xE004]
+
+
+def test_mmc3_prg_ram_protect():
+    _mapper, memory, _ppu = _cartridge(4, 2, 1)
+    memory.store(0x6000, 0x42)
+    memory.store(0xA001, 0b11000000)
+    memory.store(0x6000, 0x00)
+    assert memory.fetch(0x6000) == 0x42
+    memory.store(0xA001, 0b00000000)
+    assert memory.fetch(0x6000) != 0x42
@@ -0,0 +1,67 @@
+from emulator.cpu import CPU
+from emulator.memory import Memory, MemoryPositions
+
+
+def test_ram_mirrors():
+    memory = Memory()
+    memory.store(0x0812, 0x42)
+    assert memory.ram[0x0012] == 0x42
+    for addr in [0x0012, 0x0812, 0x1012, 0x1812]:
+        assert memory.fetch(addr) == 0x42
+        assert memory.get_effective_address(addr) == 0x0012
+    assert memory.get_effective_address(0xC012) == 0xC012
+
+
+def test_prg_rom_16k_is_mirrored():
+    rom = [page for page in range(0x40) for _ in range(0x100)]
+    memory = Memory(rom=rom)
+    assert memory.fetch(0x8000) == 0x00
+    assert memory.fetch(0xC000) == 0x00
+    assert memory.fetch(0xBFFF) == 0x3F
+    assert memory.fetch(0xFFFF) == 0x3F
+
+
+def test_prg_rom_32k():
+    rom = [page for page in range(0x80) for _ in range(0x100)]
+    memory = Memory(rom=rom)
+    assert memory.fetch(0x8000) == 0x00
+    assert memory.fetch(0xC000) == 0x40
+    assert memory.fetch(0xFFFF) == 0x7F
+
+
+def test_prg_rom_writes_are_ignored():
+    memory = Memory(rom=[0x00] * 0x4000)
+    memory.store(0xC000, 0x42)
+    assert memory.fetch(0xC000) == 0x00
+
+
+def test_stack_wraps_around():
+    cpu = CPU()
+    memory = Memory()
+    cpu.sp = MemoryPositions.STACK.start
+    memory.stack_push(cpu, 0x42)
+    assert cpu.sp == MemoryPositions.STACK.end
+    assert memory.ram[MemoryPositions.STACK.start] == 0x42
+    assert memory.stack_pop(cpu) == 0x42
+    assert cpu.sp == MemoryPositions.STACK.start
+
+
+def test_snapshot_and_restore():
+    memory = Memory()
+    memory.store(0x0010, 0x42)
+    snapshot = memory.snapshot()
+    memory.store(0x0810, 0x00)
+    assert memory.snapshot() != snapshot
+    memory.restore(snapshot)
+    assert memory.fetch(0x1010) == 0x42
+    assert memory.snapshot() == snapshot
+
+
+def test_io_registers_without_a_ppu():
+    memory = Memory()
+    memory.store(0x4014, 0x02)
+    memory.store(0x4016, 1)
+    memory.store(0x2000, 0x80)
+    assert memory.fetch(0x4014) == 0x00
+    assert memory.fetch(0x2002) == 0x00
+    assert memory.fetch(0x4016, ld=1) == 0xFF
@@ -0,0 +1,40 @@
+from emulator.cpu import CPU
+from emulator.memory import Memory, MemoryPositions
+from emulator.opcodes.opcodes import OpCodes
+
+
+def test_table_covers_every_opcode():
+    assert len(OpCodes.table) == 0x100
+    for code, instruction in enumerate(OpCodes.table):
+        assert instruction.id == code
+        if code in OpCodes.all:
+            assert instruction is OpCodes.all[code]
+
+
+def test_JAM_halts():
+    cpu = CPU()
+    memory = Memory()
+    for code in [0x02, 0x12, 0x22, 0x32, 0x42, 0x52, 0x62, 0x72, 0x92, 0xB2, 0xD2, 0xF2]:
+        assert OpCodes.table[code].exec(cpu, memory)
+
+
+def test_BRK_halts():
+    cpu = CPU()
+    memory = Memory(rom=[0x00] * 0x4000)
+    cpu.inc_pc_by(-cpu.pc + MemoryPositions.PRG_ROM_START.start)
+    assert OpCodes.table[0x00].exec(cpu, memory)
+
+
+def test_unimplemented_does_not_halt():
+    cpu = CPU()
+    memory = Memory()
+    cpu.inc_cycle_by(-cpu.cycle)
+    pc = cpu.pc
+    instruction = OpCodes.table[0x0B]
+    assert 0x0B not in OpCodes.all
+    assert not instruction.exec(cpu, memory)
+    assert cpu.pc == pc
+    assert cpu.cycle == instruction.cycles - 1
+
+    # regular instructions don't signal anything
+    assert not OpCodes.table[0xEA].exec(cpu, memory)
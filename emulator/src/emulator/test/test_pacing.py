@@ -0,0 +1,71 @@
+from emulator.constants import CPU_FREQUENCY, CYCLES_PER_FRAME, FRAME_RATE
+from emulator.pacing import Pacer, PacingMode
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_realtime_sleeps_once_per_frame():
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.REALTIME, clock=clock.clock, sleep=clock.sleep)
+
+    cycle = 0
+    while cycle < 10 * CYCLES_PER_FRAME:
+        cycle += 3
+        if cycle >= pacer.next_sync:
+            pacer.throttle(cycle)
+
+    assert len(clock.sleeps) == 10
+    # no time passes between instructions, so we should end up exactly where the console would be
+    assert abs((clock.now - 100.0) - 10 / FRAME_RATE) < 1e-3
+
+
+def test_realtime_corrects_drift():
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.REALTIME, clock=clock.clock, sleep=clock.sleep)
+
+    # emulation took half a frame longer than expected, the next frame gets a shorter sleep
+    clock.now += 1.5 / FRAME_RATE
+    pacer.throttle(int(CYCLES_PER_FRAME))
+    assert clock.sleeps == []
+    pacer.throttle(int(2 * CYCLES_PER_FRAME))
+    assert abs(clock.sleeps[0] - 0.5 / FRAME_RATE) < 1e-4
+
+
+def test_realtime_drops_large_lag():
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.REALTIME, clock=clock.clock, sleep=clock.sleep)
+
+    clock.now += 10
+    pacer.throttle(int(CYCLES_PER_FRAME))
+    pacer.throttle(int(2 * CYCLES_PER_FRAME))
+    assert len(clock.sleeps) == 1
+    assert abs(clock.sleeps[0] - 1 / FRAME_RATE) < 1e-4
+
+
+def test_multiplier():
+    clock = FakeClock()
+    pacer = Pacer(PacingMode.MULTIPLIER, speed=2.0, clock=clock.clock, sleep=clock.sleep)
+
+    pacer.throttle(int(CPU_FREQUENCY))
+    assert abs(clock.sleeps[0] - 0.5) < 1e-6
+
+
+def test_unthrottled_never_syncs():
+    clock = FakeClock()
+    pacer = Pacer.unthrottled()
+    pacer.sleep = clock.sleep
+
+    assert not (10 ** 12 >= pacer.next_sync)
+    pacer.throttle(10 ** 12)
+    assert clock.sleeps == []
@@ -0,0 +1,42 @@
+from emulator.patterns import PatternCache, decode_tiles
+from emulator.ppu import PPU
+from emulator.window import HeadlessWindow
+
+
+def _tile(lo, hi):
+    return [lo] * 8 + [hi] * 8
+
+
+def test_decode_tiles():
+    # low plane 0b10100000, high plane 0b11000000
+    tiles = decode_tiles(_tile(0xA0, 0xC0) + _tile(0x00, 0x01))
+    assert tiles.shape == (2, 8, 8)
+    assert list(tiles[0, 3]) == [3, 2, 1, 0, 0, 0, 0, 0]
+    assert list(tiles[1, 7]) == [0, 0, 0, 0, 0, 0, 0, 2]
+
+
+def test_invalidated_tiles_are_decoded_again():
+    chr_ram = bytearray(0x20)
+    cache = PatternCache(chr_ram)
+    chr_ram[0x18] = 0x80
+    assert cache.decoded()[1, 0, 0] == 0
+    cache.invalidate(0x18)
+    assert cache.decoded()[1, 0, 0] == 2
+    assert not cache.dirty
+
+
+def test_ppu_chr_ram_writes_update_the_tiles():
+    ppu = PPU([0x00] * 0x2000, screen=HeadlessWindow())
+    ppu.map_chr(0, bytearray(0x2000), writable=True)
+    ppu.store(0x1010, 0xFF)
+    assert list(ppu.patternTiles(0x1000)[1, 0]) == [1] * 8
+    assert not ppu.patternTiles(0x0000).any()
+
+
+def test_ppu_pattern_tiles_follow_chr_banks():
+    chr_rom = bytes(_tile(0xFF, 0x00) * 64 + _tile(0x00, 0xFF) * 64) * 4
+    ppu = PPU(chr_rom, screen=HeadlessWindow())
+    assert ppu.patternTiles(0x0000)[64, 0, 0] == 2
+    ppu.map_chr(4, chr_rom, 0x0400, 0x0400)
+    assert ppu.patternTiles(0x1000)[0, 0, 0] == 2
+    assert ppu.patternTiles(0x1000)[64, 0, 0] == 2
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+
+from emulator.constants import Mirroring
+from emulator.playfield import Playfield
+from emulator.test.helpers import random_ppu
+
+
+def test_playfield_is_drawn_from_the_nametables():
+    ppu = random_ppu(mirroring=Mirroring.HORIZONTAL)
+    bitmap = ppu.playfield.sync(ppu)
+    assert bitmap.shape == (480, 512)
+    # horizontal mirroring, the left and right nametables are the same
+    assert np.array_equal(bitmap[:, :256], bitmap[:, 256:])
+    assert not np.array_equal(bitmap[:240], bitmap[240:])
+    # palette * 4 + color, 0 when transparent
+    colorCodes = ppu.patternTiles(0x0)[ppu.nametables[0]]
+    attribute = ppu.nametables[0x3C0] & 0b11
+    assert np.array_equal(bitmap[:8, :8], np.where(colorCodes != 0, attribute * 4 + colorCodes, 0))
+
+
+def test_playfield_writes_only_draw_their_tiles():
+    ppu = random_ppu(mirroring=Mirroring.VERTICAL)
+    ppu.playfield.sync(ppu)
+    rng = random.Random(2)
+    for _ in range(100):
+        ppu.store(0x2000 + rng.randrange(0x1000), rng.getrandbits(8))
+    expected = Playfield().sync(ppu)
+    assert np.array_equal(ppu.playfield.sync(ppu), expected)
+
+
+def test_playfield_follows_the_background_pattern_table():
+    ppu = random_ppu(mirroring=Mirroring.VERTICAL)
+    low = ppu.playfield.sync(ppu).copy()
+    ppu.ppuctrl = 0b10000
+    assert not np.array_equal(ppu.playfield.sync(ppu), low)
+    ppu.ppuctrl = 0
+    assert np.array_equal(ppu.playfield.sync(ppu), low)
+
+
+def test_chr_ram_writes_mark_the_tiles_using_the_pattern():
+    ppu = random_ppu(mirroring=Mirroring.VERTICAL)
+    ppu.map_chr(0, bytearray(0x2000), writable=True)
+    ppu.playfield.sync(ppu)
+    ppu.store(0x0015, 0xFF)  # tile 1 of the background pattern table
+    assert np.array_equal(ppu.playfield.dirty, ppu.playfield.tileTypes == 1)
+    ppu.store(0x1015, 0xFF)
+    assert np.array_equal(ppu.playfield.dirty, ppu.playfield.tileTypes == 1)
+    assert np.array_equal(ppu.playfield.sync(ppu), Playfield().sync(ppu))
+
+
+def test_unchanged_lines_are_not_sliced_again():
+    ppu = random_ppu(mirroring=Mirroring.VERTICAL)
+    ppu.palletes[:] = bytes(range(1, 0x21))
+    ppu.ppumask = 0b01010
+    for line in range(262):
+        ppu.scanLine(line)
+    frame = ppu.frame.copy()
+    # nothing reads the playfield for a static screen
+    ppu.playfield.bitmap[:] = 0
+    for line in range(262):
+        ppu.scanLine(line)
+    assert np.array_equal(ppu.frame, frame)
+
+    # only the lines of the written tile row are drawn again
+    ppu.store(0x2000 + 5 * 32 + 7, 0)
+    for line in range(262):
+        ppu.scanLine(line)
+    assert np.array_equal(ppu.frame[:40], frame[:40]) and np.array_equal(ppu.frame[48:], frame[48:])
+    assert not np.array_equal(ppu.frame[40:48], frame[40:48])
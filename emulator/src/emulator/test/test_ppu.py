@@ -0,0 +1,210 @@
+import random
+
+import numpy as np
+
+from emulator.constants import Mirroring
+from emulator.memory import Memory
+from emulator.ppu import COLOR_LUT, COLORS, Controller, PPU, Renderer, mask_variant
+from emulator.test.helpers import random_bytes, random_ppu
+from emulator.window import HeadlessWindow
+
+
+def test_numpy_renderer_matches_reference():
+    # pattern table, scroll (v and fine X) and left column clipping
+    for ppuctrl, v, finex, ppumask in [(0b00000, 0x0000, 0, 0b01010), (0b00000, 0x0400, 3, 0b01000),
+                                       (0b10000, 0x5A4D, 7, 0b01010), (0b10000, 0x3FE5, 1, 0b01010)]:
+        frames = []
+        for renderer in (Renderer.NUMPY, Renderer.REFERENCE):
+            ppu = random_ppu(seed=v, renderer=renderer)
+            ppu.ppuctrl = ppuctrl
+            ppu.ppumask = ppumask
+            ppu.ppuaddr = ppu.tempaddr = v
+            ppu.finex = finex
+            for line in range(240):
+                ppu.scanLine(line)
+            frames.append(ppu.frame)
+        assert np.array_equal(*frames)
+
+
+def test_numpy_sprites_match_reference():
+    # 8x8 and 8x16 sprites, from either pattern table, with and without the left column
+    for ppuctrl, ppumask in [(0b000000, 0b11110), (0b001000, 0b11000), (0b100000, 0b11000), (0b101000, 0b11110)]:
+        frames = []
+        for renderer in (Renderer.NUMPY, Renderer.REFERENCE):
+            ppu = random_ppu(seed=ppuctrl | ppumask, renderer=renderer)
+            ppu.oam[:] = np.frombuffer(random_bytes(random.Random(ppuctrl), 256), dtype=np.uint8)
+            ppu.ppuctrl = ppuctrl
+            ppu.ppumask = ppumask
+            for line in range(240):
+                ppu.scanLine(line)
+            frames.append(ppu.frame)
+        assert np.array_equal(*frames)
+
+
+def test_sprite_evaluation_keeps_8_sprites_per_line():
+    ppu = PPU(bytes(0x2000), screen=HeadlessWindow())
+    ppu.oam[0::4] = 0xFF  # hidden
+    for n in range(9):
+        ppu.oam[n * 4:n * 4 + 4] = [99, 0, 0, n * 8]
+    index = ppu.evaluateSprites()
+    assert list(index[100]) == list(range(8))
+    assert (index[:100] == -1).all() and (index[108:] == -1).all()
+    assert ppu.spriteCounts[100] == 9
+
+    ppu.ppumask = 0b10000
+    for line in range(100):
+        ppu.scanLine(line)
+    assert not ppu.ppustatus & 0b100000
+    ppu.scanLine(100)
+    assert ppu.ppustatus & 0b100000
+    ppu.scanLine(261)
+    assert not ppu.ppustatus & 0b100000
+
+
+def test_sprites_flip_and_go_behind_the_background():
+    chr_rom = bytearray(0x2000)
+    chr_rom[0x10] = 0b11110000  # tile 1, top row, left half
+    chr_rom[0x21] = 0b11111111  # tile 2, second row
+    ppu = PPU(bytes(chr_rom), screen=HeadlessWindow())
+    ppu.store(0x3F00, 0x0F)
+    ppu.store(0x3F01, 0x30)
+    ppu.store(0x3F11, 0x16)
+    ppu.store(0x3F15, 0x2A)
+    ppu.oam[0::4] = 0xFF
+    # sprite 0 flipped both ways, over sprite 1
+    ppu.oam[0:8] = [9, 1, 0b11000000, 20, 16, 1, 0b00000001, 22]
+    ppu.ppumask = 0b11110
+    for line in range(18):
+        ppu.scanLine(line)
+    assert list(ppu.frame[17, 20:32]) == [0x0F] * 2 + [0x2A] * 2 + [0x16] * 4 + [0x0F] * 4
+
+    # sprite 0 still hides sprite 1 where the background is in front of it
+    ppu.store(0x2043, 2)
+    ppu.oam[2] |= 0b100000
+    ppu.ppuaddr = 0
+    for line in range(18):
+        ppu.scanLine(line)
+    assert list(ppu.frame[17, 20:32]) == [0x0F] * 2 + [0x2A] * 2 + [0x30] * 8
+
+
+def test_frame_holds_color_indices():
+    ppu = PPU(bytes(0x2000), screen=HeadlessWindow())
+    ppu.store(0x3F00, 0x21)
+    ppu.scanLine(0)
+    assert (ppu.frame[0] == 0x21).all()
+
+
+def test_frame_is_presented_after_the_last_visible_line():
+    ppu = PPU(bytes(0x2000), screen=HeadlessWindow())
+    ppu.store(0x3F00, 0x21)
+    for line in range(240):
+        ppu.scanLine(line)
+    assert ppu.screen.frame_count == 1
+    assert tuple(ppu.screen.frame[0, 0]) == tuple(ppu.screen.frame[239, 255]) == tuple(COLOR_LUT[0x21])
+
+
+def test_controller_shift_register():
+    controller = Controller()
+    controller.setButtons(0b10000101)  # A, select, right
+    controller.write(True)
+    assert [controller.readButton() for _ in range(2)] == [1, 1]
+    controller.write(False)
+    controller.setButtons(0)  # the register was frozen by the strobe
+    assert [controller.readButton() for _ in range(10)] == [1, 0, 1, 0, 0, 0, 0, 1, 1, 1]
+
+
+def test_controllers_are_polled_at_vblank():
+    screen = HeadlessWindow()
+    ppu = PPU(bytes(0x2000), screen=screen)
+    memory = Memory(ppu=ppu)
+    ppu.setNMI(nmi=lambda cpu, memory: None)
+    screen.set_buttons(1, start=1)
+    for line in range(242):
+        ppu.scanLine(line)
+    memory.store(0x4016, 1)
+    memory.store(0x4016, 0)
+    assert [memory.fetch(0x4016, ld=1) for _ in range(4)] == [0, 0, 0, 1]
+    assert memory.fetch(0x4017, ld=1) == 0
+
+
+def test_palette_variants():
+    assert COLOR_LUT.shape == (16 * 64, 3)
+    assert np.array_equal(COLOR_LUT[:64], COLORS)
+    # greyscale keeps the luminance column
+    assert tuple(COLOR_LUT[mask_variant(0b00000001) * 64 + 0x26]) == tuple(COLORS[0x20])
+    # red emphasis darkens green and blue
+    red = COLOR_LUT[mask_variant(0b00100000) * 64 + 0x30]
+    assert red[0] == COLORS[0x30][0] and red[1] < COLORS[0x30][1] and red[2] < COLORS[0x30][2]
+    # all three darken every channel
+    assert (COLOR_LUT[mask_variant(0b11100000) * 64 + 0x30] < COLORS[0x30]).all()
+
+
+def test_emphasis_is_applied_per_line_at_present_time():
+    screen = HeadlessWindow()
+    ppu = PPU(bytes(0x2000), screen=screen)
+    ppu.store(0x3F00, 0x30)
+    for line in range(240):
+        ppu.ppumask = 0b11100000 if line >= 120 else 0
+        ppu.scanLine(line)
+    assert (ppu.frame == 0x30).all()
+    assert tuple(screen.frame[0, 0]) == tuple(COLORS[0x30])
+    assert tuple(screen.frame[239, 0]) == tuple(COLOR_LUT[mask_variant(0b11100000) * 64 + 0x30])
+
+
+def test_scroll_registers():
+    ppu = PPU(bytes(0x2000), screen=HeadlessWindow())
+    memory = Memory(ppu=ppu)
+    memory.store(0x2000, 0b10)
+    memory.store(0x2005, 0x7D)  # X 125
+    memory.store(0x2005, 0x5E)  # Y 94
+    # fine Y, nametable, coarse Y, coarse X
+    assert ppu.tempaddr == 0b110_10_01011_01111 and ppu.finex == 0b101
+    assert ppu.ppuaddr == 0
+    # $2006 writes go through t to v, the second write resets w
+    memory.store(0x2006, 0x3D)
+    memory.store(0x2006, 0xF0)
+    assert ppu.ppuaddr == ppu.tempaddr == 0x3DF0
+    memory.store(0x2006, 0x21)
+    assert not ppu.ppuaddr == ppu.tempaddr
+    memory.fetch(0x2002)
+    memory.store(0x2006, 0x23)
+    memory.store(0x2006, 0x45)
+    assert ppu.ppuaddr == 0x2345
+
+
+def test_scrolled_lines_wrap_around_the_nametables():
+    chr_rom = bytearray(0x2000)
+    chr_rom[0x10:0x18] = b"\xff" * 8  # tile 1 is solid
+    ppu = PPU(bytes(chr_rom), mirroring=Mirroring.VERTICAL, screen=HeadlessWindow())
+    memory = Memory(ppu=ppu)
+    ppu.store(0x3F01, 0x30)
+    ppu.store(0x241F, 1)  # last tile of the top row of the right nametable
+    ppu.ppumask = 0b01010
+    memory.store(0x2000, 0b01)  # right nametable, scrolled 252 pixels: the next one is the left one
+    memory.store(0x2005, 252)
+    memory.store(0x2005, 0)
+    for line in range(262):
+        ppu.scanLine(line)
+    for line in range(8):
+        ppu.scanLine(line)
+    assert list(ppu.frame[0, :6]) == [0x30] * 4 + [0x00] * 2
+    assert (ppu.frame[8:, :4] == 0).all()
+
+
+def test_decode_table_mirrors_the_nametables_and_palettes():
+    ppu = PPU(bytes(0x2000), mirroring=Mirroring.HORIZONTAL, screen=HeadlessWindow())
+    ppu.store(0x2005, 0x11)
+    ppu.store(0x2C06, 0x22)
+    assert ppu.fetch(0x2405) == ppu.fetch(0x3005) == 0x11
+    assert ppu.fetch(0x2806) == ppu.fetch(0x3C06) == 0x22
+    ppu.set_mirroring(Mirroring.VERTICAL)
+    assert ppu.fetch(0x2805) == 0x11 and ppu.fetch(0x2406) == 0x22
+    ppu.set_mirroring(Mirroring.FOUR_SCREEN)
+    assert ppu.fetch(0x2C06) == 0
+    # $3F10/$3F14/$3F18/$3F1C are the entries of $3F00/$3F04/$3F08/$3F0C, $3F20-$3FFF mirrors the 32 bytes
+    ppu.store(0x3F10, 0x0F)
+    ppu.store(0x3F35, 0x2A)
+    assert ppu.fetch(0x3F00) == ppu.fetch(0x3FE0) == 0x0F
+    assert ppu.fetch(0x3F15) == 0x2A
+    # the bus is 14 bits wide
+    assert ppu.fetch(0x7F15) == 0x2A
@@ -0,0 +1,280 @@
+import random
+
+import numpy as np
+
+from emulator.constants import DOTS_PER_SCANLINE, Mirroring
+from emulator.cpu import CPU
+from emulator.memory import Memory
+from emulator.ppu import Renderer
+from emulator.scheduler import EventType, Scheduler
+from emulator.test.helpers import clocked_ppu, random_bytes
+
+
+def test_events_fire_in_order_once_due():
+    cpu = CPU()
+    scheduler = Scheduler(cpu)
+    fired = []
+    scheduler.on(EventType.NMI, lambda dot, name: fired.append((dot, name)))
+    scheduler.schedule(10, EventType.NMI, "b")
+    scheduler.schedule(4, EventType.NMI, "a")
+    scheduler.schedule(10, EventType.NMI, "c")
+    # dot 4 is during CPU cycle 2
+    assert scheduler.deadline == 2
+    cpu.cycle = 3
+    scheduler.run_due()
+    assert fired == [(4, "a")]
+    cpu.cycle = 4
+    scheduler.run_due()
+    assert fired == [(4, "a"), (10, "b"), (10, "c")]
+    assert scheduler.deadline == float("inf")
+
+
+def test_ppu_frame_timing():
+    cpu, scheduler, ppu = clocked_ppu()
+    ppu.ppuctrl = 0b10000000
+    ppu.attach(scheduler)
+    nmis = []
+    scheduler.on(EventType.NMI, lambda dot: nmis.append(dot))
+
+    # vblank starts on dot 1 of line 241: 82182 dots, CPU cycle 27394
+    cpu.cycle = 27393
+    scheduler.run_due()
+    assert not ppu.ppustatus & 0x80
+    assert scheduler.deadline == 27394
+    cpu.cycle = 27394
+    scheduler.run_due()
+    assert ppu.ppustatus & 0x80
+    assert nmis == [241 * DOTS_PER_SCANLINE + 1]
+    assert ppu.screen.frame_count == 1
+
+    # and ends on dot 1 of the pre-render line
+    cpu.cycle = (261 * DOTS_PER_SCANLINE + 1 + 2) // 3
+    scheduler.run_due()
+    assert not ppu.ppustatus & 0x80
+
+
+def test_oam_dma_stalls_the_cpu():
+    cpu, scheduler, ppu = clocked_ppu()
+    cpu.cycle = 101
+    scheduler.on(EventType.DMA_STALL, lambda dot, cycles: cpu.inc_cycle_by(cycles))
+    memory = Memory(ppu=ppu)
+    memory.scheduler = scheduler
+    memory.store(0x4014, 0x02)
+    scheduler.run_due()
+    assert cpu.cycle == 101 + 514
+
+
+def test_ppu_catches_up_on_register_access():
+    cpu, scheduler, ppu = clocked_ppu()
+    memory = Memory(ppu=ppu)
+    ppu.attach(scheduler)
+    memory.store(0x2006, 0x3F)
+    memory.store(0x2006, 0x00)
+    memory.store(0x2007, 0x01)
+
+    # 100 lines later nothing ran until the CPU touches the PPU
+    cpu.cycle = 100 * DOTS_PER_SCANLINE // 3 + 10
+    assert ppu.line == 0
+    memory.fetch(0x2002)
+    assert ppu.line == 100
+    memory.store(0x2006, 0x3F)
+    memory.store(0x2006, 0x00)
+    memory.store(0x2007, 0x02)
+
+    cpu.cycle = scheduler.deadline
+    scheduler.run_due()
+    assert ppu.line == 241
+    assert (ppu.frame[:100] == 0x01).all()
+    assert (ppu.frame[100:] == 0x02).all()
+
+
+def _sprite_zero_ppu():
+    chr_rom = bytearray(0x2000)
+    chr_rom[0x10:0x18] = b"\xff" * 8  # tile 1 is solid
+    cpu, scheduler, ppu = clocked_ppu(bytes(chr_rom))
+    ppu.nametables[12 * 32 + 12] = 1  # lines and columns 96 to 103
+    ppu.oam[0::4] = 0xFF
+    ppu.oam[0:4] = [99, 1, 0, 100]  # lines and columns 100 to 107
+    ppu.ppumask = 0b11110
+    ppu.attach(scheduler)
+    return cpu, scheduler, ppu
+
+
+def test_sprite_zero_hit_is_set_on_its_dot():
+    cpu, scheduler, ppu = _sprite_zero_ppu()
+    hit = 100 * DOTS_PER_SCANLINE + 100 + 1
+    assert scheduler.deadline == -(-hit // 3)
+    cpu.cycle = hit // 3
+    scheduler.run_due()
+    assert not ppu.ppustatus & 0b1000000
+    cpu.cycle = scheduler.deadline
+    scheduler.run_due()
+    assert ppu.ppustatus & 0b1000000
+
+    # cleared on the pre-render line
+    cpu.cycle = (261 * DOTS_PER_SCANLINE + 1 + 2) // 3
+    scheduler.run_due()
+    assert not ppu.ppustatus & 0b1000000
+
+
+def test_sprite_zero_hit_follows_mid_frame_writes():
+    cpu, scheduler, ppu = _sprite_zero_ppu()
+    memory = Memory(ppu=ppu)
+    # the tile under the sprite is erased on line 50
+    cpu.cycle = 50 * DOTS_PER_SCANLINE // 3
+    memory.fetch(0x2002)
+    memory.store(0x2006, 0x21)
+    memory.store(0x2006, 0x8C)
+    memory.store(0x2007, 0x00)
+    cpu.cycle = (241 * DOTS_PER_SCANLINE) // 3
+    scheduler.run_due()
+    assert not ppu.ppustatus & 0b1000000
+
+
+def _run_frame_with_mid_frame_writes(renderer):
+    cpu, scheduler, ppu = clocked_ppu(renderer=renderer)
+    chr_ram = bytearray(random_bytes(random.Random(1), 0x2000))
+    ppu.map_chr(0, chr_ram, writable=True)
+    memory = Memory(ppu=ppu)
+    rng = random.Random(2)
+    for addr in range(0x1000):
+        ppu.nametables[addr] = rng.getrandbits(8)
+    for addr in range(0x20):
+        ppu.palletes[addr] = rng.getrandbits(6)
+    ppu.oam[:] = np.frombuffer(random_bytes(rng, 256), dtype=np.uint8)
+    ppu.ppumask = 0b11110
+    ppu.attach(scheduler)
+
+    def at_line(line, *writes):
+        cpu.cycle = (line * DOTS_PER_SCANLINE + 100) // 3
+        memory.fetch(0x2002)
+        for addr, value in writes:
+            memory.store(addr, value)
+
+    at_line(20, (0x2000, 0b00000001))
+    at_line(35, (0x2006, 0x3F), (0x2006, 0x01), (0x2007, 0x30), (0x2007, 0x16))
+    at_line(50, (0x2000, 0b00010010))
+    at_line(51, (0x2006, 0x28), (0x2006, 0x45), (0x2007, 0x00), (0x2007, 0x01))
+    at_line(90, (0x2006, 0x10), (0x2006, 0x00), (0x2007, 0xFF), (0x2007, 0x00))
+    at_line(100, (0x2005, 0x35), (0x2005, 0x9A))
+    cpu.cycle = (120 * DOTS_PER_SCANLINE) // 3
+    ppu.set_mirroring(Mirroring.HORIZONTAL)
+    at_line(130, (0x2003, 0x10), (0x2004, 140), (0x2004, 0x01), (0x2004, 0x00), (0x2004, 0x40))
+    at_line(150, (0x2000, 0b00100011))
+    at_line(200, (0x2006, 0x2F), (0x2006, 0xE0), (0x2007, 0xAA))
+    cpu.cycle = scheduler.deadline
+    scheduler.run_due()
+    assert ppu.screen.frame_count == 1
+    return ppu.frame
+
+
+def test_deferred_rasterisation_matches_lockstep():
+    assert np.array_equal(_run_frame_with_mid_frame_writes(Renderer.NUMPY),
+                          _run_frame_with_mid_frame_writes(Renderer.REFERENCE))
+
+
+def test_dot_renderer_matches_numpy_on_the_other_lines():
+    fast = _run_frame_with_mid_frame_writes(Renderer.NUMPY)
+    dots = _run_frame_with_mid_frame_writes(Renderer.DOTS)
+    written = [20, 35, 50, 51, 90, 100, 130, 150, 200]
+    others = np.setdiff1d(np.arange(240), written)
+    assert np.array_equal(fast[others], dots[others])
+
+
+def _split_frame(*writes):
+    """
+    Frame drawn by the dot renderer with `writes` made on dot 100 of line 50. The left nametable has columns of
+    tile 1 (color 0x30) and tile 3 (color 0x2A), the right one is all tile 2 (color 0x16)
+    """
+    chr_rom = bytearray(0x2000)
+    chr_rom[0x10:0x18] = b"\xff" * 8  # color 1
+    chr_rom[0x28:0x30] = b"\xff" * 8  # color 2
+    chr_rom[0x30:0x40] = b"\xff" * 16  # color 3
+    cpu, scheduler, ppu = clocked_ppu(bytes(chr_rom), mirroring=Mirroring.VERTICAL, renderer=Renderer.DOTS)
+    memory = Memory(ppu=ppu)
+    for addr, color in [(0x3F00, 0x0F), (0x3F01, 0x30), (0x3F02, 0x16), (0x3F03, 0x2A)]:
+        ppu.store(addr, color)
+    for tile in range(0x3C0):
+        ppu.store(0x2000 + tile, 3 if tile & 1 else 1)
+        ppu.store(0x2400 + tile, 2)
+    ppu.ppumask = 0b01010
+    ppu.attach(scheduler)
+    cpu.cycle = (50 * DOTS_PER_SCANLINE + 100) // 3
+    memory.fetch(0x2002)
+    for addr, value in writes:
+        memory.store(addr, value)
+    cpu.cycle = (241 * DOTS_PER_SCANLINE) // 3 + 1
+    scheduler.run_due()
+    return ppu.frame
+
+
+_COLUMNS = np.repeat(np.resize([0x30, 0x2A], 32), 8)
+
+
+def test_mid_scanline_ppuaddr_write_splits_the_line():
+    frame = _split_frame((0x2006, 0x24), (0x2006, 0x00))
+    assert (frame[:50] == _COLUMNS).all()
+    # two tiles are already in the shifters, the tile fetched on dot 104 is the first from the new address
+    assert (frame[50, :112] == _COLUMNS[:112]).all() and (frame[50, 112:] == 0x16).all()
+    assert (frame[51:] == 0x16).all()
+
+
+def test_mid_scanline_scroll_write_shows_from_the_next_line():
+    # t takes the right nametable, v goes on along the line until dot 257
+    frame = _split_frame((0x2000, 0b01), (0x2005, 0x00), (0x2005, 0x00))
+    assert (frame[:51] == _COLUMNS).all()
+    assert (frame[51:] == 0x16).all()
+
+
+def test_mid_scanline_ppumask_write_shows_from_its_dot():
+    frame = _split_frame((0x2001, 0b00000))
+    assert (frame[:50] == _COLUMNS).all()
+    assert (frame[50, :96] == _COLUMNS[:96]).all() and (frame[50, 104:] == 0x0F).all()
+    assert (frame[51:] == 0x0F).all()
+
+
+def test_mid_scanline_palette_write_shows_from_its_dot():
+    cpu, scheduler, ppu = clocked_ppu(renderer=Renderer.DOTS)
+    memory = Memory(ppu=ppu)
+    ppu.store(0x3F00, 0x0F)
+    ppu.ppumask = 0b01010
+    ppu.attach(scheduler)
+    cpu.cycle = (50 * DOTS_PER_SCANLINE + 100) // 3
+    for addr, value in [(0x2006, 0x3F), (0x2006, 0x00), (0x2007, 0x21)]:
+        memory.store(addr, value)
+    cpu.cycle = (241 * DOTS_PER_SCANLINE) // 3 + 1
+    scheduler.run_due()
+    assert (ppu.frame[:50] == 0x0F).all() and (ppu.frame[51:] == 0x21).all()
+    assert (ppu.frame[50, :96] == 0x0F).all() and (ppu.frame[50, 104:] == 0x21).all()
+
+
+def test_odd_frames_are_a_dot_shorter_while_rendering():
+    cpu, scheduler, ppu = clocked_ppu(renderer=Renderer.DOTS)
+    ppu.ppumask = 0b01000
+    ppu.attach(scheduler)
+    starts = [ppu.frameStart]
+    while len(starts) < 4:
+        cpu.cycle = scheduler.deadline
+        scheduler.run_due()
+        if ppu.frameStart != starts[-1]:
+            starts.append(ppu.frameStart)
+    frame = 262 * DOTS_PER_SCANLINE
+    assert list(np.diff(starts)) == [frame - 1, frame, frame - 1]
+
+
+def test_sprite_flags_are_predicted_again_only_when_read():
+    cpu, scheduler, ppu = _sprite_zero_ppu()
+    memory = Memory(ppu=ppu)
+    predictions = []
+    schedule = ppu.scheduleSpriteFlags
+    ppu.scheduleSpriteFlags = lambda since=None: predictions.append(since) or schedule(since)
+    # sprite 0 moves up to lines 95 to 102, it now hits on line 96
+    cpu.cycle = 95 * DOTS_PER_SCANLINE // 3
+    memory.fetch(0x2002)
+    for addr, value in [(0x2005, 0x00), (0x2003, 0x00), (0x2004, 94), (0x2001, 0b11110)]:
+        memory.store(addr, value)
+    assert predictions == []
+    # the new hit is past by the time the status is read
+    cpu.cycle = (96 * DOTS_PER_SCANLINE + 200) // 3
+    assert memory.fetch(0x2002) & 0b1000000
+    assert predictions == [95 * DOTS_PER_SCANLINE // 3 * 3]
@@ -0,0 +1,65 @@
+import io
+
+from emulator.cpu import CPU
+from emulator.memory import Memory, MemoryPositions
+from emulator.opcodes.opcodes import OpCodes
+from emulator.ppu import PPU
+from emulator.trace import Tracer
+from emulator.window import HeadlessWindow
+
+
+def _run(tracer, program, cpu, memory):
+    for _ in program:
+        tracer.before(cpu, memory)
+        instruction = OpCodes.table[memory.fetch(cpu.pc)]
+        cpu.inc_pc_by(1)
+        cpu.inc_cycle()
+        instruction.exec(cpu, memory)
+        tracer.after(cpu, memory)
+    tracer.flush()
+
+
+def _setup(code):
+    rom = code + [0x00] * (0x4000 - len(code))
+    memory = Memory(rom=rom)
+    cpu = CPU(log_compatible_mode=True)
+    cpu.pc = MemoryPositions.PRG_ROM_START.start
+    cpu.flags = 0x24
+    return cpu, memory
+
+
+def test_nestest_format():
+    # LDA #$42; STA $0810 (mirror of $0010); LDX $10; *NOP $10
+    cpu, memory = _setup([0xA9, 0x42, 0x8D, 0x10, 0x08, 0xA6, 0x10, 0x04, 0x10])
+    out = io.StringIO()
+    _run(Tracer(nestest=True, out=out), range(4), cpu, memory)
+
+    assert out.getvalue().split("\n") == [
+        "C000  A9 42     LDA #$42                        A:00 X:00 Y:00 P:24 SP:FD  CYC:0",
+        "C002  8D 10 08  STA $0810 = 00                  A:42 X:00 Y:00 P:24 SP:FD  CYC:2",
+        "C005  A6 10     LDX $10 = 42                    A:42 X:00 Y:00 P:24 SP:FD  CYC:6",
+        "C007  04 10    *NOP $10 = 42                    A:42 X:42 Y:00 P:24 SP:FD  CYC:9",
+        "",
+    ]
+
+
+def test_debug_format_shows_memory_after_execution():
+    # STA $0810 (mirror of $0010)
+    cpu, memory = _setup([0x8D, 0x10, 0x08])
+    cpu.log_compatible_mode = False
+    cpu.a = 0x42
+    out = io.StringIO()
+    _run(Tracer(out=out), range(1), cpu, memory)
+
+    assert out.getvalue().endswith("| MEM[0x0010] = 0x42 |\n")
+
+
+def test_tracing_has_no_side_effects():
+    # LDA $2002
+    cpu, memory = _setup([0xAD, 0x02, 0x20])
+    memory.ppu = PPU([0x00] * 0x2000, screen=HeadlessWindow())
+    memory.ppu.ppustatus = 0x80
+    tracer = Tracer(nestest=True, out=io.StringIO())
+    tracer.before(cpu, memory)
+    assert memory.ppu.ppustatus == 0x80
+    assert tracer.pending[3] == 0x80
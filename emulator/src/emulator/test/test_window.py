@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from emulator.config import DISPLAY_SCALE
+from emulator.ppu import COLOR_LUT, PPU
+from emulator.window import BUTTONS, HeadlessWindow, Window, buttons_mask, row_bands
+
+
+def test_headless_never_imports_pygame():
+    code = "\n".join([
+        "import sys",
+        "sys.modules['pygame'] = None",  # any pygame import fails
+        "from emulator.ppu import PPU",
+        "from emulator.window import HeadlessWindow",
+        "ppu = PPU(bytes(0x2000), screen=HeadlessWindow())",
+        "for line in range(262): ppu.scanLine(line)",
+        "ppu.pollControllers()",
+        "assert ppu.screen.frame_count == 1",
+    ])
+    src = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, "-c", code], cwd=src, check=True)
+
+
+def test_headless_frame_is_rgb():
+    ppu = PPU(bytes(0x2000), screen=HeadlessWindow())
+    ppu.store(0x3F00, 0x21)
+    for line in range(240):
+        ppu.scanLine(line)
+    assert (ppu.screen.frame == COLOR_LUT[0x21]).all()
+
+
+def test_headless_buttons_change_on_poll():
+    screen = HeadlessWindow()
+    screen.set_buttons(1, A=1, right=1)
+    assert screen.buttons(1) == 0
+    screen.poll()
+    assert screen.buttons(1) == buttons_mask((1, 0, 0, 0, 0, 0, 0, 1))
+    screen.release(1, "A")
+    screen.press(2, "start")
+    screen.poll()
+    assert screen.buttons(1) == 0b10000000
+    assert screen.buttons(2) == 0b00001000
+
+
+def test_headless_input_source():
+    screen = HeadlessWindow(input_source=lambda player: [player == 2] * len(BUTTONS))
+    screen.poll()
+    assert screen.buttons(1) == 0
+    assert screen.buttons(2) == 0xFF
+
+
+def test_row_bands():
+    changed = np.zeros(240, dtype=bool)
+    assert row_bands(changed) == []
+    changed[[0, 1, 2, 100, 239]] = True
+    assert row_bands(changed) == [(0, 3), (100, 101), (239, 240)]
+
+
+def test_window_only_sends_changed_rows(monkeypatch):
+    pytest.importorskip("pygame")
+    # SDL's dummy drivers need no display nor sound card, the updates are caught before they reach it
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    window = Window()
+    updates = []
+    monkeypatch.setattr(window, "update", updates.append)
+    frame = np.full((240, 256), 0x21, dtype=np.uint8)
+    window.present(frame, COLOR_LUT)
+    assert [rect.height for rect in updates[0]] == [240 * DISPLAY_SCALE]
+    window.present(frame, COLOR_LUT)
+    assert len(updates) == 1
+    frame[10:12, 5] = 0x16
+    window.present(frame, COLOR_LUT)
+    assert [(rect.top, rect.height) for rect in updates[1]] == [(10 * DISPLAY_SCALE, 2 * DISPLAY_SCALE)]
+    assert tuple(window.surface.get_at((5 * DISPLAY_SCALE, 11 * DISPLAY_SCALE)))[:3] == tuple(COLOR_LUT[0x16])
+    assert tuple(window.surface.get_at((5 * DISPLAY_SCALE, 12 * DISPLAY_SCALE)))[:3] == tuple(COLOR_LUT[0x21])
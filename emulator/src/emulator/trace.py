@@ -0,0 +1,99 @@
+import sys
+
+from emulator.memory import MemoryPositions
+from emulator.opcodes.opcodes import OpCodes
+
+# stores to the PPU / APU registers can't be read back, so the debug log shows the register that was stored
+_STORED_REGISTER = {
+    "STA": lambda cpu: cpu.a,
+    "STX": lambda cpu: cpu.x,
+    "STY": lambda cpu: cpu.y,
+    "SAX": lambda cpu: cpu.a & cpu.x,
+}
+
+
+def _is_io(addr):
+    return MemoryPositions.PPU_REGISTERS.start <= addr <= MemoryPositions.APU_IO_EXTRAS.end
+
+
+class Tracer:
+    """
+    Instruction trace, only created when running with `--trace` or `--nestest`.
+
+    `before` and `after` only record raw values (operand bytes, effective address, registers), the log lines are
+    built when the buffer is flushed, so the emulation loop does no string work for the trace.
+    Memory is read through `Memory.peek`, so tracing never changes what the program sees.
+    """
+
+    def __init__(self, nestest=False, out=sys.stdout, buffer_size=4096):
+        self.nestest = nestest
+        self.out = out
+        self.buffer_size = buffer_size
+        self.records = []
+        self.pending = None
+
+    def before(self, cpu, memory):
+        """
+        Must be called before the opcode at `cpu.pc` is fetched
+        """
+        pc = cpu.pc
+        instruction = OpCodes.table[memory.peek(pc)]
+        mode = instruction.addressing_mode
+        operand = address = value = None
+        if mode is not None and mode.operand_size:
+            operand = memory.peek((pc + 1) & 0xFFFF)
+            if mode.operand_size == 2:
+                operand |= memory.peek((pc + 2) & 0xFFFF) << 8
+            address = mode.peek_address(memory, operand, cpu.x, cpu.y, pc)
+            if mode.accesses_memory and instruction.traces_data:
+                value = memory.peek(address)
+        self.pending = (instruction, operand, address, value, cpu.snapshot())
+
+    def after(self, cpu, memory):
+        """
+        Must be called once the instruction recorded by `before` was executed
+        """
+        if self.nestest:
+            # the Nintendulator log shows the state before the instruction
+            self.records.append(self.pending)
+        else:
+            instruction, _operand, address, value, _state = self.pending
+            addr = data = None
+            if value is not None:
+                addr = memory.get_effective_address(address)
+                if not _is_io(addr):
+                    data = memory.peek(addr)
+                elif instruction.mnemonic in _STORED_REGISTER:
+                    data = _STORED_REGISTER[instruction.mnemonic](cpu)
+                else:
+                    data = value
+            self.records.append(cpu.snapshot(addr, data))
+        self.pending = None
+
+        if len(self.records) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self.records:
+            return
+        if self.nestest:
+            lines = map(self.format_nestest, self.records)
+        else:
+            lines = map(str, self.records)
+        self.out.write("\n".join(lines) + "\n")
+        self.out.flush()
+        self.records = []
+
+    @staticmethod
+    def format_nestest(record):
+        instruction, operand, address, value, state = record
+        mode = instruction.addressing_mode
+        if operand is None:
+            operand_bytes = ""
+        elif mode.operand_size == 2:
+            operand_bytes = "%02X %02X" % (operand & 0xFF, operand >> 8)
+        else:
+            operand_bytes = "%02X" % operand
+        return "%04X  %02X %-6s%s%-30s  %s  CYC:%d" % (
+            state.pc, instruction.id, operand_bytes, "*" if instruction.unofficial else " ",
+            instruction.disassemble(operand, address, value, state.x, state.y), state, state.cycle)
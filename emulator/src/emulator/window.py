@@ -1,23 +1,61 @@
-# pygame silent import
 import os, sys
-with open(os.devnull, 'w') as f:
-    oldstdout = sys.stdout
-    sys.stdout = f
-
-    import pygame
+import time
+from collections import deque
 
-    sys.stdout = oldstdout
+import numpy as np
 
-from pygame import Color
-import time
 from emulator.config import *
 
 W_WIDTH = 256*DISPLAY_SCALE
 W_HEIGHT = 240*DISPLAY_SCALE
 
+# order in which the NES reads the buttons of a controller
+BUTTONS = ("A", "B", "select", "start", "up", "down", "left", "right")
+KEYS = (A_BUTTON, B_BUTTON, SELECT_BUTTON, START_BUTTON, UP_BUTTON, DOWN_BUTTON, LEFT_BUTTON, RIGHT_BUTTON)
+
+pygame = None
+
+
+def buttons_mask(states):
+	"""
+	Packs button states given in `BUTTONS` order, bit n is `BUTTONS[n]`
+	"""
+	mask = 0
+	for bit, pressed in enumerate(states):
+		if pressed:
+			mask |= 1 << bit
+	return mask
+
+
+def row_bands(changed):
+	"""
+	(start, stop) of every run of rows flagged in `changed`
+	"""
+	edges = np.flatnonzero(np.diff(np.concatenate(([0], changed.view(np.int8), [0]))))
+	return list(zip(edges[0::2].tolist(), edges[1::2].tolist()))
+
+
+def load_pygame():
+	"""
+	Imports pygame the first time a window is opened, headless runs never load it (nor SDL)
+	"""
+	global pygame
+	if pygame is None:
+		# pygame silent import
+		with open(os.devnull, 'w') as f:
+			oldstdout = sys.stdout
+			sys.stdout = f
+
+			import pygame as module
+
+			sys.stdout = oldstdout
+		pygame = module
+	return pygame
+
 
 class Window():
 	def __init__(self):
+		load_pygame()
 		check_errors = pygame.init()
 		if check_errors[1] > 0:
 		    print("pygame error")
@@ -27,14 +65,121 @@ class Window():
 
 		self.surface = pygame.display.set_mode(size)
 		pygame.display.set_caption("NES emulator")
+		# unscaled frame, blitted in one go and scaled into the window
+		self.frame_surface = pygame.Surface((256, 240), 0, self.surface)
+		# config holds pygame key names, `K_<name>`
+		self.key_bits = {getattr(pygame, "K_" + key): 1 << bit for bit, key in enumerate(KEYS)}
+		self.pressed = 0
+		# color indices on the display, None when it has to be drawn in full
+		self.shown = None
+
+	def present(self, frame, lut):
+		"""
+		Shows a (240, 256) frame of color indices, `lut` maps every index to its RGB triplet.
 
-	def setPixel(self,i,j,color):
-		pygame.draw.rect(self.surface, color, pygame.Rect(i*DISPLAY_SCALE,j*DISPLAY_SCALE,DISPLAY_SCALE,DISPLAY_SCALE))
+		Only the bands of rows that differ from the frame on the display are converted, scaled and sent to
+		`pygame.display.update`, an identical frame is not sent at all
+		"""
+		if self.shown is None or self.shown.dtype != frame.dtype:
+			changed = np.ones(len(frame), dtype=bool)
+		else:
+			changed = (frame != self.shown).any(axis=1)
+		if not changed.any():
+			return
+		self.shown = frame.copy()
+		rects = []
+		for top, bottom in row_bands(changed):
+			band = (0, top, 256, bottom - top)
+			# surfarray is indexed (x, y)
+			pygame.surfarray.blit_array(self.frame_surface.subsurface(band), lut[frame[top:bottom].T])
+			rect = pygame.Rect(0, top * DISPLAY_SCALE, W_WIDTH, (bottom - top) * DISPLAY_SCALE)
+			if DISPLAY_SCALE == 1:
+				self.surface.blit(self.frame_surface, rect, band)
+			else:
+				pygame.transform.scale(self.frame_surface.subsurface(band), rect.size, self.surface.subsurface(rect))
+			rects.append(rect)
+		self.update(rects)
 
+	def update(self, rects):
+		pygame.display.update(rects)
 
 	def flip(self):
 		pygame.display.flip()
 
+	def poll(self):
+		"""
+		Drains the host event queue, called once per frame
+		"""
+		for event in pygame.event.get():
+			if event.type == pygame.KEYDOWN:
+				self.pressed |= self.key_bits.get(event.key, 0)
+			elif event.type == pygame.KEYUP:
+				self.pressed &= ~self.key_bits.get(event.key, 0)
+			elif event.type == pygame.VIDEOEXPOSE:
+				# the window was uncovered, the next frame is sent in full
+				self.shown = None
+
+	def buttons(self, player):
+		"""
+		Buttons of controller `player` as of the last `poll`, see `buttons_mask`. Only controller 1 has keys
+		"""
+		return self.pressed if player == 1 else 0
+
+
+class HeadlessWindow():
+	"""
+	Keeps the frames in memory, for tests, CI and batch runs. Nothing imports pygame.
+
+	Buttons come from `input_source(player)` when given (returning the button states in `BUTTONS` order),
+	otherwise from the events queued by `press`, `release` and `set_buttons`. Both are applied on `poll`,
+	so input only changes between frames.
+	"""
+
+	def __init__(self, input_source=None):
+		self.input_source = input_source
+		self.events = deque()
+		self.pressed = {1: 0, 2: 0}
+		# RGB of the last presented frame
+		self.frame = np.zeros((240, 256, 3), dtype=np.uint8)
+		self.frame_count = 0
+
+	def present(self, frame, lut):
+		np.take(lut, frame, axis=0, out=self.frame)
+		self.flip()
+
+	def flip(self):
+		self.frame_count += 1
+
+	def press(self, player, button):
+		self.events.append((player, 1 << BUTTONS.index(button), True))
+
+	def release(self, player, button):
+		self.events.append((player, 1 << BUTTONS.index(button), False))
+
+	def set_buttons(self, player, **buttons):
+		"""
+		`set_buttons(1, A=1, right=1)`, buttons that are not given are released
+		"""
+		for button in BUTTONS:
+			if buttons.get(button, 0):
+				self.press(player, button)
+			else:
+				self.release(player, button)
+
+	def poll(self):
+		if self.input_source is not None:
+			for player in self.pressed:
+				self.pressed[player] = buttons_mask(self.input_source(player))
+		while self.events:
+			player, bit, pressed = self.events.popleft()
+			if pressed:
+				self.pressed[player] |= bit
+			else:
+				self.pressed[player] &= ~bit
+
+	def buttons(self, player):
+		return self.pressed[player]
+
 
 def main():
 	screen = Window()
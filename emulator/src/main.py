@@ -2,12 +2,16 @@ import argparse
 
 from emulator.adressing import AddressMode
 from emulator.cartridge import Cartridge
-from emulator.constants import HIGH_BITS_MASK, LOW_BITS_MASK
-from emulator.cpu import CPU, CPUState, StatusRegisterFlags
+from emulator.constants import DOTS_PER_CYCLE, HIGH_BITS_MASK, LOW_BITS_MASK
+from emulator.cpu import CPU
+from emulator.log import LOG, Category, Level
 from emulator.memory import Memory, MemoryPositions
-from emulator.opcodes.jump import BRK
 from emulator.opcodes.opcodes import OpCodes
-from emulator.ppu import PPU
+from emulator.pacing import Pacer, PacingMode
+from emulator.ppu import PPU, Renderer
+from emulator.scheduler import EventType, Scheduler
+from emulator.trace import Tracer
+from emulator.window import HeadlessWindow, Window
 
 import sys,os
 
@@ -15,23 +19,59 @@ def main(args):
     emulate(args.file)
 
 
+def create_pacer(args):
+    if args.unthrottled or args.nestest or args.automation:
+        # test runs and automation never wait for the wall clock
+        return Pacer.unthrottled()
+    if args.speed != 1.0:
+        return Pacer(PacingMode.MULTIPLIER, speed=args.speed)
+    return Pacer(PacingMode.REALTIME)
+
+
+def create_tracer(args):
+    if args.nestest:
+        return Tracer(nestest=True)
+    if args.trace:
+        return Tracer()
+    # tracing off, the loop doesn't even look at the instructions
+    return None
+
+
+def configure_log(args):
+    for name in args.log:
+        LOG.enable(Category[name.upper()], Level[args.log_level.upper()])
+
+
+def create_screen(args):
+    if args.headless:
+        # frames stay in memory and pygame is never imported
+        return HeadlessWindow()
+    return Window()
+
+
 # https://stackoverflow.com/questions/45305891/6502-cycle-timing-per-instruction
 # http://nesdev.com/6502_cpu.txt (6510 Instruction Timing)
 def emulate(file_path):
     nestest_log_format = args.nestest
     automation_mode = args.automation
     running = True
-    file_contents = read_file(file_path)
-    cartridge = Cartridge.from_bytes(file_contents)
-    ppu = PPU(cartridge.chr_rom, mirroring=cartridge.header.flags_6&0b00000001)
-    memory = Memory(cartridge.prg_rom,ppu=ppu)
+    configure_log(args)
+    cartridge = Cartridge.from_file(file_path)
+    if args.reference_renderer:
+        renderer = Renderer.REFERENCE
+    else:
+        renderer = Renderer.DOTS if args.dot_accurate else Renderer.NUMPY
+    ppu = PPU(cartridge.chr_rom, mirroring=cartridge.header.mirroring, renderer=renderer, screen=create_screen(args))
+    memory = Memory(ppu=ppu)
     cpu = CPU(log_compatible_mode=nestest_log_format)
+    cartridge.mapper.attach(memory, ppu)
+    pacer = create_pacer(args)
+    tracer = create_tracer(args)
     ppu.setNMI(cpu,memory,NMI)
 
     reset_pos_low = memory.fetch(MemoryPositions.RESET.start)
     reset_pos_high = memory.fetch(MemoryPositions.RESET.end)
-    reset_pos = MemoryPositions.PRG_ROM_START.wrap(
-        AddressMode.get_16_bits_addr_from_high_low((reset_pos_high << 8) & HIGH_BITS_MASK, reset_pos_low & LOW_BITS_MASK))
+    reset_pos = AddressMode.get_16_bits_addr_from_high_low((reset_pos_high << 8) & HIGH_BITS_MASK, reset_pos_low & LOW_BITS_MASK)
     cpu.pc = reset_pos
 
     if nestest_log_format:
@@ -41,51 +81,92 @@ def emulate(file_path):
     if automation_mode:
         cpu.pc = MemoryPositions.PRG_ROM_START.start
 
-    i = 0
-    line = 0
+    pacer.reset(cpu.cycle)
+    scheduler = create_scheduler(cpu, memory, ppu, cartridge.mapper, pacer)
 
     while running:
         try:
-            previous_state = CPUState(pc=cpu.pc, sp=cpu.sp, a=cpu.a, x=cpu.x, y=cpu.y, p=StatusRegisterFlags(int_value=cpu.flags), addr=cpu.addr, data=cpu.data,
-                                      cycle=cpu.cycle, log_compatible_mode=nestest_log_format)
-            if previous_state.pc == 0xC66E:
-                # TODO: remove, this is a breakpoint for debugging
-                aaaa = ""
-
-            ppu.reloadControllers()#reloads controllers every tick
-
-            i+=1
-            if (i==114):
-
-                ppu.scanLine(line)
-                i=0
-                line+=1
-                if line==262:
-                    line=0
+            halted = run_cpu(cpu, memory, scheduler.deadline, tracer)
+            if halted is not None:
+                # BRK and JAM halt the emulator
+                running = False
+                if tracer is not None:
+                    tracer.flush()
+                decoded, pc = halted
+                # not printed, stdout is the trace the tests compare
+                LOG.info(Category.CPU, "%s at 0x%04X", type(decoded).__name__, pc)
+                break
+            scheduler.run_due()
+        except Exception as e:
+            # a program counter out of memory bounds (IndexError) or an emulator bug, the state can't be trusted
+            # anymore: stop and dump the log of what led to it
+            if tracer is not None:
+                tracer.flush()
+            LOG.error(Category.CPU, "%s: %s at 0x%04X", type(e).__name__, e, cpu.pc)
+            LOG.dump()
+            running = False
 
+    if tracer is not None:
+        tracer.flush()
+    if args.log:
+        LOG.dump()
+
+def create_scheduler(cpu, memory, ppu, mapper, pacer):
+    scheduler = Scheduler(cpu)
+    memory.scheduler = scheduler
+    ppu.attach(scheduler)
+    scheduler.on(EventType.NMI, lambda dot: NMI(cpu, memory))
+    scheduler.on(EventType.DMA_STALL, lambda dot, cycles: cpu.inc_cycle_by(cycles))
+
+    def irq(dot):
+        # the IRQ line is level triggered: while the mapper holds it the CPU samples it after every instruction, so
+        # a request masked by I is taken right after the CLI, PLP or RTI that clears it
+        if not mapper.irq_pending:
+            return
+        if not cpu.interrupts_disabled:
+            IRQ(cpu, memory)
+        scheduler.schedule(scheduler.now + DOTS_PER_CYCLE, EventType.IRQ)
+    scheduler.on(EventType.IRQ, irq)
+
+    def assert_irq(cpu, memory):
+        # a single sampling chain, however often the line is asserted
+        scheduler.cancel(EventType.IRQ)
+        scheduler.schedule_now(EventType.IRQ)
+    mapper.set_irq(cpu, assert_irq)
+
+    def sync(dot):
+        pacer.throttle(cpu.cycle)
+        scheduler.schedule(int(pacer.next_sync * DOTS_PER_CYCLE), EventType.SYNC)
+    scheduler.on(EventType.SYNC, sync)
+    if pacer.next_sync != float("inf"):
+        scheduler.schedule(int(pacer.next_sync * DOTS_PER_CYCLE), EventType.SYNC)
+    return scheduler
+
+
+def run_cpu(cpu, memory, deadline, tracer):
+    """
+    Runs instructions until `cpu.cycle` reaches `deadline`, returns `(instruction, pc)` if BRK or JAM halted the CPU
+    """
+    if tracer is None:
+        while cpu.cycle < deadline:
+            pc = cpu.pc
             decoded = cpu.exec_in_cycle(fetch_and_decode_instruction, cpu, memory)  # fetching and decoding a instruction always take 1 cycle
-            if decoded:
-                decoded.exec(cpu, memory)
-                if isinstance(decoded, BRK):
-                    # abort program on BRK
-                    running = False
-                    print("Break")
-                    break
-                #print_debug_line(cpu, previous_state, decoded, nestest_log_format)
-                cpu.clear_state_mem()
-        except IndexError as e:
-            # we've reached a program counter that is not within memory bounds
-            print(e)
-            running = False
-        except KeyError as e:
-            # print("Can't find instruction by code {}".format(e))
-            cpu.inc_pc_by(1)
-        except Exception as e:
-            print(e)
-            cpu.inc_pc_by(1)
+            if decoded.exec(cpu, memory):
+                return decoded, pc
+    else:
+        while cpu.cycle < deadline:
+            tracer.before(cpu, memory)
+            pc = cpu.pc
+            decoded = cpu.exec_in_cycle(fetch_and_decode_instruction, cpu, memory)
+            if decoded.exec(cpu, memory):
+                return decoded, pc
+            tracer.after(cpu, memory)
+    return None
+
 
 def NMI(cpu,memory):
-    print("-------nmi------")
+    if LOG.interrupt:
+        LOG.debug(Category.INTERRUPT, "NMI at 0x%04X", cpu.pc)
     #push return address
     hi = cpu.pc & 0b1111111100000000
     hi = hi >> 8
@@ -95,9 +176,10 @@ def NMI(cpu,memory):
     memory.stack_push(cpu,lo)
     
 
-    #push status
-    status = cpu.flags | 0b00110000
+    #push status, B is only set when pushed by an instruction (PHP or BRK)
+    status = (cpu.p & 0b11101111) | 0b00100000
     memory.stack_push(cpu,status)
+    cpu.interrupts_disabled = True
 
     lo = memory.fetch(0xFFFA)
     hi = memory.fetch(0xFFFB)
@@ -108,33 +190,24 @@ def NMI(cpu,memory):
     #cpu.pc = 0xc089
 
 
-def fetch_and_decode_instruction(cpu, memory):
-    instruction = memory.fetch(cpu.pc)
-    decoded = decode_instruction(instruction)
-    cpu.inc_pc_by(1)
-    return decoded
-
-
-def read_file(file_path):
-    with open(file_path, mode='rb') as file:
-        return file.read()
+def IRQ(cpu, memory):
+    # same sequence as the NMI, through the IRQ/BRK vector
+    if LOG.interrupt:
+        LOG.debug(Category.INTERRUPT, "IRQ at 0x%04X", cpu.pc)
+    memory.stack_push(cpu, (cpu.pc >> 8) & LOW_BITS_MASK)
+    memory.stack_push(cpu, cpu.pc & LOW_BITS_MASK)
+    memory.stack_push(cpu, (cpu.p & 0b11101111) | 0b00100000)
+    cpu.interrupts_disabled = True
+    cpu.pc = (memory.fetch(MemoryPositions.IRQ.end) << 8) | memory.fetch(MemoryPositions.IRQ.start)
+    cpu.inc_cycle_by(7)
 
 
-def decode_instruction(instruction):
-    decoded = OpCodes.all[instruction]
-    if not decoded:
-        print("Can't find instruction 0x{:02X}".format(instruction))
+def fetch_and_decode_instruction(cpu, memory):
+    decoded = OpCodes.table[memory.fetch(cpu.pc)]
+    cpu.inc_pc_by(1)
     return decoded
 
 
-def print_debug_line(cpu, previous, instruction, nestest):
-    if nestest:
-        print("%04X  %s  %s  CYC:%d" % (previous.pc, instruction, previous, previous.cycle))
-        # print("%04X  %s  %s  CYC:%d (Δ = %d; expected = %d)" % (previous.pc, instruction, previous, previous.cycle, (cpu.cycle - previous.cycle), instruction.cycles))
-    else:
-        print(cpu)
-
-
 if __name__ == "__main__":
     """ This is executed when run from the command line """
     parser = argparse.ArgumentParser()
@@ -143,6 +216,17 @@ if __name__ == "__main__":
     parser.add_argument("file", help="NES Cartridge file path")
     parser.add_argument("--nestest", action="store_true")
     parser.add_argument("--automation", action="store_true")
+    parser.add_argument("--trace", action="store_true", help="print the CPU state after every instruction")
+    parser.add_argument("--unthrottled", action="store_true", help="run as fast as possible")
+    parser.add_argument("--headless", action="store_true", help="run without a window, no pygame or SDL needed")
+    parser.add_argument("--reference-renderer", action="store_true", help="render pixel by pixel (slow, for comparisons)")
+    parser.add_argument("--dot-accurate", action="store_true",
+                        help="draw the lines written to mid-scanline dot by dot (raster effects)")
+    parser.add_argument("--log", type=lambda names: names.split(","), default=[],
+                        help="comma separated categories to log ({}), dumped on exit or on a crash".format(
+                            ",".join(category.name.lower() for category in Category)))
+    parser.add_argument("--log-level", default="debug", choices=[level.name.lower() for level in Level])
+    parser.add_argument("--speed", type=float, default=1.0, help="emulation speed multiplier (e.g. 2 for 2x)")
 
     args = parser.parse_args()
     main(args)
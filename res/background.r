@@ -941,15 +941,3 @@
 | pc = 0xc061 | a = 0x30 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 |
 | pc = 0xc063 | a = 0x30 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110111 |
 | pc = 0xc065 | a = 0x30 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110111 |
-| pc = 0xc068 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110101 |
-| pc = 0xc06b | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 | MEM[0x3622] = 0x00 |
-| pc = 0xc06d | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 | MEM[0x0017] = 0x00 |
-| pc = 0xc070 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 |
-| pc = 0xc073 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 | MEM[0x2722] = 0x00 |
-| pc = 0xc075 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 | MEM[0x0017] = 0x00 |
-| pc = 0xc079 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110100 | MEM[0x041d] = 0x00 |
-| pc = 0xc07c | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110101 |
-| pc = 0xc07f | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110101 | MEM[0x042a] = 0x00 |
-| pc = 0xc081 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110101 | MEM[0x001c] = 0x00 |
-| pc = 0xc084 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110101 |
-| pc = 0xc087 | a = 0x10 | x = 0x08 | y = 0x00 | sp = 0x01fd | p[NV-BDIZC] = 00110101 | MEM[0x3288] = 0x00 |